@@ -0,0 +1,45 @@
+"""
+Cold CSV parse vs warm Parquet cache load for the four input tables.
+
+Usage:
+    python -m benchmarks.bench_cache [--users 500000]
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.etl.cache import load_cached
+from src.etl.schema import csv_options
+from src.utils.generate_data import generate_tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=500_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        for name, df in generate_tables(args.users).items():
+            source = tmp / f"{name}.csv"
+            df.to_csv(source, index=False)
+            parse = lambda: pd.read_csv(source, **csv_options(name))
+
+            start = time.perf_counter()
+            load_cached(name, source, parse, cache_dir=tmp / "cache")
+            cold = time.perf_counter() - start
+            start = time.perf_counter()
+            load_cached(name, source, parse, cache_dir=tmp / "cache")
+            warm = time.perf_counter() - start
+            print(json.dumps({"table": name, "rows": len(df), "cold_s": round(cold, 3),
+                              "warm_s": round(warm, 3), "speedup": round(cold / warm, 1)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Churn scoring throughput: the batch ChurnModel.score vs a per-row Python loop, and
+the one-pass churn_features build.
+
+Usage:
+    python -m benchmarks.bench_churn [--max-rows 10000000] [--loop-max 100000] [--feature-users 1000000]
+
+Scoring runs on random feature matrices with a model of random coefficients (the cost
+does not depend on their values); the per-row loop (what DataFrame.apply over rows amounts to) is only timed up to --loop-max rows.
+"""
+import argparse
+import json
+import logging
+import math
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.churn import FEATURES, ChurnModel, churn_features
+from src.etl.event_index import build_event_index
+from src.utils.generate_data import generate_tables
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def per_row_loop(model, matrix):
+    scores = []
+    for row in matrix:
+        z = model.intercept
+        for j, name in enumerate(model.features):
+            value = math.log1p(row[j]) if name in model.log_features else row[j]
+            z += model.coef[j] * (value - model.mean[j]) / model.scale[j]
+        scores.append(1 / (1 + math.exp(-z)))
+    return scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-rows", type=int, default=SIZES[-1])
+    parser.add_argument("--loop-max", type=int, default=100_000)
+    parser.add_argument("--feature-users", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(7)
+    model = ChurnModel(rng.normal(size=len(FEATURES)), -1.0, rng.uniform(0, 5, len(FEATURES)),
+                       rng.uniform(1, 100, len(FEATURES)))
+
+    for n in [s for s in SIZES if s <= args.max_rows]:
+        features = pd.DataFrame(rng.uniform(0, 500, (n, len(FEATURES))), columns=FEATURES)
+        start = time.perf_counter()
+        model.score(features)
+        elapsed = time.perf_counter() - start
+        row = {"rows": n, "score_s": round(elapsed, 4), "rows_per_s": int(n / elapsed)}
+        if n <= args.loop_max:
+            matrix = features.to_numpy()
+            start = time.perf_counter()
+            per_row_loop(model, matrix)
+            row["loop_s"] = round(time.perf_counter() - start, 3)
+            row["speedup"] = round(row["loop_s"] / row["score_s"], 1)
+        print(json.dumps(row))
+
+    if args.feature_users:
+        data = generate_tables(args.feature_users)
+        index = build_event_index(data["events"])
+        start = time.perf_counter()
+        churn_features(data["users"], index, data["revenue"])
+        print(json.dumps({"feature_users": args.feature_users, "events": len(data["events"]),
+                          "features_s": round(time.perf_counter() - start, 3)}))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,43 @@
+"""
+Cohort retention matrix on large event volumes, per grain.
+
+Usage:
+    python -m benchmarks.bench_cohorts [--events 10000000] [--reference-max 1000000]
+
+The pandas Period/groupby reference (benchmarks/reference.py) is timed only up to
+--reference-max events.
+"""
+import argparse
+import json
+import logging
+import time
+
+from benchmarks.reference import REFERENCE_FREQ, reference_matrix
+from src.cohorts.engine import compute_cohort_retention, GRAINS
+from src.utils.generate_data import generate_tables
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10_000_000)
+    parser.add_argument("--events-per-user", type=float, default=10.0)
+    parser.add_argument("--reference-max", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    data = generate_tables(int(args.events / args.events_per_user), events_per_user=args.events_per_user)
+    users, events = data["users"], data["events"]
+    for grain in GRAINS:
+        start = time.perf_counter()
+        matrix = compute_cohort_retention(users, events, grain)
+        row = {"grain": grain, "events": len(events), "cohorts": len(matrix),
+               "seconds": round(time.perf_counter() - start, 3)}
+        if len(events) <= args.reference_max:
+            start = time.perf_counter()
+            reference_matrix(users, events, REFERENCE_FREQ[grain], len(matrix.columns) - 1)
+            row["reference_seconds"] = round(time.perf_counter() - start, 3)
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
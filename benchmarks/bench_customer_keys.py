@@ -0,0 +1,67 @@
+"""
+Customer joins on string customer_id vs the dense int32 customer_key.
+
+Usage:
+    python -m benchmarks.bench_customer_keys [--max-users 10000000]
+
+For each size the per-customer revenue total and last-seen timestamp are joined onto
+users twice: with the groupby + merge on customer_id the engines used to do, and with
+bincount / scatter on the keys from attach_customer_keys (whose one-off cost is
+reported separately as keying_s). Inputs come from src.utils.generate_data, typed as
+after load_data() (customer_id is categorical).
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.etl.customers import KEY_COLUMN, attach_customer_keys, fact_keys, per_customer_sum
+from src.utils.generate_data import generate_tables
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def string_joins(users, events, revenue):
+    totals = revenue.groupby("customer_id", observed=True)["amount"].sum().rename("amount").reset_index()
+    last_seen = events.groupby("customer_id", observed=True)["event_timestamp"].max().rename("last_seen").reset_index()
+    out = users[["customer_id"]].merge(totals, on="customer_id", how="left")
+    return out.merge(last_seen, on="customer_id", how="left")
+
+
+def key_joins(users, events, revenue):
+    out = users[["customer_id"]].copy()
+    out["amount"] = per_customer_sum(fact_keys(users, revenue), len(users), weights=revenue["amount"])
+    keys = events[KEY_COLUMN].to_numpy()
+    known = keys >= 0
+    last_seen = pd.Series(events["event_timestamp"].to_numpy()[known]).groupby(keys[known]).max()
+    out["last_seen"] = last_seen.reindex(np.arange(len(users))).to_numpy()
+    return out
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-users", type=int, default=SIZES[-1])
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for n in [s for s in SIZES if s <= args.max_users]:
+        data = generate_tables(n)
+        _, string_s = timed(string_joins, data["users"], data["events"], data["revenue"])
+        keyed, keying_s = timed(attach_customer_keys, data)
+        _, key_s = timed(key_joins, keyed["users"], keyed["events"], keyed["revenue"])
+        print(json.dumps({"users": n, "events": len(data["events"]), "string_merge_s": round(string_s, 4),
+                          "keying_s": round(keying_s, 4), "key_join_s": round(key_s, 4),
+                          "speedup": round(string_s / key_s, 1)}))
+
+
+if __name__ == "__main__":
+    main()
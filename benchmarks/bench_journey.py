@@ -0,0 +1,50 @@
+"""
+Scaling curve for classify_journey_stages (10k -> 10M users).
+
+Usage:
+    python -m benchmarks.bench_journey [--max-users 10000000] [--legacy-max 100000]
+
+The row-wise reference (benchmarks/reference.py) is only timed up to
+--legacy-max users since it grows too slow to be worth waiting for.
+"""
+import argparse
+import json
+import logging
+import time
+
+from benchmarks.reference import reference_classify
+from src.journey.classifier import classify_journey_stages
+from src.utils.generate_data import generate_tables
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-users", type=int, default=SIZES[-1])
+    parser.add_argument("--legacy-max", type=int, default=100_000)
+    args = parser.parse_args()
+
+    logging.getLogger("src.journey.classifier").setLevel(logging.WARNING)
+
+    results = []
+    for n in [s for s in SIZES if s <= args.max_users]:
+        data = generate_tables(n)
+        args_in = (data["users"], data["events"], data["subscriptions"])
+        row = {"users": n, "events": len(data["events"]), "vectorized_s": round(timed(classify_journey_stages, *args_in), 4)}
+        if n <= args.legacy_max:
+            row["rowwise_s"] = round(timed(reference_classify, *args_in), 4)
+            row["speedup"] = round(row["rowwise_s"] / row["vectorized_s"], 1)
+        print(json.dumps(row))
+        results.append(row)
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,53 @@
+"""
+MRR movement table over large subscription sets.
+
+Usage:
+    python -m benchmarks.bench_mrr [--max-subs 1000000]
+
+Subscriptions are spread over three years with ~40% ended and a mix of monthly and
+annual plans; timings double from 10k subscriptions up to --max-subs.
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.mrr import compute_mrr_movements
+
+
+def make_subscriptions(n_subs: int, seed: int = 42) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    as_of = pd.Timestamp.now().normalize()
+    start = as_of - pd.to_timedelta(rng.integers(0, 3 * 365, n_subs), unit="D")
+    ended = rng.random(n_subs) < 0.4
+    end = (start + pd.to_timedelta(rng.integers(1, 365, n_subs), unit="D")).where(ended)
+    return pd.DataFrame({
+        "customer_id": rng.integers(0, max(1, n_subs // 2), n_subs),
+        "start_date": start,
+        "end_date": end,
+        "price": rng.choice(np.array([199, 499, 999]), n_subs),
+        "billing_period": rng.choice(np.array(["monthly", "annual"]), n_subs, p=[0.8, 0.2]),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-subs", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    n = 10_000
+    while n <= args.max_subs:
+        subs = make_subscriptions(n)
+        start = time.perf_counter()
+        table = compute_mrr_movements(subs)
+        print(json.dumps({"subscriptions": n, "months": len(table),
+                          "seconds": round(time.perf_counter() - start, 3)}))
+        n *= 2
+
+
+if __name__ == "__main__":
+    main()
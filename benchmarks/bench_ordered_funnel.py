@@ -0,0 +1,70 @@
+"""
+Ordered funnel over (customer, timestamp)-sorted events vs a per-customer Python loop.
+
+Usage:
+    python -m benchmarks.bench_ordered_funnel [--max-users 10000000] [--loop-max 10000]
+
+Users get random acquisition_channel / country / pricing_plan values so the three
+breakdowns are computed in the same pass. The per-customer loop (groupby + scan of
+each customer's events) is only timed up to --loop-max users.
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.funnel.ordered import DEFAULT_STEPS, ordered_funnel
+from src.utils.generate_data import generate_tables
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+
+
+def per_customer_loop(users, events, steps):
+    events = events.assign(name=events["event_name"].str.lower()).sort_values("event_timestamp", kind="stable")
+    counts = [0] * len(steps)
+    for _, group in events.groupby("customer_id"):
+        previous = None
+        for k, (_, event, window) in enumerate(steps):
+            times = group["event_timestamp"][group["name"] == event]
+            if previous is not None:
+                times = times[times >= previous]
+            if not len(times) or (window is not None and previous is not None
+                                  and times.iloc[0] - previous > pd.Timedelta(days=window)):
+                break
+            counts[k] += 1
+            previous = times.iloc[0]
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-users", type=int, default=SIZES[-1])
+    parser.add_argument("--loop-max", type=int, default=10_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(7)
+
+    for n in [s for s in SIZES if s <= args.max_users]:
+        data = generate_tables(n)
+        users = data["users"].assign(
+            acquisition_channel=rng.choice(np.array(["ads", "organic", "referral"]), n),
+            country=rng.choice(np.array(["US", "GB", "IN", "CA", "AU"]), n),
+            pricing_plan=rng.choice(np.array(["free", "pro", "enterprise"]), n),
+        )
+        start = time.perf_counter()
+        funnel = ordered_funnel(users, data["events"])
+        row = {"users": n, "events": len(data["events"]), "vectorized_s": round(time.perf_counter() - start, 3),
+               "rows": len(funnel)}
+        if n <= args.loop_max:
+            start = time.perf_counter()
+            per_customer_loop(users, data["events"], DEFAULT_STEPS)
+            row["loop_s"] = round(time.perf_counter() - start, 3)
+            row["speedup"] = round(row["loop_s"] / row["vectorized_s"], 1)
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
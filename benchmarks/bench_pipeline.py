@@ -0,0 +1,127 @@
+"""
+End-to-end run_pipeline benchmark on generated data at several scales.
+
+Usage:
+    python -m benchmarks.bench_pipeline [--sizes 10000 100000 1000000] [--repeat 2]
+        [--trace-memory] [--pipeline-args "--workers 4"] [--output results.json]
+        [--baseline previous.json --tolerance 0.25]
+
+For each size (in events) a dataset is generated once with src.utils.generate_data
+under --workdir, then run_pipeline.py runs --repeat times in a fresh process (the
+first run also builds the Parquet input cache). Each run's per-stage wall/CPU time,
+peak RSS and rows (outputs/inspections/profile.json) are collected; --trace-memory
+adds tracemalloc deltas. One JSON line is printed per run and the full report is
+written to --output. With --baseline, stages of the last run per size whose wall
+time grew by more than --tolerance (and 50 ms) are reported and the exit code is 1.
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import shlex
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from src.utils.config import CACHE_DIR, ROOT_DIR
+from src.utils.generate_data import LIFECYCLE_EVENTS_PER_USER, write_dataset
+
+NOISE_FLOOR_SECONDS = 0.05
+
+
+def dataset(workdir: Path, size: int, args) -> Path:
+    """Generates the dataset for `size` unless an identical one already exists."""
+    params = {"events": size, "events_per_user": args.events_per_user, "seed": args.seed, "as_of": args.as_of}
+    data_dir = workdir / f"data-{size}-{args.seed}"
+    manifest = data_dir / "generated.json"
+    if manifest.exists() and json.loads(manifest.read_text())["params"] == params:
+        return data_dir
+    start = time.perf_counter()
+    rows = write_dataset(data_dir, size, events_per_user=args.events_per_user, seed=args.seed, as_of=args.as_of)
+    manifest.write_text(json.dumps({"params": params, "rows": rows,
+                                    "seconds": round(time.perf_counter() - start, 3)}))
+    return data_dir
+
+
+def run_pipeline(data_dir: Path, run_dir: Path, args) -> dict:
+    env = {**os.environ, "P5_DATA_DIR": str(data_dir), "P5_OUTPUTS_DIR": str(run_dir / "outputs"),
+           "P5_CACHE_DIR": str(run_dir / "cache")}
+    cmd = [sys.executable, str(ROOT_DIR / "run_pipeline.py"), *shlex.split(args.pipeline_args)]
+    if args.trace_memory:
+        cmd.append("--profile")
+    start = time.perf_counter()
+    subprocess.run(cmd, env=env, check=True, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    wall = time.perf_counter() - start
+    profile = json.loads((run_dir / "outputs" / "inspections" / "profile.json").read_text())
+    return {"process_seconds": round(wall, 3), **profile}
+
+
+def regressions(report: dict, baseline: dict, tolerance: float):
+    """(size, stage, baseline seconds, seconds) for stages of the last run that got slower."""
+    def last_runs(rep):
+        return {entry["events"]: {s["stage"]: s["wall_seconds"] for s in entry["runs"][-1]["stages"]}
+                for entry in rep["sizes"]}
+    before, after = last_runs(baseline), last_runs(report)
+    found = []
+    for size in sorted(set(before) & set(after)):
+        for stage, old in before[size].items():
+            new = after[size].get(stage)
+            if new is not None and new > old * (1 + tolerance) and new - old > NOISE_FLOOR_SECONDS:
+                found.append((size, stage, old, new))
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="Dataset sizes in events (10^4 .. 10^8)")
+    parser.add_argument("--events-per-user", type=float, default=LIFECYCLE_EVENTS_PER_USER)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", default=None, help="Last day of the generated history (default: today)")
+    parser.add_argument("--repeat", type=int, default=2, help="Pipeline runs per size (the first builds the cache)")
+    parser.add_argument("--pipeline-args", default="", help="Extra run_pipeline.py arguments, e.g. '--workers 4'")
+    parser.add_argument("--trace-memory", action="store_true", help="Pass --profile (tracemalloc + cProfile)")
+    parser.add_argument("--workdir", type=Path, default=CACHE_DIR / "bench")
+    parser.add_argument("--output", type=Path, default=None, help="Report file (default: <workdir>/pipeline-<time>.json)")
+    parser.add_argument("--baseline", type=Path, default=None, help="Earlier report to compare stage times with")
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    report = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pipeline_args": args.pipeline_args,
+        "sizes": [],
+    }
+    for size in args.sizes:
+        data_dir = dataset(args.workdir, size, args)
+        generated = json.loads((data_dir / "generated.json").read_text())
+        entry = {"events": size, "rows": generated["rows"], "generate_seconds": generated["seconds"], "runs": []}
+        for run in range(args.repeat):
+            profile = run_pipeline(data_dir, args.workdir / f"run-{size}-{args.seed}", args)
+            entry["runs"].append(profile)
+            print(json.dumps({"events": size, "run": run, "process_seconds": profile["process_seconds"],
+                              "peak_rss_mb": profile["peak_rss_mb"],
+                              "stages": {s["stage"]: s["wall_seconds"] for s in profile["stages"]}}))
+        report["sizes"].append(entry)
+
+    output = args.output or args.workdir / f"pipeline-{time.strftime('%Y%m%d-%H%M%S')}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(json.dumps({"report": str(output)}))
+
+    if args.baseline is not None:
+        found = regressions(report, json.loads(args.baseline.read_text()), args.tolerance)
+        for size, stage, old, new in found:
+            print(json.dumps({"regression": stage, "events": size, "baseline_seconds": old, "seconds": new}))
+        return 1 if found else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
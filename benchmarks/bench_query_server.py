@@ -0,0 +1,159 @@
+"""
+Load test for the query server (src/serving/query_server.py).
+
+Usage:
+    python -m benchmarks.bench_query_server [--customers 1000000] [--connections 32] [--duration 5]
+    python -m benchmarks.bench_query_server --url http://127.0.0.1:8765   # an already running server
+
+Without --url a server is started in a subprocess, over synthetic outputs with
+--customers rows (or over outputs/ with --customers 0). Keep-alive clients send a
+mix of customer lookups (80%), stage / segment counts and KPI queries for
+--duration seconds; prints requests/s and latency percentiles as one JSON line,
+plus the in-process query time (index lookup + JSON, no HTTP) per query kind.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from urllib.parse import urlsplit
+
+import numpy as np
+import pandas as pd
+
+from src.serving.query_server import QueryService
+from src.utils.config import OUTPUTS_DIR
+
+STAGES = np.array(["Acquisition", "Activation", "Engagement", "Retained", "Dormant", "Churned"])
+LIFECYCLE = {"Acquisition": "New", "Activation": "Churned", "Engagement": "Active", "Retained": "Active",
+             "Dormant": "At-Risk", "Churned": "Churned"}
+
+
+def write_outputs(directory: Path, n: int, seed: int = 7):
+    """Synthetic segmentation.csv / churn_scores.csv / metrics.json with n customers."""
+    rng = np.random.default_rng(seed)
+    ids = np.char.add("C", np.char.zfill(np.arange(1, n + 1).astype(str), 8))
+    stages = rng.choice(STAGES, n)
+    pd.DataFrame({
+        "customer_id": ids, "signup_date": "2025-01-01", "is_activated": rng.random(n) < 0.6,
+        "days_since_signup": rng.integers(0, 365, n), "stage": stages,
+        "lifecycle_segment": pd.Series(stages).map(LIFECYCLE), "amount": rng.choice([0.0, 199.0, 999.0], n),
+        "revenue_segment": rng.choice(["Free", "Low-Tier", "High-Tier"], n),
+    }).to_csv(directory / "segmentation.csv", index=False)
+    pd.DataFrame({"customer_id": ids, "churn_score": rng.random(n)}).to_csv(directory / "churn_scores.csv",
+                                                                           index=False)
+    (directory / "metrics.json").write_text(json.dumps({"activation_rate": 0.6, "churn_risk_score": 0.3}))
+    return ids
+
+
+def request_mix(ids, n_requests: int, seed: int = 11):
+    rng = np.random.default_rng(seed)
+    kinds = rng.choice(4, n_requests, p=[0.8, 0.1, 0.05, 0.05])
+    picks = rng.integers(0, len(ids), n_requests) if len(ids) else np.zeros(n_requests, dtype=int)
+    paths = {1: "/stages", 2: "/segments/At-Risk?limit=10", 3: "/metrics/activation_rate"}
+    return [f"/customers/{ids[i]}" if kind == 0 and len(ids) else paths.get(kind, "/health")
+            for kind, i in zip(kinds, picks)]
+
+
+async def client(host, port, paths, deadline, latencies):
+    reader, writer = await asyncio.open_connection(host, port)
+    i = 0
+    while time.perf_counter() < deadline:
+        start = time.perf_counter()
+        writer.write(f"GET {paths[i % len(paths)]} HTTP/1.1\r\nHost: {host}\r\n\r\n".encode())
+        head = await reader.readuntil(b"\r\n\r\n")
+        length = int(head.split(b"Content-Length: ")[1].split(b"\r\n")[0])
+        await reader.readexactly(length)
+        latencies.append(time.perf_counter() - start)
+        i += 1
+    writer.close()
+
+
+async def load_test(host, port, paths, connections, duration):
+    latencies = []
+    deadline = time.perf_counter() + duration
+    start = time.perf_counter()
+    await asyncio.gather(*[client(host, port, paths[k::connections], deadline, latencies)
+                           for k in range(connections)])
+    return latencies, time.perf_counter() - start
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_ready(host, port, timeout=120.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError("query server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default=None)
+    parser.add_argument("--customers", type=int, default=1_000_000)
+    parser.add_argument("--connections", type=int, default=32)
+    parser.add_argument("--duration", type=float, default=5.0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        outputs = OUTPUTS_DIR
+        if args.customers:
+            outputs = Path(tmp)
+            (outputs / "inspections").mkdir()
+            write_outputs(outputs, args.customers)
+
+        service = QueryService(outputs)
+        start = time.perf_counter()
+        service.reload_if_changed()
+        load_s = time.perf_counter() - start
+        ids = service.snapshot.ids
+        paths = request_mix(ids, 20_000)
+        for kind, prefix in [("customer", "/customers/"), ("stage_counts", "/stages"),
+                             ("segment_page", "/segments/"), ("kpi", "/metrics/")]:
+            sample = [p for p in paths if p.startswith(prefix)][:2000] or [prefix]
+            start = time.perf_counter()
+            for path in sample:
+                json.dumps(service.handle(path)[1])
+            print(json.dumps({"query": kind, "customers": len(ids),
+                              "in_process_us": round((time.perf_counter() - start) / len(sample) * 1e6, 1)}))
+
+        server = None
+        if args.url:
+            url = urlsplit(args.url)
+            host, port = url.hostname, url.port
+        else:
+            host, port = "127.0.0.1", free_port()
+            server = subprocess.Popen([sys.executable, "-m", "src.serving.query_server", "--port", str(port),
+                                       "--outputs-dir", str(outputs)],
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_ready(host, port)
+            latencies, elapsed = asyncio.run(load_test(host, port, paths, args.connections, args.duration))
+        finally:
+            if server is not None:
+                server.terminate()
+                server.wait()
+
+    ms = np.array(latencies) * 1000
+    print(json.dumps({"customers": len(ids), "index_load_s": round(load_s, 2), "connections": args.connections,
+                      "requests": len(ms), "requests_per_s": int(len(ms) / elapsed),
+                      "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                      "p99_ms": round(float(np.percentile(ms, 99)), 3)}))
+
+
+if __name__ == "__main__":
+    main()
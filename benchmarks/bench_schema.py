@@ -0,0 +1,57 @@
+"""
+Memory and parse time of the input tables without and with the declared schema.
+
+Usage:
+    python -m benchmarks.bench_schema [--events 10000000]
+
+A dataset is generated with src.utils.generate_data, then each table is parsed
+twice: plain read_csv (object strings, int64, parsed dates) and with the schema
+from src.etl.schema (categoricals, Arrow strings, float64 money). Prints one JSON line per
+table and a total line with deep memory_usage in MB.
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.etl.schema import SCHEMAS, apply_schema, csv_options, date_columns
+from src.utils.generate_data import write_dataset
+
+MB = 1024 * 1024
+
+
+def measure(parse):
+    start = time.perf_counter()
+    df = parse()
+    return df.memory_usage(deep=True).sum() / MB, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=10_000_000)
+    parser.add_argument("--events-per-user", type=float, default=4.0)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    totals = {"before_mb": 0.0, "after_mb": 0.0}
+    with tempfile.TemporaryDirectory() as tmp:
+        write_dataset(Path(tmp), args.events, events_per_user=args.events_per_user, as_of="2025-12-31")
+        for name in SCHEMAS:
+            source = Path(tmp) / f"{name}.csv"
+            before, before_s = measure(lambda: pd.read_csv(source, parse_dates=date_columns(name)))
+            after, after_s = measure(lambda: apply_schema(name, pd.read_csv(source, **csv_options(name))))
+            totals["before_mb"] += before
+            totals["after_mb"] += after
+            print(json.dumps({"table": name, "before_mb": round(before, 1), "after_mb": round(after, 1),
+                              "ratio": round(before / after, 2), "before_s": round(before_s, 2),
+                              "after_s": round(after_s, 2)}))
+    print(json.dumps({"table": "total", **{k: round(v, 1) for k, v in totals.items()},
+                      "ratio": round(totals["before_mb"] / totals["after_mb"], 2)}))
+
+
+if __name__ == "__main__":
+    main()
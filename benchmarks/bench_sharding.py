@@ -0,0 +1,65 @@
+"""
+Scaling of the sharded journey/segmentation/KPI chain with the number of processes.
+
+Usage:
+    python -m benchmarks.bench_sharding [--users 2000000] [--max-processes 64]
+
+Times the single-process chain once, then run_sharded() with 1, 2, 4, ... processes
+(one shard per process) up to --max-processes or the machine's core count.
+"""
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from src.etl.event_index import build_event_index
+from src.funnel.engine import compute_funnel_metrics
+from src.journey.classifier import classify_journey_stages
+from src.segmentation.engine import create_segments
+from src.analytics.kpis import calculate_kpis
+from src.utils.generate_data import generate_tables
+from src.utils.sharding import run_sharded
+
+
+def single_process(data, out_dir: Path):
+    users, subs = data["users"], data["subscriptions"]
+    index = build_event_index(data["events"])
+    journey = classify_journey_stages(users, None, subs, index)
+    journey.to_csv(out_dir / "journey.csv", index=False)
+    segments = create_segments(journey, data["revenue"])
+    segments.to_csv(out_dir / "segments.csv", index=False)
+    compute_funnel_metrics(users, None, subs, index)
+    calculate_kpis(users, None, segments, subs, index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2_000_000)
+    parser.add_argument("--max-processes", type=int, default=64)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    data = generate_tables(args.users)
+    max_procs = min(args.max_processes, os.cpu_count() or 1)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        start = time.perf_counter()
+        single_process(data, tmp)
+        baseline = time.perf_counter() - start
+        print(json.dumps({"mode": "single_process", "users": args.users, "seconds": round(baseline, 3)}))
+
+        n = 1
+        while n <= max_procs:
+            start = time.perf_counter()
+            run_sharded(data, n, tmp / f"journey-{n}", tmp / f"segments-{n}", processes=n)
+            elapsed = time.perf_counter() - start
+            print(json.dumps({"mode": "sharded", "processes": n, "users": args.users,
+                              "seconds": round(elapsed, 3), "speedup": round(baseline / elapsed, 2)}))
+            n *= 2
+
+
+if __name__ == "__main__":
+    main()
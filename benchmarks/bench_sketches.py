@@ -0,0 +1,72 @@
+"""
+Approximate distinct counts and quantiles: HyperLogLog / QuantileSketch build time, size
+and measured error next to the exact pandas nunique / quantile on the same arrays.
+
+Usage:
+    python -m benchmarks.bench_sketches [--max-rows 10000000] [--precision 12] [--accuracy 0.01]
+
+Rows carry customer ids drawn from rows / 5 customers and log-normal amounts. The
+sketch is built in 8 chunks and merged, as a chunked or sharded update would.
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.utils.sketches import HyperLogLog, QuantileSketch, hash_values
+
+SIZES = [100_000, 1_000_000, 10_000_000]
+QUANTILES = [0.5, 0.9, 0.99]
+CHUNKS = 8
+
+
+def make_rows(n_rows: int, seed: int = 9):
+    rng = np.random.default_rng(seed)
+    n_customers = max(n_rows // 5, 1)
+    ids = np.char.add("C", np.char.zfill(np.arange(n_customers).astype(str), 8))
+    customer_id = pd.Categorical.from_codes(rng.integers(0, n_customers, n_rows), ids)
+    return pd.Series(customer_id), rng.lognormal(4, 1.5, n_rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-rows", type=int, default=SIZES[-1])
+    parser.add_argument("--precision", type=int, default=12)
+    parser.add_argument("--accuracy", type=float, default=0.01)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for n in [s for s in SIZES if s <= args.max_rows]:
+        customer_id, amounts = make_rows(n)
+        # Per-row id hashes, as sketch_events takes them from the customer dimension
+        hashes = hash_values(customer_id)
+
+        start = time.perf_counter()
+        hll, quantiles = HyperLogLog(args.precision), QuantileSketch(args.accuracy)
+        for rows in np.array_split(np.arange(n), CHUNKS):
+            hll.merge(HyperLogLog(args.precision).add_hashes(hashes[rows]))
+            quantiles.merge(QuantileSketch(args.accuracy).add(amounts[rows]))
+        sketch_s = time.perf_counter() - start
+
+        start = time.perf_counter()
+        distinct = customer_id.nunique()
+        exact = np.quantile(amounts, QUANTILES, method="lower")
+        exact_s = time.perf_counter() - start
+
+        size = len(json.dumps(hll.to_dict())) + len(json.dumps(quantiles.to_dict()))
+        quantile_error = max(abs(quantiles.quantile(q) / e - 1) for q, e in zip(QUANTILES, exact))
+        print(json.dumps({
+            "rows": n, "distinct": distinct, "sketch_s": round(sketch_s, 3), "exact_s": round(exact_s, 3),
+            "sketch_bytes": size,
+            "exact_input_mb": round((customer_id.memory_usage(deep=True) + amounts.nbytes) / 2**20, 1),
+            "distinct_error": round(hll.estimate() / distinct - 1, 4),
+            "distinct_std_error": round(hll.relative_error, 4),
+            "max_quantile_error": round(quantile_error, 4), "quantile_error_bound": args.accuracy,
+        }))
+
+
+if __name__ == "__main__":
+    main()
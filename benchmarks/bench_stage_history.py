@@ -0,0 +1,57 @@
+"""
+Daily journey stage history: one classify_journey_stages call per day vs stage_history.
+
+Usage:
+    python -m benchmarks.bench_stage_history [--users 100000] [--days 90] [--loop-days 7]
+
+The per-day loop filters events/subscriptions to each day and re-classifies; it is
+timed over --loop-days days and extrapolated to --days. stage_history computes all
+--days snapshots in one sweep.
+"""
+import argparse
+import json
+import logging
+import time
+from unittest import mock
+
+import pandas as pd
+
+from src.journey.classifier import classify_journey_stages, stage_history
+from src.utils.generate_data import generate_tables
+
+
+def per_day_loop(data, dates):
+    for day in dates:
+        cutoff = day + pd.Timedelta(days=1)
+        events = data["events"][data["events"]["event_timestamp"] < cutoff]
+        subs = data["subscriptions"][data["subscriptions"]["start_date"] < cutoff]
+        with mock.patch.object(pd.Timestamp, "now", return_value=day):
+            classify_journey_stages(data["users"], events, subs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--days", type=int, default=90)
+    parser.add_argument("--loop-days", type=int, default=7)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    data = generate_tables(args.users)
+    today = pd.Timestamp.now().normalize()
+    dates = pd.date_range(today - pd.Timedelta(days=args.days - 1), today)
+
+    start = time.perf_counter()
+    per_day_loop(data, dates[-args.loop_days:])
+    loop_s = (time.perf_counter() - start) * args.days / args.loop_days
+
+    start = time.perf_counter()
+    history = stage_history(data["users"], data["events"], data["subscriptions"], dates)
+    sweep_s = time.perf_counter() - start
+    print(json.dumps({"users": args.users, "events": len(data["events"]), "days": args.days,
+                      "cells": int(history.size), "per_day_loop_s": round(loop_s, 3),
+                      "sweep_s": round(sweep_s, 3), "speedup": round(loop_s / sweep_s, 1)}))
+
+
+if __name__ == "__main__":
+    main()
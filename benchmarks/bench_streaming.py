@@ -0,0 +1,80 @@
+"""
+Peak-RSS benchmark: in-memory events load vs chunked streaming into the event index.
+
+Usage:
+    python -m benchmarks.bench_streaming [--events 5000000] [--chunk-size 1000000]
+
+Data generation and each mode run in fresh subprocesses so ru_maxrss is the
+peak for that mode only (Linux carries the RSS high-water mark across exec).
+"""
+import argparse
+import json
+import logging
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from src.utils.generate_data import generate_blocks
+
+
+def run_mode(mode: str, path: str, chunksize: int):
+    """Child process entry point: builds the index one way and reports its peak RSS."""
+    from src.etl.event_index import build_event_index
+    from src.etl.loader import stream_event_index
+
+    logging.disable(logging.INFO)
+    start = time.perf_counter()
+    if mode == "in_memory":
+        index = build_event_index(pd.read_csv(path, parse_dates=["event_timestamp"]))
+    else:
+        index = stream_event_index(path, chunksize)
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss  # KiB on Linux
+    print(json.dumps({
+        "mode": mode,
+        "events": index["n_events"],
+        "customers": len(index["customers"]),
+        "seconds": round(elapsed, 3),
+        "peak_rss_mb": round(peak_kb / 1024, 1),
+    }))
+
+
+def write_events(path: str, n_events: int):
+    """events.csv of src.utils.generate_data (~10 events per user), written block by block."""
+    for i, tables in enumerate(generate_blocks(n_events, events_per_user=10)):
+        tables["events"].to_csv(path, mode="a" if i else "w", header=i == 0, index=False)
+
+
+def spawn(*args: str):
+    subprocess.run([sys.executable, "-m", "benchmarks.bench_streaming", *args], check=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=5_000_000)
+    parser.add_argument("--chunk-size", type=int, default=1_000_000)
+    parser.add_argument("--run-mode", nargs=2, metavar=("MODE", "PATH"), help=argparse.SUPPRESS)
+    parser.add_argument("--write-events", metavar="PATH", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.write_events:
+        write_events(args.write_events, args.events)
+        return
+    if args.run_mode:
+        run_mode(args.run_mode[0], args.run_mode[1], args.chunk_size)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / "events.csv")
+        spawn("--events", str(args.events), "--write-events", path)
+        for mode in ["in_memory", "stream"]:
+            spawn("--chunk-size", str(args.chunk_size), "--run-mode", mode, path)
+
+
+if __name__ == "__main__":
+    main()
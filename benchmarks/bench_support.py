@@ -0,0 +1,81 @@
+"""
+Support-load features: ticket_features (one sort + bincounts) vs pandas groupby
+quantile / value_counts, and its traced memory peak next to the size of the tickets
+table itself.
+
+Usage:
+    python -m benchmarks.bench_support [--max-tickets 10000000] [--groupby-max 1000000]
+
+Tickets are spread over tickets / 2 customers (the generator's 0.5 tickets per user
+inverted), with 1% left unresolved; groupby is only timed up to --groupby-max tickets.
+"""
+import argparse
+import json
+import logging
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+from src.analytics.support import TICKET_CATEGORIES, TICKET_PRIORITIES, ticket_features
+from src.etl.customers import attach_customer_keys
+
+SIZES = [100_000, 1_000_000, 10_000_000]
+
+
+def make_tickets(n_tickets: int, seed: int = 5):
+    rng = np.random.default_rng(seed)
+    n_users = max(n_tickets // 2, 1)
+    ids = np.char.add("C", np.char.zfill(np.arange(1, n_users + 1).astype(str), 8))
+    created = pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 365, n_tickets), unit="D")
+    resolved = created + pd.to_timedelta(rng.integers(1, 101, n_tickets), unit="h")
+    tickets = pd.DataFrame({
+        "customer_id": pd.Categorical.from_codes(rng.integers(0, n_users, n_tickets), ids),
+        "created_at": created,
+        "resolved_at": resolved.where(rng.random(n_tickets) >= 0.01),
+        "issue_category": pd.Categorical.from_codes(rng.integers(0, 4, n_tickets), TICKET_CATEGORIES),
+        "priority": pd.Categorical.from_codes(rng.integers(0, 3, n_tickets), TICKET_PRIORITIES),
+    })
+    keyed = attach_customer_keys({"users": pd.DataFrame({"customer_id": ids}), "support_tickets": tickets})
+    return keyed["users"], keyed["support_tickets"]
+
+
+def with_groupby(users, tickets):
+    hours = (tickets["resolved_at"] - tickets["created_at"]) / pd.Timedelta(hours=1)
+    grouped = hours.groupby(tickets["customer_key"])
+    quantiles = grouped.quantile([0.5, 0.9]).unstack()
+    mix = [tickets.groupby("customer_key")[column].value_counts(normalize=True).unstack()
+           for column in ["priority", "issue_category"]]
+    return pd.concat([tickets.groupby("customer_key").size(), quantiles, *mix], axis=1).reindex(users.index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-tickets", type=int, default=SIZES[-1])
+    parser.add_argument("--groupby-max", type=int, default=1_000_000)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    for n in [s for s in SIZES if s <= args.max_tickets]:
+        users, tickets = make_tickets(n)
+        table_mb = tickets.memory_usage(deep=True).sum() / 2**20
+        tracemalloc.start()
+        start = time.perf_counter()
+        ticket_features(users, tickets)
+        elapsed = time.perf_counter() - start
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        row = {"tickets": n, "customers": len(users), "features_s": round(elapsed, 3),
+               "tickets_per_s": int(n / elapsed), "table_mb": round(table_mb, 1),
+               "peak_traced_mb": round(peak / 2**20, 1)}
+        if n <= args.groupby_max:
+            start = time.perf_counter()
+            with_groupby(users, tickets)
+            row["groupby_s"] = round(time.perf_counter() - start, 3)
+            row["speedup"] = round(row["groupby_s"] / elapsed, 1)
+        print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Tableau extracts: the streamed builder (src.exports.tableau) vs a naive rebuild (a
+whole-table users x subscriptions merge, an events groupby and full rewrites), and the
+cost of one day's append vs rewriting the daily events and revenue transaction
+extracts. --trace-memory adds the traced allocation peaks of both builds.
+
+Usage:
+    python -m benchmarks.bench_tableau [--users 1000000] [--events-per-user 5] [--days 365] [--trace-memory]
+
+Revenue rows are written to a temporary revenue.csv: the extracts read the invoices
+from it, and the append only those past the previous watermark, as a pipeline run does.
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from src.etl.customers import attach_customer_keys
+from src.etl.event_index import daily_event_counts
+from src.etl.incremental import appended_range
+from src.exports import tableau
+
+EVENT_NAMES = ["signup", "activate", "login", "feature_use", "upgrade"]
+
+
+def make_data(n_users: int, events_per_user: int, n_days: int, seed: int = 8):
+    rng = np.random.default_rng(seed)
+    start = pd.Timestamp("2025-01-01")
+    ids = np.char.add("C", np.char.zfill(np.arange(n_users).astype(str), 8))
+    users = pd.DataFrame({
+        "customer_id": pd.Categorical(ids),
+        "email": pd.array(np.char.add(ids, "@example.com"), dtype="string[pyarrow]"),
+        "signup_date": start + pd.to_timedelta(rng.integers(0, n_days, n_users), unit="D"),
+        "country": pd.Categorical.from_codes(rng.integers(0, 5, n_users), ["US", "GB", "IN", "DE", "FR"]),
+        "status": pd.Categorical.from_codes(rng.integers(0, 2, n_users), ["active", "cancelled"]),
+    })
+    n_subs = n_users // 4
+    subs = pd.DataFrame({
+        "subscription_id": pd.array(np.char.add("S", np.arange(n_subs).astype(str)), dtype="string[pyarrow]"),
+        "customer_id": pd.Categorical.from_codes(rng.integers(0, n_users, n_subs), ids),
+        "plan": pd.Categorical.from_codes(rng.integers(0, 2, n_subs), ["basic", "pro"]),
+        "start_date": start + pd.to_timedelta(rng.integers(0, n_days, n_subs), unit="D"),
+        "status": pd.Categorical.from_codes(rng.integers(0, 2, n_subs), ["active", "cancelled"]),
+        "price": rng.choice([49.0, 199.0, 999.0], n_subs),
+    })
+    n_events = n_users * events_per_user
+    events = pd.DataFrame({
+        "customer_id": pd.Categorical.from_codes(rng.integers(0, n_users, n_events), ids),
+        "event_name": pd.Categorical.from_codes(rng.integers(0, len(EVENT_NAMES), n_events), EVENT_NAMES),
+        "event_timestamp": start + pd.to_timedelta(np.sort(rng.integers(0, n_days * 86_400, n_events)), unit="s"),
+    })
+    n_invoices = n_users * 3
+    revenue = pd.DataFrame({
+        "invoice_id": np.char.add("I", np.arange(n_invoices).astype(str)),
+        "customer_id": pd.Categorical.from_codes(rng.integers(0, n_users, n_invoices), ids),
+        "amount": rng.choice([49.0, 199.0, 999.0], n_invoices),
+        "revenue_date": start + pd.to_timedelta(np.sort(rng.integers(0, n_days, n_invoices)), unit="D"),
+        "revenue_type": "recurring",
+    })
+    return attach_customer_keys({"users": users, "subscriptions": subs, "events": events, "revenue": revenue})
+
+
+def naive_rebuild(data, directory: Path):
+    master = data["users"].merge(data["subscriptions"], how="left", on="customer_id", suffixes=("", "_sub"))
+    master.drop(columns=["customer_key", "customer_key_sub"]).to_csv(directory / tableau.CUSTOMER_MASTER, index=False)
+    events = data["events"]
+    daily = events.groupby([events["event_timestamp"].dt.strftime("%Y-%m-%d").rename("date"), "event_name"],
+                           observed=True).size().rename("count").reset_index()
+    daily.to_csv(directory / tableau.DAILY_EVENTS, index=False)
+    data["revenue"].drop(columns=["customer_key"]).to_csv(directory / tableau.REVENUE_TRANSACTIONS, index=False)
+
+
+def timed(fn, *args) -> float:
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def peak_mb(fn, *args) -> float:
+    """Traced allocation peak of a second run (tracemalloc would skew the timings)."""
+    tracemalloc.start()
+    fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--events-per-user", type=int, default=5)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--trace-memory", action="store_true", help="Also report traced memory peaks (slow)")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    data = make_data(args.users, args.events_per_user, args.days)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / "naive").mkdir()
+        naive_s = timed(naive_rebuild, data, tmp / "naive")
+
+        # Everything but the last day is already exported; the last day then arrives
+        last_day = data["events"]["event_timestamp"].max().normalize()
+        old_events = data["events"][data["events"]["event_timestamp"] < last_day]
+        old_revenue = data["revenue"]["revenue_date"] < last_day
+        tableau.REVENUE_FILE = tmp / "revenue.csv"
+        data["revenue"][old_revenue].drop(columns=["customer_key"]).to_csv(tableau.REVENUE_FILE, index=False)
+        previous = {"daily_events": tableau.write_daily_events(daily_event_counts(old_events), tmp / "daily.csv"),
+                    "revenue_transactions": tableau.write_revenue_transactions(
+                        tmp / "revenue_extract.csv", None, appended_range(tableau.REVENUE_FILE, None)[2])}
+        data["revenue"][~old_revenue].drop(columns=["customer_key"]).to_csv(
+            tableau.REVENUE_FILE, mode="a", header=False, index=False)
+
+        daily_counts = daily_event_counts(data["events"])
+        build_s = timed(tableau.build_extracts, data, daily_counts, None, None, tmp / "extracts")
+
+        def append_day():
+            tableau.write_daily_events(daily_counts, tmp / "daily.csv", previous["daily_events"])
+            tableau.write_revenue_transactions(tmp / "revenue_extract.csv", previous["revenue_transactions"],
+                                               appended_range(tableau.REVENUE_FILE, None)[2])
+
+        def rewrite_day():
+            tableau.write_daily_events(daily_counts, tmp / "daily_full.csv")
+            data["revenue"].drop(columns=["customer_key"]).to_csv(tmp / "revenue_full.csv", index=False)
+
+        append_s, rewrite_s = timed(append_day), timed(rewrite_day)
+        assert (tmp / "daily.csv").read_bytes() == (tmp / "daily_full.csv").read_bytes()
+        assert (tmp / "revenue_extract.csv").read_bytes() == (tmp / "revenue_full.csv").read_bytes()
+        if args.trace_memory:
+            naive_mb = peak_mb(naive_rebuild, data, tmp / "naive")
+            build_mb = peak_mb(tableau.build_extracts, data, daily_counts, None, None, tmp / "extracts")
+
+    row = {
+        "users": args.users, "events": len(data["events"]), "invoices": len(data["revenue"]),
+        "naive_rebuild_s": round(naive_s, 3), "extracts_s": round(build_s, 3), "speedup": round(naive_s / build_s, 1),
+        "new_day_append_s": round(append_s, 3), "new_day_rewrite_s": round(rewrite_s, 3),
+        "append_speedup": round(rewrite_s / append_s, 1),
+    }
+    if args.trace_memory:
+        row.update(naive_peak_mb=round(naive_mb, 1), extracts_peak_mb=round(build_mb, 1))
+    print(json.dumps(row))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+Transition matrices: bincount on paired stage codes vs pandas.crosstab on labels.
+
+Usage:
+    python -m benchmarks.bench_transitions [--max-customers 10000000] [--days 30]
+
+For each size, two random snapshots of stage codes (~10% of customers moving) are
+compared both ways; rolling_transitions then builds the daily stage and lifecycle
+segment links over a --days history.
+"""
+import argparse
+import json
+import logging
+import time
+
+import numpy as np
+import pandas as pd
+
+from src.journey.classifier import STAGES
+from src.journey.transitions import rolling_transitions, transition_matrix
+
+SIZES = [100_000, 1_000_000, 10_000_000]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--max-customers", type=int, default=SIZES[-1])
+    parser.add_argument("--days", type=int, default=30)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    rng = np.random.default_rng(42)
+    labels = np.array(STAGES, dtype=object)
+
+    for n in [s for s in SIZES if s <= args.max_customers]:
+        before = rng.integers(0, len(STAGES), n).astype(np.int8)
+        after = np.where(rng.random(n) < 0.1, rng.integers(0, len(STAGES), n), before).astype(np.int8)
+        bincount_s = timed(transition_matrix, before, after, STAGES)
+        crosstab_s = timed(pd.crosstab, labels[before], labels[after])
+        history = pd.DataFrame(np.repeat(before[:, None], args.days, axis=1),
+                               columns=pd.date_range("2025-01-01", periods=args.days))
+        rolling_s = timed(rolling_transitions, history)
+        print(json.dumps({"customers": n, "bincount_s": round(bincount_s, 4), "crosstab_s": round(crosstab_s, 4),
+                          "speedup": round(crosstab_s / bincount_s, 1), "days": args.days,
+                          "rolling_s": round(rolling_s, 3)}))
+
+
+if __name__ == "__main__":
+    main()
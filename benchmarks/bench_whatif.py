@@ -0,0 +1,69 @@
+"""
+What-if sensitivity grid: the batched, memoized WhatIf.sweep vs re-running
+classify_journey_stages / create_segments / calculate_kpis once per scenario.
+
+Usage:
+    python -m benchmarks.bench_whatif [--users 1000000] [--loop-scenarios 3]
+
+The grid is 5 activation x 5 churn x 4 retention x 5 high-tier values (500 scenarios).
+The per-scenario loop is timed on --loop-scenarios of them and extrapolated to the grid;
+the second sweep is answered from the LRU cache.
+"""
+import argparse
+import json
+import logging
+import time
+
+from src.analytics.churn import score_customers
+from src.analytics.kpis import calculate_kpis
+from src.analytics.mrr import compute_mrr_movements
+from src.analytics.whatif import WhatIf, scenario_grid
+from src.etl.event_index import build_event_index
+from src.journey.classifier import StageThresholds, classify_journey_stages
+from src.segmentation.engine import create_segments
+from src.utils.generate_data import generate_tables
+
+GRID = {"activation_window_days": [7, 10, 14, 21, 28], "churn_window_days": [7, 14, 30, 45, 60],
+        "retention_window_days": [14, 30, 60, 90], "high_tier_revenue": [100, 250, 500, 750, 1000]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--loop-scenarios", type=int, default=3)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    data = generate_tables(args.users)
+    users, events, subs = data["users"], data["events"], data["subscriptions"]
+    index = build_event_index(events, len(users))
+    mrr = compute_mrr_movements(subs)
+    churn = score_customers(users, index, data["revenue"])
+    grid = scenario_grid(**GRID)
+
+    start = time.perf_counter()
+    whatif = WhatIf.from_data(data, index, churn, mrr)
+    base_s = time.perf_counter() - start
+    start = time.perf_counter()
+    whatif.sweep(grid)
+    sweep_s = time.perf_counter() - start
+    start = time.perf_counter()
+    whatif.sweep(grid)
+    cached_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for s in grid[:args.loop_scenarios]:
+        journey = classify_journey_stages(users, events, subs, index,
+                                          StageThresholds(s.activation_window_days, s.churn_window_days))
+        segments = create_segments(journey, data["revenue"], high_tier_revenue=s.high_tier_revenue)
+        calculate_kpis(users, events, segments, subs, index, mrr, churn,
+                       retention_window_days=s.retention_window_days)
+    loop_s = (time.perf_counter() - start) / max(args.loop_scenarios, 1) * len(grid)
+
+    print(json.dumps({"users": args.users, "scenarios": len(grid), "base_s": round(base_s, 3),
+                      "sweep_s": round(sweep_s, 3), "cached_sweep_s": round(cached_s, 4),
+                      "loop_s_est": round(loop_s, 1), "speedup": round(loop_s / (base_s + sweep_s), 1)}))
+
+
+if __name__ == "__main__":
+    main()
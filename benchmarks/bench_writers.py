@@ -0,0 +1,71 @@
+"""
+Output writers: plain to_csv vs the csv / csv.gz / parquet formats of src.utils.writers.
+
+Usage:
+    python -m benchmarks.bench_writers [--users 1000000] [--workers 4]
+
+Builds the segmentation table for --users synthetic customers, then times each format
+writing it once and writing the journey + segmentation pair with 1 and --workers
+writer stages in flight. Files go to a temporary directory; sizes are reported in MB.
+"""
+import argparse
+import json
+import logging
+import tempfile
+import time
+from pathlib import Path
+
+from src.journey.classifier import classify_journey_stages
+from src.segmentation.engine import create_segments
+from src.utils.dag import run_dag
+from src.utils.generate_data import generate_tables
+from src.utils.writers import FORMATS, month_partition, output_path, write_table
+
+MB = 1024 * 1024
+
+
+def size_mb(path: Path) -> float:
+    files = [path] if path.is_file() else [p for p in path.rglob("*") if p.is_file()]
+    return round(sum(p.stat().st_size for p in files) / MB, 2)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--workers", type=int, default=4)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    data = generate_tables(args.users)
+    journey = classify_journey_stages(data["users"], data["events"], data["subscriptions"])
+    segments = create_segments(journey, data["revenue"])
+    partitions = {"customer_journey": month_partition("signup_date", "signup_month"),
+                  "segmentation": lambda df: df["lifecycle_segment"]}
+    tables = {"customer_journey": journey, "segmentation": segments}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        start = time.perf_counter()
+        segments.to_csv(tmp / "plain.csv", index=False)
+        print(json.dumps({"users": args.users, "writer": "to_csv", "seconds": round(time.perf_counter() - start, 3),
+                          "mb": size_mb(tmp / "plain.csv")}))
+        for fmt in FORMATS:
+            path = output_path(tmp / "segmentation.csv", fmt)
+            start = time.perf_counter()
+            write_table(segments, path, fmt, partitions["segmentation"])
+            print(json.dumps({"users": args.users, "writer": fmt, "seconds": round(time.perf_counter() - start, 3),
+                              "mb": size_mb(path)}))
+            for workers in sorted({1, args.workers}):
+                stages = {
+                    name: (lambda name=name, df=df: write_table(df, output_path(tmp / f"{workers}-{name}.csv", fmt),
+                                                                fmt, partitions[name]), [])
+                    for name, df in tables.items()
+                }
+                start = time.perf_counter()
+                run_dag(stages, workers=workers)
+                print(json.dumps({"users": args.users, "writer": fmt, "files": len(stages), "workers": workers,
+                                  "seconds": round(time.perf_counter() - start, 3)}))
+
+
+if __name__ == "__main__":
+    main()
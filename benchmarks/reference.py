@@ -0,0 +1,58 @@
+"""
+Straightforward reference implementations, kept as the parity baselines of the tests
+and benchmarks; the pipeline never calls them:
+- reference_classify: the original row-wise journey classifier (set lookups and
+  DataFrame.apply per row), for src.journey.classifier
+- reference_matrix: per-cohort retention with pandas Periods, for src.cohorts.engine
+"""
+import pandas as pd
+
+# pandas Period frequency per src.cohorts.engine grain
+REFERENCE_FREQ = {"day": "D", "week": "W-SUN", "month": "M"}
+
+
+def reference_classify(users, events, subs):
+    journey = users[["customer_id", "signup_date"]].copy()
+    today = pd.Timestamp.now().normalize()
+
+    act_events = events[events["event_name"].str.lower() == "activate"]
+    activated_ids = set(act_events["customer_id"])
+    journey["is_activated"] = journey["customer_id"].apply(lambda x: x in activated_ids)
+
+    active_sub_ids = set(subs[subs["status"] == "active"]["customer_id"])
+    journey["has_active_sub"] = journey["customer_id"].apply(lambda x: x in active_sub_ids)
+
+    last_active = events.groupby("customer_id", observed=True)["event_timestamp"].max().reset_index()
+    last_active.rename(columns={"event_timestamp": "last_seen"}, inplace=True)
+    journey = journey.merge(last_active, on="customer_id", how="left")
+
+    journey["days_since_signup"] = (today - journey["signup_date"]).dt.days
+    journey["days_since_last_seen"] = (today - journey["last_seen"]).dt.days.fillna(9999)
+
+    def classify(row):
+        if row["has_active_sub"]:
+            return "Retained"
+        if row["is_activated"]:
+            if row["days_since_last_seen"] <= 30:
+                return "Engagement"
+            else:
+                return "Dormant"
+        if row["days_since_signup"] <= 14:
+            return "Acquisition"
+        return "Churned"
+
+    journey["stage"] = journey.apply(classify, axis=1)
+    return journey
+
+
+def reference_matrix(users, events, freq, max_periods):
+    """Share of each signup cohort (Period of `freq`) with an event 0..max_periods-1 periods later."""
+    cohort = users.set_index("customer_id")["signup_date"].dt.to_period(freq)
+    ev = events[events["customer_id"].isin(cohort.index)]
+    ev_cohort = ev["customer_id"].map(cohort)
+    offset = (ev["event_timestamp"].dt.to_period(freq) - ev_cohort).map(lambda p: p.n)
+    pairs = pd.DataFrame({"cohort": ev_cohort, "offset": offset, "customer_id": ev["customer_id"]})
+    pairs = pairs[(pairs["offset"] >= 0) & (pairs["offset"] < max_periods)].drop_duplicates()
+    counts = pairs.groupby(["cohort", "offset"]).size().unstack(fill_value=0)
+    counts = counts.reindex(columns=range(max_periods), fill_value=0)
+    return counts.div(cohort.value_counts(), axis=0).fillna(0.0)
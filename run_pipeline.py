@@ -1,56 +1,302 @@
+import argparse
+import io
+import sys
 import pandas as pd
 import json
 import logging
 from src.etl.loader import load_data
+from src.etl.incremental import load_incremental, save_state
+from src.etl.event_index import build_event_index, daily_event_counts
 from src.funnel.engine import compute_funnel_metrics
-from src.journey.classifier import classify_journey_stages
+from src.funnel.ordered import DEFAULT_STEPS, ordered_funnel, parse_steps
+from src.journey.classifier import classify_journey_stages, stage_history, stage_counts
+from src.journey.transitions import rolling_transitions
 from src.segmentation.engine import create_segments
 from src.analytics.kpis import calculate_kpis
+from src.analytics.churn import score_customers
+from src.analytics.support import ticket_features
+from src.analytics.mrr import compute_mrr_movements, revenue_retention_kpis
+from src.cohorts.engine import compute_cohort_retention, GRAINS
+from src.exports.tableau import build_extracts
 from src.utils.config import (
     KPI_SUMMARY_FILE, CUSTOMER_JOURNEY_FILE, FUNNEL_FILE, 
-    METRICS_FILE, SEGMENTS_FILE, OUTPUTS_DIR
+    METRICS_FILE, SEGMENTS_FILE, OUTPUTS_DIR, EVENTS_CHUNK_SIZE,
+    SHARDED_JOURNEY_DIR, SHARDED_SEGMENTS_DIR, COHORT_MATRIX_FILE, MRR_BREAKDOWN_FILE,
+    PROFILE_FILE, PROFILE_STATS_DIR, STAGE_HISTORY_FILE, STAGE_TRANSITIONS_FILE, ORDERED_FUNNEL_FILE,
+    CHURN_SCORES_FILE, SHARDED_CHURN_DIR
 )
+from src.utils.dag import run_dag
+from src.utils.sharding import run_sharded
+from src.utils.profiling import StageProfiler
+from src.utils.writers import FORMATS, month_partition, output_path, write_table, write_text
+from src.utils.timeline import day_range
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def main():
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="SaaS customer journey analytics pipeline")
+    parser.add_argument("--stream-events", action="store_true",
+                        help="Fold events.csv into per-customer aggregates chunk by chunk instead of loading it whole")
+    parser.add_argument("--chunk-size", type=int, default=EVENTS_CHUNK_SIZE,
+                        help=f"Event rows per chunk in --stream-events mode (default: {EVENTS_CHUNK_SIZE})")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="Parse the input CSVs directly instead of using the typed Parquet cache")
+    parser.add_argument("--rebuild-cache", action="store_true",
+                        help="Force the Parquet input cache to be rebuilt from the CSVs")
+    parser.add_argument("--cohort-grain", choices=GRAINS, default="month",
+                        help="Period size for the cohort retention matrix (default: month); it covers "
+                             "30 days, 12 weeks or 8 months after signup (COHORT_MAX_PERIODS)")
+    parser.add_argument("--funnel-steps", type=parse_steps, default=DEFAULT_STEPS,
+                        help="Ordered funnel steps as event[:window_days],... (default: signup,activate:14,upgrade)")
+    parser.add_argument("--history-days", type=int, default=0,
+                        help="Also classify every customer as of each of the last N days and write daily stage "
+                             "counts and stage transitions (default: 0, off)")
+    parser.add_argument("--transition-step", type=int, default=1,
+                        help="Days between the two snapshots of each --history-days transition window (default: 1)")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Run up to N independent stages/output writes concurrently (default: 1, serial)")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only read events/revenue appended since the last incremental run and merge them into saved state")
+    parser.add_argument("--verify-incremental", action="store_true",
+                        help="Compare outputs derived from incremental state with a full rebuild and exit")
+    parser.add_argument("--shards", type=int, default=0,
+                        help="Hash-partition customers into N shards processed by N worker processes; "
+                             "journey/segmentation rows are written as per-shard part files")
+    parser.add_argument("--output-format", choices=FORMATS, default="csv",
+                        help="Format of the tabular outputs: csv (default), gzip-compressed csv.gz, or parquet "
+                             "(journey partitioned by signup month, segmentation by lifecycle segment)")
+    parser.add_argument("--profile", action="store_true",
+                        help="Also trace allocations (tracemalloc) and dump cProfile stats per stage to "
+                             f"{PROFILE_STATS_DIR.relative_to(OUTPUTS_DIR.parent)}/<stage>.prof")
+    args = parser.parse_args(argv)
+    if args.shards and (args.incremental or args.stream_events):
+        parser.error("--shards cannot be combined with --incremental or --stream-events")
+    return args
+
+# Output file -> (stage whose result it serializes, function turning it into the written table;
+# None writes the result as JSON). Tabular outputs take the extension of --output-format.
+OUTPUT_FILES = {
+    FUNNEL_FILE: ("funnel", None),
+    OUTPUTS_DIR / "funnel_summary.csv": ("funnel", lambda funnel: pd.DataFrame([funnel])),
+    ORDERED_FUNNEL_FILE: ("ordered_funnel", lambda funnel: funnel),
+    CUSTOMER_JOURNEY_FILE: ("journey", lambda journey: journey),
+    SEGMENTS_FILE: ("segments", lambda segments: segments),
+    METRICS_FILE: ("kpis", None),
+    KPI_SUMMARY_FILE: ("kpis", lambda kpis: pd.DataFrame([kpis])),
+    COHORT_MATRIX_FILE: ("cohorts", lambda matrix: matrix),
+    MRR_BREAKDOWN_FILE: ("mrr", lambda mrr: mrr),
+    CHURN_SCORES_FILE: ("churn", lambda scores: scores),
+    STAGE_HISTORY_FILE: ("stage_history", stage_counts),
+    STAGE_TRANSITIONS_FILE: ("stage_flows", lambda flows: flows),
+}
+
+# Parquet outputs written as hive-style directories partitioned by these labels
+PARQUET_PARTITIONS = {
+    CUSTOMER_JOURNEY_FILE: month_partition("signup_date", "signup_month"),
+    SEGMENTS_FILE: lambda segments: segments["lifecycle_segment"],
+}
+
+def cohort_stage(data, grain):
+    """Cohort retention needs raw events; it is skipped when only aggregates were loaded."""
+    if data["events"] is None:
+        logger.info("Skipping cohort retention: raw events not loaded in this mode.")
+        return None
+    return compute_cohort_retention(data["users"], data["events"], grain)
+
+def ordered_funnel_stage(data, steps):
+    """The ordered funnel needs raw events; it is skipped when only aggregates were loaded."""
+    if data["events"] is None:
+        logger.info("Skipping ordered funnel: raw events not loaded in this mode.")
+        return None
+    return ordered_funnel(data["users"], data["events"], steps)
+
+def history_stage(data, event_index, days):
+    """Journey stage of every customer as of each of the last `days` days (needs raw events)."""
+    if not days:
+        return None
+    if data["events"] is None:
+        logger.info("Skipping stage history: raw events not loaded in this mode.")
+        return None
+    today = pd.Timestamp.now().normalize()
+    return stage_history(data["users"], data["events"], data["subscriptions"],
+                         day_range(today - pd.Timedelta(days=days - 1), today), event_index)
+
+def compute_stages(load, cohort_grain="month", history_days=0, transition_step=1, funnel_steps=DEFAULT_STEPS):
+    """
+    Stage graph from loaded inputs to results. `load` returns the load_data()-style dict.
+    The funnel, the cohort matrix, the stage history and the journey -> segments chain
+    only share their inputs, so they can run concurrently.
+    """
+    return {
+        "load": (load, []),
+        # Single scan of events shared by the funnel, journey and KPI stages
+        # (already folded chunk by chunk in --stream-events/--incremental mode)
+        "event_index": (lambda d: d["event_index"] if d["event_index"] is not None
+                        else build_event_index(d["events"], len(d["users"])),
+                        ["load"]),
+        # 2. Funnel
+        "funnel": (lambda d, idx: compute_funnel_metrics(d["users"], d["events"], d["subscriptions"], idx),
+                   ["load", "event_index"]),
+        # Ordered, windowed funnel with channel / country / plan breakdowns
+        "ordered_funnel": (lambda d: ordered_funnel_stage(d, funnel_steps), ["load"]),
+        # 3. Journey Classification
+        "journey": (lambda d, idx: classify_journey_stages(d["users"], d["events"], d["subscriptions"], idx),
+                    ["load", "event_index"]),
+        # Support load per customer (ticket counts, resolution percentiles, priority / category mix);
+        # None, and no segmentation columns, without resolvable support tickets
+        "support": (lambda d: None if d["support_tickets"] is None
+                    else ticket_features(d["users"], d["support_tickets"]), ["load"]),
+        # 4. Segmentation
+        "segments": (lambda d, journey, support: create_segments(journey, d["revenue"], support=support),
+                     ["load", "journey", "support"]),
+        # MRR movements (new / expansion / contraction / churn) per month
+        "mrr": (lambda d: compute_mrr_movements(d["subscriptions"]), ["load"]),
+        # Churn features and logistic model score per customer (src.analytics.churn)
+        "churn": (lambda d, idx: score_customers(d["users"], idx, d["revenue"], d["support_tickets"]),
+                  ["load", "event_index"]),
+        # 5. KPIs
+        "kpis": (lambda d, idx, segments, mrr, churn: calculate_kpis(d["users"], d["events"], segments,
+                                                                     d["subscriptions"], idx, mrr, churn),
+                 ["load", "event_index", "segments", "mrr", "churn"]),
+        # Cohort retention matrix
+        "cohorts": (lambda d: cohort_stage(d, cohort_grain), ["load"]),
+        # Daily as-of stage history (--history-days)
+        "stage_history": (lambda d, idx: history_stage(d, idx, history_days), ["load", "event_index"]),
+        # Stage / lifecycle segment flows between snapshots transition_step days apart
+        "stage_flows": (lambda history: None if history is None else rolling_transitions(history, transition_step),
+                        ["stage_history"]),
+    }
+
+def write_file(path, to_table, obj, fmt="csv"):
+    """Writes one output atomically (temp file + rename)."""
+    if obj is None:
+        return
+    if to_table is None:
+        write_text(path, lambda f: json.dump(obj, f, indent=2))
+    else:
+        write_table(to_table(obj), output_path(path, fmt), fmt, PARQUET_PARTITIONS.get(path))
+
+def writer_stages(fmt="csv"):
+    """One independent write stage per output file, so --workers N writes N files at once."""
+    stages = {
+        f"write:{path.name}": (lambda obj, path=path, to_table=to_table: write_file(path, to_table, obj, fmt),
+                               [source])
+        for path, (source, to_table) in OUTPUT_FILES.items()
+    }
+    # Tableau extracts (always CSV), appended to where only new days / invoices changed
+    stages["write:tableau_ready"] = (
+        lambda d, idx, kpis, cohorts: build_extracts(d, idx["daily_counts"], kpis, cohorts),
+        ["load", "event_index", "kpis", "cohorts"],
+    )
+    return stages
+
+def compute_outputs(users, events, subs, revenue, event_index, workers: int = 1, tickets=None):
+    """Runs the funnel, journey, segmentation and KPI stages over already loaded inputs."""
+    data = {"users": users, "events": events, "subscriptions": subs, "revenue": revenue, "event_index": event_index,
+            "support_tickets": tickets}
+    results, _ = run_dag(compute_stages(lambda: data), workers)
+    return {source: results[source] for source, _ in OUTPUT_FILES.values()}
+
+def render_outputs(results):
+    """The exact text the csv writer stages would write, keyed by file name (skipped outputs omitted)."""
+    rendered = {}
+    for path, (source, to_table) in OUTPUT_FILES.items():
+        if results.get(source) is None:
+            continue
+        buffer = io.StringIO(newline="")
+        if to_table is None:
+            json.dump(results[source], buffer, indent=2)
+        else:
+            to_table(results[source]).to_csv(buffer, index=False)
+        rendered[path.name] = buffer.getvalue()
+    return rendered
+
+def verify_incremental(args) -> bool:
+    """Checks that outputs derived from incremental state match a full rebuild byte for byte."""
+    logger.info("Verifying incremental state against a full rebuild...")
+    data = load_data(use_cache=not args.no_cache)
+    event_index = build_event_index(data["events"])
+    full = render_outputs(compute_outputs(data["users"], data["events"], data["subscriptions"], data["revenue"],
+                                          event_index, tickets=data["support_tickets"]))
+
+    inc_data = load_incremental(chunksize=args.chunk_size, use_cache=not args.no_cache)
+    incremental = render_outputs(compute_outputs(inc_data["users"], None, inc_data["subscriptions"],
+                                                 inc_data["revenue"], inc_data["event_index"],
+                                                 tickets=inc_data["support_tickets"]))
+    mismatched = [name for name in incremental if full[name] != incremental[name]]
+    for name in mismatched:
+        logger.error(f"Incremental output differs from full rebuild: {name}")
+    if not mismatched:
+        logger.info(f"Incremental outputs match the full rebuild ({len(incremental)} files).")
+    return not mismatched
+
+def run_sharded_pipeline(args, profiler):
+    """--shards mode: per-shard journey/segments part files, merged funnel and KPI outputs."""
+    data = profiler.call("load", lambda: load_data(use_cache=not args.no_cache, rebuild_cache=args.rebuild_cache))
+    funnel, kpis = profiler.call("shards", run_sharded, data, args.shards, SHARDED_JOURNEY_DIR, SHARDED_SEGMENTS_DIR,
+                                 None, args.output_format, SHARDED_CHURN_DIR, inputs=["load"])
+    mrr = profiler.call("mrr", compute_mrr_movements, data["subscriptions"], inputs=["subscriptions"])
+    kpis.update(revenue_retention_kpis(mrr))
+    cohorts = profiler.call("cohorts", cohort_stage, data, args.cohort_grain, inputs=["load"])
+    ordered = profiler.call("ordered_funnel", ordered_funnel_stage, data, args.funnel_steps, inputs=["load", "steps"])
+    history = profiler.call("stage_history", history_stage, data, None, args.history_days, inputs=["load"])
+    flows = profiler.call("stage_flows", lambda: None if history is None
+                          else rolling_transitions(history, args.transition_step))
+    results = {"funnel": funnel, "kpis": kpis, "cohorts": cohorts, "mrr": mrr, "stage_history": history,
+               "stage_flows": flows, "ordered_funnel": ordered}
+    writes = {name: stage for name, stage in writer_stages(args.output_format).items() if stage[1][0] in results}
+    writes["write:tableau_ready"] = (lambda: build_extracts(data, daily_event_counts(data["events"]), kpis, cohorts),
+                                     [])
+    sources = {source: (lambda result=result: result, []) for source, result in results.items()}
+    run_dag({**sources, **profiler.wrap(writes)}, workers=args.workers)
+    logger.info(f"Sharded pipeline completed: part files in {SHARDED_JOURNEY_DIR}, {SHARDED_SEGMENTS_DIR} "
+                f"and {SHARDED_CHURN_DIR}.")
+    return 0
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.verify_incremental:
+        return 0 if verify_incremental(args) else 1
     logger.info("Starting pipeline...")
     
     # Ensure outputs dir exists
     OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
+    # Per-stage wall/CPU time, memory and rows go to PROFILE_FILE on every run
+    profiler = StageProfiler(PROFILE_STATS_DIR if args.profile else None, trace_memory=args.profile)
+    run_info = {"mode": "shards" if args.shards else "incremental" if args.incremental
+                else "stream" if args.stream_events else "full", "workers": args.workers}
+    if args.shards:
+        status = run_sharded_pipeline(args, profiler)
+        profiler.write(PROFILE_FILE, **run_info, shards=args.shards)
+        return status
 
     # 1. ETL
-    data = load_data()
-    users = data["users"]
-    events = data["events"]
-    subs = data["subscriptions"]
-    revenue = data["revenue"]
-    
-    # 2. Funnel
-    funnel_metrics = compute_funnel_metrics(users, events, subs)
-    with open(FUNNEL_FILE, "w") as f:
-        json.dump(funnel_metrics, f, indent=2)
-    pd.DataFrame([funnel_metrics]).to_csv(OUTPUTS_DIR / "funnel_summary.csv", index=False)
-        
-    # 3. Journey Classification
-    journey_df = classify_journey_stages(users, events, subs)
-    journey_df.to_csv(CUSTOMER_JOURNEY_FILE, index=False)
+    if args.incremental:
+        # Only rows appended since the last run are read; the rest comes from saved state
+        load = lambda: load_incremental(chunksize=args.chunk_size, use_cache=not args.no_cache,
+                                        rebuild_cache=args.rebuild_cache)
+    else:
+        load = lambda: load_data(stream_events=args.stream_events, chunksize=args.chunk_size,
+                                 use_cache=not args.no_cache, rebuild_cache=args.rebuild_cache)
     
-    # 4. Segmentation
-    segments_df = create_segments(journey_df, revenue)
-    segments_df.to_csv(SEGMENTS_FILE, index=False)
+    # 2-5. Funnel, Journey, Segmentation, KPIs, then one write stage per output file
+    stages = {**compute_stages(load, args.cohort_grain, args.history_days, args.transition_step, args.funnel_steps),
+              **writer_stages(args.output_format)}
+    if args.incremental:
+        # Commit the new state only once every output has been written
+        writes = [name for name in stages if name.startswith("write:")]
+        stages["save_state"] = (lambda d, *_: save_state(d["state"]), ["load"] + writes)
+    results, timings = run_dag(profiler.wrap(stages), workers=args.workers)
+    users = results["load"]["users"]
     
-    # 5. KPIs
-    kpis = calculate_kpis(users, events, segments_df, subs)
-    with open(METRICS_FILE, "w") as f:
-        json.dump(kpis, f, indent=2)
-    pd.DataFrame([kpis]).to_csv(KPI_SUMMARY_FILE, index=False)
+    logger.info("Stage timings (s): " + ", ".join(f"{name}={secs:.3f}" for name, secs in timings.items()))
+    profiler.write(PROFILE_FILE, **run_info)
     
     # 6. Consistency Checks (B5)
     # Check if Journey outputs match Cohort numbers?
     # Simple check: Sum of Segments = Total Users
-    total_users_check = len(segments_df) == len(users)
+    total_users_check = len(results["segments"]) == len(users)
     # Check NO stage regressions (User cannot be 'Retained' without 'Activation' logic implicitly handling it?)
     # In our logic, Retained requires Active Sub. Active Sub implies they value the product. 
     # Usually you activate before paying.
@@ -58,6 +304,7 @@ def main():
     logger.info(f"Consistency Check: Total Users Match = {total_users_check}")
     
     logger.info("Pipeline completed successfully.")
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,346 @@
+"""
+Approximate funnel and KPI numbers from daily sketches (src.utils.sketches).
+
+Each calendar day keeps a few small sketches: distinct customers per event name, any
+event, signups and new subscribers (HyperLogLog), and time-to-activate and invoice
+amounts (QuantileSketch). A date range is answered by merging its days, so a year of
+events is summarized from the stored sketches without re-reading or holding the
+events. Each update only folds the rows appended since the last one:
+    python -m src.analytics.approx update [--chunk-size 1000000]
+    python -m src.analytics.approx report [--start 2025-01-01] [--end 2025-12-31] [--by-day]
+"""
+import argparse
+import copy
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+import numpy as np
+import pandas as pd
+from src.etl.customers import build_customer_dimension, encode_customer_ids
+from src.etl.event_index import ACTIVATE_EVENT, encode_event_names
+from src.etl.incremental import appended_range, read_range
+from src.etl.loader import read_table
+from src.funnel.engine import funnel_from_counts
+from src.utils.config import (
+    EVENTS_CHUNK_SIZE, EVENTS_FILE, REVENUE_FILE, SKETCH_DIR,
+)
+from src.utils.sketches import HyperLogLog, QuantileSketch, grouped_hyperloglogs, sketch_from_dict
+from src.utils.timeline import HOUR_NS
+from src.utils.writers import write_text
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+POINTER_FILE = "CURRENT"
+# Sketch names within a day; distinct customers per event name are "customers:<event_name>"
+ACTIVE = "customers:any"
+SIGNUPS = "signups"
+PAID = "paid"
+TIME_TO_ACTIVATE = "time_to_activate_hours"
+REVENUE = "revenue"
+EVENT_PREFIX = "customers:"
+CUSTOMER_SKETCHES = (SIGNUPS, PAID)
+
+# "YYYY-MM-DD" -> sketch name -> HyperLogLog / QuantileSketch
+Days = Dict[str, Dict[str, Any]]
+
+
+def merge_sketches(target: Dict[str, Any], sketches: Dict[str, Any]) -> Dict[str, Any]:
+    """Merges named sketches into `target` (copying new names); `sketches` is left untouched."""
+    for name, sketch in sketches.items():
+        if name in target:
+            target[name].merge(sketch)
+        else:
+            target[name] = copy.deepcopy(sketch)
+    return target
+
+
+def merge_days(target: Days, other: Days) -> Days:
+    """Merges `other` into `target` day by day and sketch by sketch."""
+    for day, sketches in other.items():
+        merge_sketches(target.setdefault(day, {}), sketches)
+    return target
+
+
+def _day(day_number: int) -> str:
+    return str(np.datetime64(int(day_number), "D"))
+
+
+def _day_numbers(ts: np.ndarray) -> np.ndarray:
+    return np.asarray(ts, dtype="datetime64[ns]").astype("datetime64[D]").astype(np.int64)
+
+
+def _distinct_sketches(days: np.ndarray, codes: np.ndarray, names: List[str], hashes: np.ndarray) -> Days:
+    """HyperLogLog of the row hashes per (day, names[code]), built in one scatter-max."""
+    uniques, groups = np.unique(days * len(names) + codes, return_inverse=True)
+    result: Days = {}
+    for key, sketch in zip(uniques.tolist(), grouped_hyperloglogs(groups, len(uniques), hashes)):
+        day, code = divmod(key, len(names))
+        result.setdefault(_day(day), {})[names[code]] = sketch
+    return result
+
+
+def _quantile_sketches(days: np.ndarray, values: np.ndarray, name: str) -> Days:
+    """QuantileSketch of `values` per day."""
+    uniques, groups = np.unique(days, return_inverse=True)
+    order = np.argsort(groups, kind="stable")
+    bounds = np.searchsorted(groups[order], np.arange(len(uniques) + 1))
+    return {_day(day): {name: QuantileSketch().add(values[order[bounds[i]:bounds[i + 1]]])}
+            for i, day in enumerate(uniques.tolist())}
+
+
+class CustomerLookup:
+    """Customer dimension of users with each customer's id hash and signup time (ns)."""
+
+    def __init__(self, users: pd.DataFrame):
+        self.dimension = build_customer_dimension(users)
+        self.hashes = pd.util.hash_array(np.asarray(self.dimension, dtype=object))
+        self.signup_ns = users["signup_date"].to_numpy(dtype="datetime64[ns]")
+
+    def keys(self, customer_id: pd.Series) -> np.ndarray:
+        return encode_customer_ids(self.dimension, customer_id)
+
+
+def sketch_events(events: pd.DataFrame, customers: CustomerLookup) -> Days:
+    """
+    Daily sketches of a chunk of events: distinct customers per event name and overall,
+    and hours from signup per activation event (the avg_time_to_activate_hours sample).
+    Only events of customers in users count, as in the exact funnel and KPIs.
+    """
+    keys = customers.keys(events["customer_id"])
+    ts = events["event_timestamp"].to_numpy(dtype="datetime64[ns]")
+    known = (keys >= 0) & ~np.isnat(ts)
+    keys, ts = keys[known], ts[known]
+    days = _day_numbers(ts)
+    event_name = encode_event_names(events["event_name"])
+    codes = np.asarray(event_name.codes)[known]
+    hashes = customers.hashes[keys]
+
+    named = codes >= 0
+    names = [EVENT_PREFIX + str(name) for name in event_name.categories]
+    result = _distinct_sketches(days[named], codes[named], names, hashes[named])
+    merge_days(result, _distinct_sketches(days, np.zeros(len(days), dtype=np.int64), [ACTIVE], hashes))
+
+    activation = codes == event_name.categories.get_indexer([ACTIVATE_EVENT])[0]
+    signup = customers.signup_ns[keys]
+    timed = activation & (codes >= 0) & ~np.isnat(signup)
+    hours = (ts[timed].view(np.int64) - signup[timed].view(np.int64)) / HOUR_NS
+    return merge_days(result, _quantile_sketches(days[timed], hours, TIME_TO_ACTIVATE))
+
+
+def sketch_revenue(revenue: pd.DataFrame, customers: CustomerLookup) -> Days:
+    """Daily QuantileSketch of invoice amounts (known customers, by revenue_date)."""
+    dates = revenue["revenue_date"].to_numpy(dtype="datetime64[ns]")
+    rows = (customers.keys(revenue["customer_id"]) >= 0) & ~np.isnat(dates)
+    return _quantile_sketches(_day_numbers(dates[rows]), revenue["amount"].to_numpy(dtype=np.float64)[rows],
+                              REVENUE)
+
+
+def sketch_customers(users: pd.DataFrame, subs: pd.DataFrame, customers: CustomerLookup) -> Days:
+    """
+    Daily HyperLogLogs of customers signing up and of customers starting a subscription.
+    These are rebuilt from the full tables on every update and replace the stored ones,
+    so deleted users and subscriptions drop out of them.
+    """
+    signup = ~np.isnat(customers.signup_ns)
+    result = _distinct_sketches(_day_numbers(customers.signup_ns[signup]), np.zeros(int(signup.sum()), np.int64),
+                                [SIGNUPS], customers.hashes[signup])
+    keys = customers.keys(subs["customer_id"])
+    start = subs["start_date"].to_numpy(dtype="datetime64[ns]")
+    paid = (keys >= 0) & ~np.isnat(start)
+    return merge_days(result, _distinct_sketches(_day_numbers(start[paid]), np.zeros(int(paid.sum()), np.int64),
+                                                 [PAID], customers.hashes[keys[paid]]))
+
+
+def replace_customer_sketches(days: Days, fresh: Days) -> List[str]:
+    """
+    Replaces the signup / paid sketches of `days` by those of `fresh` (dropping days left
+    without sketches); returns the days where their registers changed.
+    """
+    changed = []
+    for day in sorted(set(days) | set(fresh)):
+        stored, rebuilt = days.setdefault(day, {}), fresh.get(day, {})
+        for name in CUSTOMER_SKETCHES:
+            old, new = stored.pop(name, None), rebuilt.get(name)
+            if new is not None:
+                stored[name] = new
+            if (old is None) != (new is None) or (old is not None and not np.array_equal(old.registers, new.registers)):
+                changed.append(day)
+        if not stored:
+            del days[day]
+    return sorted(set(changed))
+
+
+def empty_store() -> Dict[str, Any]:
+    return {"days": {}, "watermarks": {}, "users": 0}
+
+
+def load_sketches(directory: Path = SKETCH_DIR) -> Dict[str, Any]:
+    """
+    The last saved {"days": Days, "watermarks": ..., "users": rows of users.csv then},
+    or an empty store before the first update.
+    """
+    pointer = Path(directory) / POINTER_FILE
+    if not pointer.exists():
+        return empty_store()
+    current = Path(directory) / pointer.read_text().strip()
+    days = {path.stem: {name: sketch_from_dict(d) for name, d in json.loads(path.read_text()).items()}
+            for path in sorted(current.glob("????-??-??.json"))}
+    meta = json.loads((current / "meta.json").read_text())
+    return {"days": days, "watermarks": meta["watermarks"], "users": meta.get("users", 0)}
+
+
+def save_sketches(store: Dict[str, Any], directory: Path = SKETCH_DIR, changed: Optional[Iterable[str]] = None):
+    """
+    Writes one JSON file per day to a fresh version directory, then atomically repoints
+    CURRENT at it (like src.etl.incremental.save_state). Days outside `changed` are
+    hard-linked from the previous version instead of being rewritten.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    pointer = directory / POINTER_FILE
+    previous = directory / pointer.read_text().strip() if pointer.exists() else None
+    name = f"sketches-{pd.Timestamp.now():%Y%m%dT%H%M%S%f}"
+    target = directory / name
+    target.mkdir()
+    changed = set(store["days"]) if changed is None or previous is None else set(changed)
+    for day, sketches in store["days"].items():
+        path = target / f"{day}.json"
+        if day not in changed and (previous / path.name).exists():
+            try:
+                os.link(previous / path.name, path)
+                continue
+            except OSError:
+                pass
+        path.write_text(json.dumps({n: sketch.to_dict() for n, sketch in sketches.items()}))
+    (target / "meta.json").write_text(json.dumps({"watermarks": store["watermarks"], "users": store["users"]},
+                                                 indent=2))
+
+    write_text(pointer, lambda f: f.write(name))
+    if previous is not None and previous != target:
+        shutil.rmtree(previous, ignore_errors=True)
+    logger.info(f"Saved {len(store['days'])} days of sketches ({len(changed)} updated) as {name}")
+
+
+def update_sketches(directory: Path = SKETCH_DIR, chunksize: int = EVENTS_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Folds events and revenue appended since the stored watermarks into the daily
+    sketches, replaces the signup and subscriber sketches, and saves the result; only
+    days whose sketches changed are rewritten. Falls back to a rebuild from scratch if
+    a source was rewritten rather than appended, or if users.csv lost rows (the events
+    and invoices of deleted users cannot be taken out of a sketch).
+    """
+    store = load_sketches(directory)
+    users, subs = read_table("users"), read_table("subscriptions")
+    ranges = {path: appended_range(path, store["watermarks"].get(name))
+              for name, path in [("events", EVENTS_FILE), ("revenue", REVENUE_FILE)]}
+    if any(r is None for r in ranges.values()):
+        logger.warning("A source file was rewritten since the last sketch update; rebuilding the sketches.")
+        store = empty_store()
+    elif len(users) < store["users"]:
+        logger.warning(f"users.csv has {store['users'] - len(users)} fewer rows than at the last sketch update; "
+                       "rebuilding the sketches.")
+        store = empty_store()
+    if not store["watermarks"]:
+        ranges = {path: appended_range(path, None) for path in ranges}
+
+    customers = CustomerLookup(users)
+    new: Days = {}
+    n_rows = {}
+    for name, path, sketch in [("events", EVENTS_FILE, sketch_events), ("revenue", REVENUE_FILE, sketch_revenue)]:
+        start, end, watermark = ranges[path]
+        n_rows[name] = 0
+        for chunk in read_range(path, start, end, name, chunksize):
+            merge_days(new, sketch(chunk, customers))
+            n_rows[name] += len(chunk)
+        store["watermarks"][name] = watermark
+    store["users"] = len(users)
+
+    merge_days(store["days"], new)
+    changed = set(new) | set(replace_customer_sketches(store["days"], sketch_customers(users, subs, customers)))
+    logger.info(f"Sketched {n_rows['events']} new events and {n_rows['revenue']} new revenue rows.")
+    save_sketches(store, directory, changed=changed)
+    return store
+
+
+def report(days: Days, start: Optional[str] = None, end: Optional[str] = None,
+           by_day: bool = False) -> Dict[str, Any]:
+    """
+    Funnel and KPI estimates over the days in [start, end] (inclusive, ISO dates; open
+    when None), from the merged sketches of those days:
+    - funnel: signups -> customers with an activate event -> of those, customers who
+      started a subscription (activation & paid by inclusion-exclusion of HyperLogLogs)
+    - active_customers / customers_by_event: distinct customers with any / each event
+    - time to activate (exact mean, p50 / p90) and invoice amounts (exact total, p50 / p90)
+    Distinct counts carry a relative standard error of 1.04 / sqrt(2^p); quantiles are
+    within the sketch's relative accuracy. error_bounds reports both for the merged
+    sketches (the precision they were built with, not the current config).
+    """
+    selected = [day for day in sorted(days) if (start is None or day >= start) and (end is None or day <= end)]
+    totals: Dict[str, Any] = {}
+    for day in selected:
+        merge_sketches(totals, days[day])
+
+    def distinct(name: str) -> int:
+        return totals[name].count() if name in totals else 0
+
+    def worst(bound: str, kind: type) -> Optional[float]:
+        """Largest error bound among the merged sketches of `kind` (None when there are none)."""
+        bounds = [getattr(sketch, bound) for sketch in totals.values() if isinstance(sketch, kind)]
+        return max(bounds) if bounds else None
+
+    activation_name = EVENT_PREFIX + ACTIVATE_EVENT
+    activated, paid = distinct(activation_name), distinct(PAID)
+    retention = 0
+    if activated and paid:
+        union = copy.deepcopy(totals[activation_name]).merge(totals[PAID]).count()
+        retention = int(np.clip(activated + paid - union, 0, min(activated, paid)))
+    tta = totals.get(TIME_TO_ACTIVATE, QuantileSketch())
+    revenue = totals.get(REVENUE, QuantileSketch())
+    result = {
+        "start": selected[0] if selected else start,
+        "end": selected[-1] if selected else end,
+        "days": len(selected),
+        "funnel": funnel_from_counts({"acquisition": distinct(SIGNUPS), "activation": activated,
+                                      "retention": retention}),
+        "active_customers": distinct(ACTIVE),
+        "customers_by_event": {name[len(EVENT_PREFIX):]: sketch.count() for name, sketch in sorted(totals.items())
+                               if name.startswith(EVENT_PREFIX) and name != ACTIVE},
+        "avg_time_to_activate_hours": tta.mean(),
+        "time_to_activate_p50_hours": tta.quantile(0.5),
+        "time_to_activate_p90_hours": tta.quantile(0.9),
+        "revenue_total": revenue.sum,
+        "revenue_invoices": revenue.count,
+        "revenue_p50": revenue.quantile(0.5),
+        "revenue_p90": revenue.quantile(0.9),
+        "error_bounds": {"distinct_relative_std_error": worst("relative_error", HyperLogLog),
+                         "quantile_relative_error": worst("relative_accuracy", QuantileSketch)},
+    }
+    if by_day:
+        result["daily_active_customers"] = {day: days[day][ACTIVE].count() for day in selected if ACTIVE in days[day]}
+    return result
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=["update", "report"])
+    parser.add_argument("--sketch-dir", type=Path, default=SKETCH_DIR)
+    parser.add_argument("--chunk-size", type=int, default=EVENTS_CHUNK_SIZE)
+    parser.add_argument("--start", default=None, help="First day of the report (YYYY-MM-DD, default: all)")
+    parser.add_argument("--end", default=None, help="Last day of the report (YYYY-MM-DD, default: all)")
+    parser.add_argument("--by-day", action="store_true", help="Also report distinct active customers per day")
+    args = parser.parse_args(argv)
+
+    if args.command == "update":
+        update_sketches(args.sketch_dir, args.chunk_size)
+    else:
+        print(json.dumps(report(load_sketches(args.sketch_dir)["days"], args.start, args.end, args.by_day),
+                         indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
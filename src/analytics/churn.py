@@ -0,0 +1,261 @@
+"""
+Churn-risk scoring: a per-customer feature matrix and a NumPy-only logistic model.
+
+The model is fit offline on a past snapshot of the inputs and saved as JSON (none ships
+with the repo; without one the pipeline uses the rule-based churn risk score):
+    python -m src.analytics.churn [--as-of 2026-06-22] [--horizon-days 30] [--output models/churn_model.json]
+"""
+import argparse
+import json
+import sys
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from src.analytics.support import ticket_features
+from src.etl.customers import fact_keys, per_customer_sum
+from src.etl.event_index import align_event_index, build_event_index
+from src.etl.loader import load_data
+from src.utils.config import CHURN_MODEL_FILE, CHURN_WINDOW_DAYS
+from src.utils.timeline import DAY_NS, ceil_days
+from src.utils.writers import atomic_path
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Feature matrix columns, in model order; TICKET_FEATURES only when support tickets are loaded
+TICKET_FEATURES = ["tickets", "resolution_hours"]
+FEATURES = ["recency_days", "frequency", "tenure_days", "revenue"] + TICKET_FEATURES
+# Heavy-tailed counts and amounts enter the model as log1p
+LOG_FEATURES = ["frequency", "revenue", "tickets"]
+
+
+def _days_before(as_of_day: int, ts: np.ndarray) -> np.ndarray:
+    """(as_of - ts).days for a midnight as_of, as float with NaN for NaT."""
+    ts = np.asarray(ts, dtype="datetime64[ns]")
+    days = (as_of_day - ceil_days(ts)).astype(np.float64)
+    days[np.isnat(ts)] = np.nan
+    return days
+
+
+def churn_features(users: pd.DataFrame, event_index: Dict[str, Any], revenue: Optional[pd.DataFrame] = None,
+                   tickets: Optional[pd.DataFrame] = None, as_of=None) -> pd.DataFrame:
+    """
+    Per-customer churn features, row-aligned with `users`, in one vectorized pass:
+    - recency_days: days since the last event (since signup when there is none)
+    - frequency: events so far
+    - tenure_days: days since signup
+    - revenue: lifetime revenue (revenue fact rows or per-customer totals)
+    - tickets / resolution_hours: support tickets opened and their median hours to
+      resolution (src.analytics.support.ticket_features; tickets unresolved as of
+      `as_of` only count towards tickets), only when `tickets` is given
+    Rows dated after `as_of` (default: today) are ignored where the inputs carry
+    dates; the event index must already be cut at `as_of`. Unknown customers' rows
+    are dropped through their customer_key (src.etl.customers).
+    """
+    as_of = (pd.Timestamp.now() if as_of is None else pd.Timestamp(as_of)).normalize()
+    as_of_day = as_of.value // DAY_NS
+    n = len(users)
+    index = align_event_index(event_index, users)
+
+    tenure = _days_before(as_of_day, users["signup_date"].to_numpy())
+    recency = _days_before(as_of_day, index["customers"]["last_seen"].to_numpy())
+    recency = np.where(np.isnan(recency), tenure, recency)
+
+    if revenue is not None:
+        if "revenue_date" in revenue.columns:
+            revenue = revenue[~(revenue["revenue_date"] >= as_of)]
+        lifetime = per_customer_sum(fact_keys(users, revenue), n, weights=revenue["amount"])
+    else:
+        lifetime = np.zeros(n)
+
+    features = pd.DataFrame({
+        "recency_days": recency,
+        "frequency": index["event_counts"].to_numpy().sum(axis=1).astype(np.float64),
+        "tenure_days": tenure,
+        "revenue": lifetime,
+    }, index=users.index)
+    if tickets is not None:
+        # Tickets as they were at as_of: later ones not opened yet, later resolutions still open
+        tickets = tickets[tickets["created_at"] < as_of]
+        if "resolved_at" in tickets.columns:
+            tickets = tickets.assign(resolved_at=tickets["resolved_at"].where(tickets["resolved_at"] < as_of))
+        support = ticket_features(users, tickets)
+        features["tickets"] = support["tickets"].to_numpy(dtype=np.float64)
+        features["resolution_hours"] = support["resolution_p50_hours"].to_numpy()
+    return features.fillna(0.0)
+
+
+class ChurnModel:
+    """
+    Logistic churn model over `features` (FEATURES, less TICKET_FEATURES for a model
+    fit without support tickets): log1p of LOG_FEATURES, standardized with the
+    training mean / scale, then sigmoid(intercept + x . coef). The standardization is
+    folded into per-feature weights at load time, so score() is a few vectorized
+    multiply-adds per feature over the whole batch.
+    """
+
+    def __init__(self, coef: List[float], intercept: float, mean: List[float], scale: List[float],
+                 features: List[str] = FEATURES, log_features: List[str] = LOG_FEATURES,
+                 metadata: Optional[Dict[str, Any]] = None):
+        self.features, self.log_features = list(features), list(log_features)
+        self.coef, self.intercept = np.asarray(coef, dtype=np.float64), float(intercept)
+        self.mean, self.scale = np.asarray(mean, dtype=np.float64), np.asarray(scale, dtype=np.float64)
+        self.metadata = metadata or {}
+        self._weights = self.coef / self.scale
+        self._bias = self.intercept - float(np.dot(self._weights, self.mean))
+        self._log = [name in self.log_features for name in self.features]
+
+    def transform(self, features) -> np.ndarray:
+        """Model inputs (n x len(features), before standardization) from a feature frame or matrix."""
+        if isinstance(features, pd.DataFrame):
+            features = features[self.features].to_numpy(dtype=np.float64)
+        matrix = np.array(features, dtype=np.float64, ndmin=2)
+        matrix[:, self._log] = np.log1p(matrix[:, self._log])
+        return matrix
+
+    def score(self, features) -> np.ndarray:
+        """Churn probability per row of a churn_features() frame or an n x len(features) matrix."""
+        if isinstance(features, pd.DataFrame):
+            columns = [features[name].to_numpy(dtype=np.float64) for name in self.features]
+        else:
+            matrix = np.asarray(features, dtype=np.float64)
+            columns = [matrix[:, j] for j in range(matrix.shape[1])]
+        # Column by column in a fixed order: a row's score never depends on the batch it is in
+        z = np.full(len(columns[0]), self._bias)
+        for column, weight, log in zip(columns, self._weights, self._log):
+            z += weight * (np.log1p(column) if log else column)
+        return 1.0 / (1.0 + np.exp(-z))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"features": self.features, "log_features": self.log_features, "coef": self.coef.tolist(),
+                "intercept": self.intercept, "mean": self.mean.tolist(), "scale": self.scale.tolist(),
+                "metadata": self.metadata}
+
+    def save(self, path: Path = CHURN_MODEL_FILE):
+        with atomic_path(path) as tmp:
+            tmp.write_text(json.dumps(self.to_dict(), indent=2) + "\n")
+        logger.info(f"Churn model saved to {path}")
+
+    @classmethod
+    def load(cls, path: Path = CHURN_MODEL_FILE) -> "ChurnModel":
+        with open(path) as f:
+            spec = json.load(f)
+        return cls(spec["coef"], spec["intercept"], spec["mean"], spec["scale"], spec["features"],
+                   spec["log_features"], spec.get("metadata"))
+
+
+def fit_logistic(X: np.ndarray, y: np.ndarray, l2: float = 1.0, max_iter: int = 50, tol: float = 1e-8):
+    """
+    L2-regularized logistic regression by Newton's method (IRLS) on standardized X;
+    the intercept is not penalized. Returns (coef, intercept).
+    """
+    n, k = X.shape
+    design = np.hstack([np.ones((n, 1)), X])
+    penalty = np.full(k + 1, l2)
+    penalty[0] = 0.0
+    beta = np.zeros(k + 1)
+    for _ in range(max_iter):
+        p = 1.0 / (1.0 + np.exp(-design @ beta))
+        gradient = design.T @ (p - y) + penalty * beta
+        hessian = (design * (p * (1 - p))[:, None]).T @ design + np.diag(penalty)
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.abs(step).max() < tol:
+            break
+    return beta[1:], float(beta[0])
+
+
+def training_set(users: pd.DataFrame, events: pd.DataFrame, revenue: Optional[pd.DataFrame] = None,
+                 tickets: Optional[pd.DataFrame] = None, as_of=None, horizon_days: int = CHURN_WINDOW_DAYS):
+    """
+    Features of the customers signed up before cutoff = as_of - horizon_days, computed
+    from the inputs as they were at the cutoff, and their label: 1 when they had no
+    event in [cutoff, as_of) (churned), else 0. as_of defaults to the day after the
+    last event, so the labels use the most recent complete window in the data.
+    """
+    ts = events["event_timestamp"]
+    as_of = ts.max().normalize() + pd.Timedelta(days=1) if as_of is None else pd.Timestamp(as_of).normalize()
+    cutoff = as_of - pd.Timedelta(days=horizon_days)
+    n = len(users)
+    before = build_event_index(events[ts < cutoff], n)
+    features = churn_features(users, before, revenue, tickets, as_of=cutoff)
+    in_window = events[(ts >= cutoff) & (ts < as_of)]
+    active = per_customer_sum(fact_keys(users, in_window), n) > 0
+    eligible = (users["signup_date"] < cutoff).to_numpy()
+    return features[eligible], (~active[eligible]).astype(np.float64), cutoff, as_of
+
+
+def fit_churn_model(users: pd.DataFrame, events: pd.DataFrame, revenue: Optional[pd.DataFrame] = None,
+                    tickets: Optional[pd.DataFrame] = None, as_of=None, horizon_days: int = CHURN_WINDOW_DAYS,
+                    l2: float = 1.0) -> ChurnModel:
+    """
+    Fits the churn model on training_set(); see there for the labels. Without
+    `tickets` the model leaves out TICKET_FEATURES.
+    """
+    features, y, cutoff, as_of = training_set(users, events, revenue, tickets, as_of, horizon_days)
+    if not len(y) or y.min() == y.max():
+        raise ValueError(f"Cannot fit a churn model: need churned and retained customers, got {len(y)} "
+                         f"customers with churn rate {y.mean() if len(y) else float('nan'):.3f}")
+    names = list(features.columns)
+    untransformed = ChurnModel(np.zeros(len(names)), 0.0, np.zeros(len(names)), np.ones(len(names)), names)
+    X = untransformed.transform(features)
+    mean, scale = X.mean(axis=0), X.std(axis=0)
+    scale[scale == 0] = 1.0
+    coef, intercept = fit_logistic((X - mean) / scale, y, l2)
+    metadata = {"cutoff": str(cutoff.date()), "as_of": str(as_of.date()), "horizon_days": horizon_days, "l2": l2,
+                "n_customers": int(len(y)), "churn_rate": round(float(y.mean()), 6)}
+    model = ChurnModel(coef, intercept, mean, scale, names, metadata=metadata)
+    logger.info(f"Fit churn model on {len(y)} customers (churn rate {y.mean():.3f}, cutoff {cutoff.date()})")
+    return model
+
+
+def load_churn_model(path: Path = CHURN_MODEL_FILE) -> ChurnModel:
+    if not Path(path).exists():
+        raise FileNotFoundError(f"No churn model at {path}; fit one with python -m src.analytics.churn")
+    return ChurnModel.load(path)
+
+
+def score_customers(users: pd.DataFrame, event_index: Dict[str, Any], revenue: Optional[pd.DataFrame] = None,
+                    tickets: Optional[pd.DataFrame] = None, model: Optional[ChurnModel] = None,
+                    as_of=None) -> Optional[pd.DataFrame]:
+    """
+    customer_id, the churn features and churn_score for every customer (rows of `users`).
+    None without a `model` and no fitted one at CHURN_MODEL_FILE: the churn risk KPI then
+    falls back to the rule-based score (src.analytics.kpis).
+    """
+    if model is None:
+        if not Path(CHURN_MODEL_FILE).exists():
+            logger.info(f"No churn model at {CHURN_MODEL_FILE}; using the rule-based churn risk score.")
+            return None
+        model = load_churn_model(CHURN_MODEL_FILE)
+    logger.info("Scoring churn risk...")
+    features = churn_features(users, event_index, revenue, tickets, as_of)
+    missing = [name for name in model.features if name not in features.columns]
+    if missing:
+        logger.warning(f"The churn model uses {missing} but no support tickets are loaded; scoring them as 0. "
+                       f"Refit it with python -m src.analytics.churn.")
+    scores = features.assign(churn_score=model.score(features.reindex(columns=model.features, fill_value=0.0)))
+    scores.insert(0, "customer_id", users["customer_id"].to_numpy())
+    return scores
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--as-of", default=None, help="End of the label window (default: day after the last event)")
+    parser.add_argument("--horizon-days", type=int, default=CHURN_WINDOW_DAYS,
+                        help=f"Days without events that count as churn (default: {CHURN_WINDOW_DAYS})")
+    parser.add_argument("--l2", type=float, default=1.0, help="L2 penalty on the standardized coefficients")
+    parser.add_argument("--output", type=Path, default=CHURN_MODEL_FILE)
+    args = parser.parse_args(argv)
+
+    data = load_data()
+    model = fit_churn_model(data["users"], data["events"], data["revenue"], data["support_tickets"], args.as_of,
+                            args.horizon_days, args.l2)
+    model.save(args.output)
+    print(json.dumps(dict(zip(model.features, np.round(model.coef, 4).tolist())), indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,64 +1,114 @@
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Any, Optional
+from src.etl.event_index import build_event_index, align_event_index, EPOCH
+from src.analytics.mrr import monthly_price, revenue_retention_kpis
+from src.utils.config import RETENTION_WINDOW_DAYS
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def calculate_kpis(users: pd.DataFrame, events: pd.DataFrame, journey_df: pd.DataFrame, subs: pd.DataFrame) -> Dict[str, float]:
+# Rule-based churn risk, used when no model scores (src.analytics.churn) are passed:
+# if At-Risk -> 0.8, Churned -> 1.0, else 0.1
+# (kept in integer tenths so the mean is one exact division, whatever the merge order)
+CHURN_RISK_TENTHS = {"Churned": 10, "At-Risk": 8}
+DEFAULT_CHURN_RISK_TENTHS = 1
+# Model scores are summed as integer millionths for the same reason
+CHURN_SCORE_UNITS = 1_000_000
+# MRR is summed as integer cents of each subscription's monthly price
+MRR_CENTS = 100
+
+def kpi_partials(users: pd.DataFrame, journey_df: pd.DataFrame, subs: pd.DataFrame,
+                 event_index: Dict[str, Any], churn_scores: Optional[pd.DataFrame] = None,
+                 retention_window_days: int = RETENTION_WINDOW_DAYS) -> Dict[str, int]:
     """
-    Calculates Mandatory KPIs:
-    - Activation rate
-    - Engagement depth (avg events/user)
-    - Retention rate (30-day inferred from active status)
-    - Churn risk score (avg prob)
-    - Avg time between key actions
+    Additive counts and sums behind every KPI. Partials computed over disjoint sets of
+    customers (e.g. customer_id shards) can be summed key by key and then finalized
+    with kpis_from_partials(). With `churn_scores` (src.analytics.churn.score_customers)
+    the churn risk KPI is the mean model score instead of the rule-based one.
     """
-    logger.info("Calculating KPIs...")
+    segment = journey_df["lifecycle_segment"]
+    
+    # 3. Retention base: users > 30 days (retention_window_days) old, and those still "Active" (Retained or Engagement)
+    cohort_30_plus = journey_df["days_since_signup"] >= retention_window_days
+    
+    # 5. Time between actions (e.g., Signup to Activate)
+    # Averaged over every activate event of a known user, from the per-customer
+    # activation sums in the event index (no rescan of the events table), row-aligned
+    # with users by customer_key
+    act = align_event_index(event_index, users)["customers"]
+    timed = act["timed_activations"].to_numpy()
+    known = (timed > 0) & users["signup_date"].notna().to_numpy()
+    timed = timed[known]
+    signup_ms = (users["signup_date"][known] - EPOCH) // pd.Timedelta(milliseconds=1)
+    
+    # 6. Revenue: active subscriptions at their monthly price (annual plans / 12, as in the MRR table)
+    active_subs = subs[subs["status"] == "active"]
+    
+    partials = {
+        "n_users": int(len(users)),
+        "n_activated": int(journey_df["is_activated"].sum()),
+        "total_events": int(event_index["n_events"]),
+        "cohort_30_plus": int(cohort_30_plus.sum()),
+        "retained_30_plus": int((cohort_30_plus & (segment == "Active")).sum()),
+        "n_segmented": int(len(journey_df)),
+        "n_churned": int((segment == "Churned").sum()),
+        "n_at_risk": int((segment == "At-Risk").sum()),
+        "n_active": int((segment == "Active").sum()),
+        "n_active_last_30_days": int(journey_df["stage"].isin(["Engagement", "Retained"]).sum()),
+        # Integer totals keep the mean independent of customer/merge order
+        "activation_ms_total": int((act["activation_ms"].to_numpy()[known] - timed * signup_ms.to_numpy()).sum()),
+        "n_timed_activations": int(timed.sum()),
+        "n_subs": int(len(subs)),
+        "mrr_cents": int(np.rint(monthly_price(active_subs) * MRR_CENTS).astype(np.int64).sum()),
+    }
+    if churn_scores is not None:
+        scores = churn_scores["churn_score"].to_numpy(dtype=np.float64)
+        partials["churn_score_units"] = int(np.rint(scores * CHURN_SCORE_UNITS).astype(np.int64).sum())
+        partials["n_scored"] = int(len(scores))
+    return partials
+
+def merge_kpi_partials(*partials: Dict[str, int]) -> Dict[str, int]:
+    """Sums partials from disjoint customer sets."""
+    return {key: sum(p[key] for p in partials) for key in partials[0]}
+
+def kpis_from_partials(p: Dict[str, int]) -> Dict[str, float]:
+    """Turns (merged) KPI partials into the metrics dict."""
+    n_users = p["n_users"]
     
     # 1. Activation Rate
-    n_users = len(users)
-    n_activated = journey_df[journey_df["is_activated"]].shape[0]
+    n_activated = p["n_activated"]
     activation_rate = n_activated / n_users if n_users > 0 else 0
     
     # 2. Engagement Depth
     # Avg events per user
-    total_events = len(events)
-    engagement_depth = total_events / n_users if n_users > 0 else 0
+    engagement_depth = p["total_events"] / n_users if n_users > 0 else 0
     
     # 3. Retention Rate (30 day)
     # Defined here as % of users > 30 days old who are still "Active" (Retained or Engagement)
     # Strict cohort retention is better, but this is a summary scalar.
-    cohort_30_plus = journey_df[journey_df["days_since_signup"] >= 30]
-    if len(cohort_30_plus) > 0:
-        retained = cohort_30_plus[cohort_30_plus["lifecycle_segment"] == "Active"]
-        retention_rate = len(retained) / len(cohort_30_plus)
+    if p["cohort_30_plus"] > 0:
+        retention_rate = p["retained_30_plus"] / p["cohort_30_plus"]
     else:
         retention_rate = 0.0
         
-    # 4. Churn Risk Score
-    # Simple rule-based: if At-Risk -> 0.8, Churned -> 1.0, else 0.1
-    def risk_score(segment):
-        if segment == "Churned": return 1.0
-        if segment == "At-Risk": return 0.8
-        return 0.1
-    
-    journey_df["churn_risk"] = journey_df["lifecycle_segment"].apply(risk_score)
-    avg_churn_risk = journey_df["churn_risk"].mean()
+    # 4. Churn Risk Score (mean of the per-user model score, or of the rule-based score)
+    n_other = p["n_segmented"] - p["n_churned"] - p["n_at_risk"]
+    risk_tenths = (p["n_churned"] * CHURN_RISK_TENTHS["Churned"]
+                   + p["n_at_risk"] * CHURN_RISK_TENTHS["At-Risk"]
+                   + n_other * DEFAULT_CHURN_RISK_TENTHS)
+    avg_churn_risk = risk_tenths / (10 * p["n_segmented"]) if p["n_segmented"] > 0 else np.nan
+    if "n_scored" in p:
+        avg_churn_risk = p["churn_score_units"] / CHURN_SCORE_UNITS / p["n_scored"] if p["n_scored"] > 0 else np.nan
     
-    # 5. Time between actions (e.g., Signup to Activate)
-    # We can use the 'activate' events merge
-    act_events = events[events["event_name"].str.lower() == "activate"].copy()
-    act_events = act_events.merge(users[["customer_id", "signup_date"]], on="customer_id")
-    act_events["time_to_activate"] = (act_events["event_timestamp"] - act_events["signup_date"]).dt.total_seconds() / 3600 # hours
-    avg_time_to_activate_hours = act_events["time_to_activate"].mean()
+    # 5. Time between actions (Signup to Activate), in hours
+    n_act = p["n_timed_activations"]
+    avg_time_to_activate_hours = p["activation_ms_total"] / 3_600_000 / n_act if n_act > 0 else np.nan
     
     # 6. Revenue Metrics (MRR, ARR, LTV)
-    # Filter active subscriptions
-    if not subs.empty:
-        active_subs = subs[subs["status"] == "active"].copy()
-        # Normalization (assuming monthly price)
-        total_mrr = active_subs["price"].sum()
+    churned_users = p["n_churned"]
+    if p["n_subs"] > 0:
+        total_mrr = p["mrr_cents"] / MRR_CENTS
         total_arr = total_mrr * 12
         
         # ARPU
@@ -66,7 +116,6 @@ def calculate_kpis(users: pd.DataFrame, events: pd.DataFrame, journey_df: pd.Dat
         
         # Simple LTV = ARPU / Churn Rate (use Churn Risk as proxy or strict churn rate?)
         # Let's use strict churn rate from segments
-        churned_users = journey_df[journey_df["lifecycle_segment"] == "Churned"].shape[0]
         churn_rate_strict = churned_users / n_users if n_users > 0 else 0
         
         # Avoid div by zero
@@ -93,9 +142,36 @@ def calculate_kpis(users: pd.DataFrame, events: pd.DataFrame, journey_df: pd.Dat
         "avg_revenue_per_user": float(avg_revenue_per_user),
         "avg_ltv": float(avg_ltv),
         "churn_rate": float(churn_rate_strict), # for test compatibility
-        "active_users": int(journey_df[journey_df["lifecycle_segment"] == "Active"].shape[0]),
-        "active_last_30_days": int(journey_df[journey_df["stage"].isin(["Engagement", "Retained"])].shape[0]), # similar to Active
+        "active_users": int(p["n_active"]),
+        "active_last_30_days": int(p["n_active_last_30_days"]), # similar to Active
         "signup_count": int(n_users),
         "activation_count": int(n_activated),
         "churn_count": int(churned_users)
     }
+
+def calculate_kpis(users: pd.DataFrame, events: pd.DataFrame, journey_df: pd.DataFrame, subs: pd.DataFrame,
+                   event_index: Optional[Dict[str, Any]] = None,
+                   mrr_table: Optional[pd.DataFrame] = None,
+                   churn_scores: Optional[pd.DataFrame] = None,
+                   retention_window_days: int = RETENTION_WINDOW_DAYS) -> Dict[str, float]:
+    """
+    Calculates Mandatory KPIs:
+    - Activation rate
+    - Engagement depth (avg events/user)
+    - Retention rate (30-day inferred from active status)
+    - Churn risk score (avg prob): mean churn_score of `churn_scores` (the output of
+      src.analytics.churn.score_customers), or the rule-based score when it is None
+    - Avg time between key actions
+    - NRR, GRR and quick ratio for the last complete month, when an MRR movement
+      table (src.analytics.mrr.compute_mrr_movements) is passed as mrr_table
+
+    Pass a prebuilt event_index (src.etl.event_index) to avoid rescanning events.
+    """
+    logger.info("Calculating KPIs...")
+    if event_index is None:
+        event_index = build_event_index(events)
+    kpis = kpis_from_partials(kpi_partials(users, journey_df, subs, event_index, churn_scores,
+                                                retention_window_days))
+    if mrr_table is not None:
+        kpis.update(revenue_retention_kpis(mrr_table))
+    return kpis
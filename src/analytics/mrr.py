@@ -0,0 +1,107 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Optional
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MRR_EPSILON = 1e-6 # MRR below this counts as zero in ratio guards (see docs/metrics_definitions.md)
+MOVEMENT_COLUMNS = ["mrr", "new_mrr", "expansion_mrr", "contraction_mrr", "churned_mrr"]
+
+def monthly_price(subs: pd.DataFrame) -> np.ndarray:
+    """Price normalized to a month: annual plans are spread over 12 months."""
+    price = subs["price"].to_numpy(dtype=np.float64)
+    if "billing_period" not in subs:
+        return price
+    annual = (subs["billing_period"].astype(str).str.lower() == "annual").to_numpy()
+    return np.where(annual, price / 12, price)
+
+def _month_numbers(ts: pd.Series) -> np.ndarray:
+    return ts.to_numpy(dtype="datetime64[ns]").astype("datetime64[M]").astype(np.int64)
+
+def compute_mrr_movements(subs: pd.DataFrame, as_of: Optional[pd.Timestamp] = None) -> pd.DataFrame:
+    """
+    Month-end MRR per month and its movements (new, expansion, contraction, churned),
+    rounded to cents, with NRR, GRR and quick ratio for every month.
+
+    A subscription counts towards month m if it started on or before m and has not
+    ended by the end of m. Rows with a non-active status and no end_date are left out
+    (their end is unknown), as in stage_history and the total_mrr KPI. Subscriptions are expanded into (customer, month) MRR
+    intervals with np.repeat, summed per key, and each key is compared with the same
+    customer's previous month via searchsorted on the sorted keys -- no per-row loop.
+    """
+    logger.info("Computing MRR movements...")
+    as_of = pd.Timestamp.now() if as_of is None else pd.Timestamp(as_of)
+    last_month = np.datetime64(as_of, "M").astype(np.int64)
+
+    subs = subs[subs["start_date"].notna() & ((subs["status"] == "active") | subs["end_date"].notna())]
+    start = _month_numbers(subs["start_date"])
+    end = np.where(subs["end_date"].notna(), _month_numbers(subs["end_date"].fillna(as_of)), last_month + 1)
+    end = np.minimum(end, last_month + 1)
+    keep = end > start
+    if not keep.any():
+        return pd.DataFrame(columns=["month"] + MOVEMENT_COLUMNS + ["net_new_mrr", "nrr", "grr", "quick_ratio"])
+    start, end = start[keep], end[keep]
+    price = monthly_price(subs)[keep]
+    cust, _ = pd.factorize(subs["customer_id"].to_numpy()[keep])
+
+    # Interval expansion: one row per (subscription, active month)
+    first_month = start.min()
+    n_months = int(last_month - first_month) + 1
+    lengths = end - start
+    sub_rows = np.repeat(np.arange(len(start)), lengths)
+    within = np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+    month_idx = start[sub_rows] - first_month + within
+
+    # MRR per (customer, month), keyed as customer * n_months + month
+    keys, inverse = np.unique(cust[sub_rows].astype(np.int64) * n_months + month_idx, return_inverse=True)
+    mrr = np.bincount(inverse, weights=price[sub_rows])
+    month_of_key = keys % n_months
+
+    def lookup(offset):
+        """MRR of the same customer `offset` months away (0 when absent)."""
+        pos = np.searchsorted(keys, keys + offset).clip(max=len(keys) - 1)
+        same_customer = (month_of_key + offset >= 0) & (month_of_key + offset < n_months)
+        found = same_customer & (keys[pos] == keys + offset)
+        return np.where(found, mrr[pos], 0.0)
+
+    prev = lookup(-1)
+    delta = mrr - prev
+    # Customers whose MRR disappears next month churn in month + 1
+    churn_next = (lookup(1) == 0) & (month_of_key + 1 < n_months)
+
+    def per_month(idx, weights):
+        return np.bincount(idx, weights=weights, minlength=n_months).astype(np.float64)
+
+    table = pd.DataFrame({
+        "mrr": per_month(month_of_key, mrr),
+        "new_mrr": per_month(month_of_key, np.where(prev == 0, mrr, 0.0)),
+        "expansion_mrr": per_month(month_of_key, np.where((prev > 0) & (delta > 0), delta, 0.0)),
+        "contraction_mrr": per_month(month_of_key, np.where((prev > 0) & (delta < 0), -delta, 0.0)),
+        "churned_mrr": per_month(month_of_key[churn_next] + 1, mrr[churn_next]),
+    })
+    # Money columns in cents, without the float noise of the bincount sums
+    table = table.round(2)
+    table.insert(0, "month", pd.DatetimeIndex(
+        np.arange(first_month, last_month + 1).astype("datetime64[M]").astype("datetime64[ns]")
+    ).strftime("%Y-%m-%d"))
+
+    start_mrr = table["mrr"].shift(1, fill_value=0.0)
+    lost = table["contraction_mrr"] + table["churned_mrr"]
+    has_base = start_mrr >= MRR_EPSILON
+    table["net_new_mrr"] = (table["new_mrr"] + table["expansion_mrr"] - lost).round(2)
+    table["nrr"] = ((start_mrr + table["expansion_mrr"] - lost) / start_mrr).where(has_base)
+    table["grr"] = ((start_mrr - lost) / start_mrr).where(has_base)
+    table["quick_ratio"] = ((table["new_mrr"] + table["expansion_mrr"]) / lost).where(lost >= MRR_EPSILON)
+    return table
+
+def revenue_retention_kpis(mrr_table: pd.DataFrame, as_of: Optional[pd.Timestamp] = None) -> Dict[str, float]:
+    """NRR, GRR and quick ratio for the last complete month before `as_of` (null when undefined)."""
+    as_of = pd.Timestamp.now() if as_of is None else pd.Timestamp(as_of)
+    analysis_month = (as_of.to_period("M") - 1).start_time.strftime("%Y-%m-%d")
+    row = mrr_table[mrr_table["month"] == analysis_month]
+    kpis = {}
+    for column, name in [("nrr", "net_revenue_retention"), ("grr", "gross_revenue_retention"), ("quick_ratio", "quick_ratio")]:
+        value = row[column].iloc[0] if len(row) else np.nan
+        kpis[name] = None if pd.isna(value) else float(value)
+    return kpis
@@ -0,0 +1,101 @@
+"""
+Per-customer support load: tickets opened and still open, time-to-resolution
+percentiles and the priority / category mix, computed from the support tickets in a
+few array passes (one sort, a handful of bincounts) without per-ticket Python.
+"""
+from typing import Optional, Sequence
+import numpy as np
+import pandas as pd
+from src.etl.customers import fact_keys, per_customer_sum
+from src.utils.timeline import HOUR_NS
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+TICKET_PRIORITIES = ["High", "Medium", "Low"]
+TICKET_CATEGORIES = ["Access", "Billing", "Feature_Req", "Technical"]
+# Per-customer time-to-resolution percentiles, as resolution_p<NN>_hours columns
+RESOLUTION_QUANTILES = [0.5, 0.9]
+
+
+def group_quantiles(keys: np.ndarray, values: np.ndarray, n_groups: int,
+                    quantiles: Sequence[float] = RESOLUTION_QUANTILES) -> np.ndarray:
+    """
+    (n_groups, len(quantiles)) quantiles of `values` per key, linearly interpolated
+    like groupby(keys).quantile(q); NaN for groups without values. Rows are coded as
+    key * R + value rank (R distinct values), so a single integer sort orders them by
+    (key, value) for every quantile. Rows with key -1 are ignored.
+    """
+    known = keys >= 0
+    keys = keys[known]
+    uniques, ranks = np.unique(np.asarray(values, dtype=np.float64)[known], return_inverse=True)
+    width = max(len(uniques), 1)
+    coded = np.sort(keys.astype(np.int64) * width + ranks)
+    values = uniques[coded % width]
+    counts = np.bincount(keys, minlength=n_groups)
+    starts = np.cumsum(counts) - counts
+    result = np.full((n_groups, len(quantiles)), np.nan)
+    has = counts > 0
+    last = counts[has] - 1
+    for j, q in enumerate(quantiles):
+        position = q * last
+        lower = np.floor(position).astype(np.int64)
+        below = values[starts[has] + lower]
+        above = values[starts[has] + np.minimum(lower + 1, last)]
+        result[has, j] = below + (above - below) * (position - lower)
+    return result
+
+
+def mix_counts(keys: np.ndarray, labels: pd.Series, levels: Sequence[str], n_groups: int) -> np.ndarray:
+    """(n_groups, len(levels)) rows per key and label; labels outside `levels` are not counted."""
+    codes = pd.Categorical(labels, categories=levels).codes
+    counted = (keys >= 0) & (codes >= 0)
+    flat = keys[counted].astype(np.int64) * len(levels) + codes[counted]
+    return np.bincount(flat, minlength=n_groups * len(levels)).reshape(n_groups, len(levels))
+
+
+def _share_columns(prefix: str, levels: Sequence[str], counts: np.ndarray, totals: np.ndarray):
+    shares = np.divide(counts, totals[:, None], out=np.full(counts.shape, np.nan), where=totals[:, None] > 0)
+    return {f"{prefix}_{level.lower()}_share": shares[:, i] for i, level in enumerate(levels)}
+
+
+def ticket_features(customers: pd.DataFrame, tickets: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """
+    Support features row-aligned with `customers` (users or journey rows):
+    - tickets / open_tickets: tickets opened, and those without a resolved_at
+    - resolution_p50_hours / resolution_p90_hours: time-to-resolution percentiles
+      over the customer's resolved tickets (NaN when there are none)
+    - priority_<level>_share / category_<level>_share: share of the customer's
+      tickets per TICKET_PRIORITIES / TICKET_CATEGORIES value (NaN without tickets)
+    Tickets are matched through their customer_key (src.etl.customers); unmatched
+    tickets are ignored. With no tickets table every customer has zero tickets.
+    """
+    logger.info("Computing support ticket features...")
+    n = len(customers)
+    if tickets is None:
+        tickets = pd.DataFrame({"customer_id": pd.Series(dtype=object),
+                                "created_at": pd.Series(dtype="datetime64[ns]"),
+                                "resolved_at": pd.Series(dtype="datetime64[ns]")})
+    keys = fact_keys(customers, tickets)
+    totals = per_customer_sum(keys, n).astype(np.int64)
+
+    features = {"tickets": totals}
+    if "resolved_at" in tickets.columns:
+        created = tickets["created_at"].to_numpy(dtype="datetime64[ns]")
+        resolved_at = tickets["resolved_at"].to_numpy(dtype="datetime64[ns]")
+        resolved = ~np.isnat(resolved_at) & ~np.isnat(created)
+        features["open_tickets"] = per_customer_sum(np.where(np.isnat(resolved_at), keys, -1), n).astype(np.int64)
+        hours = (resolved_at[resolved].view(np.int64) - created[resolved].view(np.int64)) / HOUR_NS
+        percentiles = group_quantiles(keys[resolved], hours, n)
+    else:
+        features["open_tickets"] = np.zeros(n, dtype=np.int64)
+        percentiles = np.full((n, len(RESOLUTION_QUANTILES)), np.nan)
+    for j, q in enumerate(RESOLUTION_QUANTILES):
+        features[f"resolution_p{round(q * 100)}_hours"] = percentiles[:, j]
+
+    for prefix, column, levels in [("priority", "priority", TICKET_PRIORITIES),
+                                   ("category", "issue_category", TICKET_CATEGORIES)]:
+        counts = (mix_counts(keys, tickets[column], levels, n) if column in tickets.columns
+                  else np.zeros((n, len(levels)), dtype=np.int64))
+        features.update(_share_columns(prefix, levels, counts, totals))
+    return pd.DataFrame(features, index=customers.index)
@@ -0,0 +1,259 @@
+"""
+What-if KPIs for alternative stage / segment thresholds.
+
+The per-customer base facts (activation, active subscription, days since signup and
+last activity, lifetime revenue, churn score) are computed once; stages, segments and
+the KPIs are then re-derived for a whole grid of thresholds in one vectorized sweep:
+    python -m src.analytics.whatif --activation-window-days 7 14 21 --churn-window-days 14 30 60 \\
+        --retention-window-days 30 --high-tier-revenue 250 500 1000 [--output outputs/whatif_grid.csv]
+"""
+import argparse
+import itertools
+import sys
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, Hashable, List, NamedTuple, Optional, Sequence
+import numpy as np
+import pandas as pd
+from src.analytics.churn import score_customers
+from src.analytics.kpis import kpi_partials, kpis_from_partials
+from src.analytics.mrr import compute_mrr_movements, revenue_retention_kpis
+from src.etl.event_index import build_event_index
+from src.etl.loader import load_data
+from src.journey.classifier import STAGES, StageThresholds, assign_stage_codes, classify_journey_stages
+from src.journey.transitions import LIFECYCLE_CODES
+from src.segmentation.engine import (
+    HIGH_TIER_REVENUE, LIFECYCLE_SEGMENTS, REVENUE_SEGMENTS, create_segments, revenue_segment_codes,
+)
+from src.utils.config import (
+    ACTIVATION_WINDOW_DAYS, CHURN_WINDOW_DAYS, RETENTION_WINDOW_DAYS, WHATIF_CACHE_SIZE, WHATIF_GRID_FILE,
+)
+from src.utils.writers import write_table
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Customer x scenario cells evaluated at once by WhatIf.sweep (bounds its temporaries)
+SWEEP_BLOCK_CELLS = 4_000_000
+
+
+class Scenario(NamedTuple):
+    """One set of thresholds; the defaults reproduce the pipeline's outputs."""
+    activation_window_days: float = ACTIVATION_WINDOW_DAYS  # Acquisition stage cutoff (classifier)
+    churn_window_days: float = CHURN_WINDOW_DAYS  # Engagement recency cutoff (classifier)
+    retention_window_days: float = RETENTION_WINDOW_DAYS  # Age of the retention KPI cohort
+    high_tier_revenue: float = HIGH_TIER_REVENUE  # Revenue segment boundary (segmentation)
+
+
+def scenario_grid(**values: Sequence[float]) -> List[Scenario]:
+    """Every combination of the given Scenario field values (other fields keep their defaults)."""
+    unknown = set(values) - set(Scenario._fields)
+    if unknown:
+        raise ValueError(f"Unknown scenario fields: {sorted(unknown)}")
+    fields = list(values)
+    return [Scenario(**dict(zip(fields, combo))) for combo in itertools.product(*values.values())]
+
+
+def _distinct(values: List[Hashable]):
+    """The distinct values in first-seen order, and each value's position among them."""
+    positions: Dict[Hashable, int] = {}
+    index = [positions.setdefault(v, len(positions)) for v in values]
+    return list(positions), index
+
+
+def _column_counts(codes: np.ndarray, n_codes: int) -> np.ndarray:
+    """(columns, n_codes) occurrence counts of each code per column of a (rows, columns) code array."""
+    columns = codes.shape[1]
+    flat = (codes + np.arange(columns)[None, :] * n_codes).ravel()
+    return np.bincount(flat, minlength=columns * n_codes).reshape(columns, n_codes)
+
+
+class LRUCache:
+    """Least-recently-used mapping with at most `maxsize` entries."""
+
+    def __init__(self, maxsize: int = WHATIF_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[Hashable, Any]" = OrderedDict()
+        self.hits = self.misses = 0
+
+    def get(self, key: Hashable, default=None):
+        if key in self._items:
+            self._items.move_to_end(key)
+            self.hits += 1
+            return self._items[key]
+        self.misses += 1
+        return default
+
+    def put(self, key: Hashable, value: Any):
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.maxsize:
+            self._items.popitem(last=False)
+
+    def __len__(self):
+        return len(self._items)
+
+
+class WhatIf:
+    """
+    Re-derives stages, segments and KPIs per Scenario from per-customer base facts.
+    `journey` is the default classify_journey_stages() output (its day counts and
+    flags do not depend on the thresholds) and `amount` the lifetime revenue per row.
+    Results are memoized per Scenario in an LRU cache.
+    """
+
+    def __init__(self, users: pd.DataFrame, journey: pd.DataFrame, amount: np.ndarray, subs: pd.DataFrame,
+                 event_index: Dict[str, Any], churn_scores: Optional[pd.DataFrame] = None,
+                 mrr_table: Optional[pd.DataFrame] = None, cache_size: int = WHATIF_CACHE_SIZE):
+        self.customer_id = journey["customer_id"].to_numpy()
+        self.is_activated = journey["is_activated"].to_numpy(dtype=bool)
+        self.has_active_sub = journey["has_active_sub"].to_numpy(dtype=bool)
+        self.days_since_signup = journey["days_since_signup"].to_numpy(dtype=np.float64)
+        self.days_since_last_seen = journey["days_since_last_seen"].to_numpy(dtype=np.float64)
+        self.amount = np.asarray(amount, dtype=np.float64)
+        # Threshold-independent partials, from the default segmentation
+        codes = self._stage_codes(np.arange(len(journey)), [ACTIVATION_WINDOW_DAYS], [CHURN_WINDOW_DAYS])[:, 0]
+        segments = journey.assign(lifecycle_segment=np.array(LIFECYCLE_SEGMENTS, dtype=object)[LIFECYCLE_CODES[codes]])
+        self.base_partials = kpi_partials(users, segments, subs, event_index, churn_scores)
+        self.revenue_kpis = revenue_retention_kpis(mrr_table) if mrr_table is not None else {}
+        self.cache = LRUCache(cache_size)
+
+    @classmethod
+    def from_data(cls, data: Dict[str, Any], event_index: Optional[Dict[str, Any]] = None,
+                  churn_scores: Optional[pd.DataFrame] = None, mrr_table: Optional[pd.DataFrame] = None,
+                  cache_size: int = WHATIF_CACHE_SIZE) -> "WhatIf":
+        """Computes the base facts from load_data()-style inputs, like the pipeline stages do."""
+        users, subs = data["users"], data["subscriptions"]
+        if event_index is None:
+            event_index = data.get("event_index")
+        if event_index is None:
+            event_index = build_event_index(data["events"], len(users))
+        journey = classify_journey_stages(users, data["events"], subs, event_index)
+        amount = create_segments(journey, data["revenue"])["amount"].to_numpy()
+        if churn_scores is None:
+            churn_scores = score_customers(users, event_index, data["revenue"], data.get("support_tickets"))
+        if mrr_table is None:
+            mrr_table = compute_mrr_movements(subs)
+        return cls(users, journey, amount, subs, event_index, churn_scores, mrr_table, cache_size)
+
+    def _stage_codes(self, rows: np.ndarray, activation: np.ndarray, churn: np.ndarray) -> np.ndarray:
+        """Stage codes of customers `rows` (axis 0) under each activation / churn window pair (axis 1)."""
+        journey = {"has_active_sub": self.has_active_sub[rows, None], "is_activated": self.is_activated[rows, None],
+                   "days_since_signup": self.days_since_signup[rows, None],
+                   "days_since_last_seen": self.days_since_last_seen[rows, None]}
+        return assign_stage_codes(journey, StageThresholds(np.asarray(activation, dtype=np.float64)[None, :],
+                                                           np.asarray(churn, dtype=np.float64)[None, :]))
+
+    def _evaluate(self, scenarios: List[Scenario]) -> List[tuple]:
+        """
+        One pass over customer blocks accumulating counts, then the KPIs per scenario.
+        Each count only depends on some of the thresholds, so it is computed once per
+        distinct value of those (e.g. stages per activation / churn window pair) and
+        shared by the scenarios that differ only in the others.
+        """
+        n, k = len(self.customer_id), len(scenarios)
+        pairs, pair_of = _distinct([(s.activation_window_days, s.churn_window_days) for s in scenarios])
+        windows, window_of = _distinct([s.retention_window_days for s in scenarios])
+        tiers, tier_of = _distinct([s.high_tier_revenue for s in scenarios])
+        combos, combo_of = _distinct(list(zip(pair_of, window_of)))
+        combo_pair, combo_window = (np.array(c, dtype=np.intp) for c in zip(*combos))
+        activation, churn = (np.array(v, dtype=np.float64) for v in zip(*pairs))
+        p, w, t = len(pairs), len(windows), len(tiers)
+
+        stage_counts = np.zeros((p, len(STAGES)), dtype=np.int64)
+        segment_counts = np.zeros((p, len(LIFECYCLE_SEGMENTS)), dtype=np.int64)
+        revenue_counts = np.zeros((t, len(REVENUE_SEGMENTS)), dtype=np.int64)
+        cohort = np.zeros(w, dtype=np.int64)
+        retained = np.zeros(len(combos), dtype=np.int64)
+        active = LIFECYCLE_SEGMENTS.index("Active")
+
+        block = max(1, SWEEP_BLOCK_CELLS // max(p, w, t, len(combos)))
+        for start in range(0, n, block):
+            rows = np.arange(start, min(start + block, n))
+            codes = self._stage_codes(rows, activation, churn)
+            lifecycle = LIFECYCLE_CODES[codes]
+            in_cohort = self.days_since_signup[rows, None] >= np.array(windows, dtype=np.float64)[None, :]
+            revenue = revenue_segment_codes(self.amount[rows, None], np.array(tiers, dtype=np.float64)[None, :])
+            stage_counts += _column_counts(codes, len(STAGES))
+            segment_counts += _column_counts(lifecycle, len(LIFECYCLE_SEGMENTS))
+            revenue_counts += _column_counts(revenue, len(REVENUE_SEGMENTS))
+            cohort += in_cohort.sum(axis=0)
+            is_active = lifecycle == active
+            retained += (is_active[:, combo_pair] & in_cohort[:, combo_window]).sum(axis=0)
+
+        # (KPIs, counts) per scenario
+        results = []
+        for i in range(k):
+            segments = dict(zip(LIFECYCLE_SEGMENTS, segment_counts[pair_of[i]].tolist()))
+            stages = dict(zip(STAGES, stage_counts[pair_of[i]].tolist()))
+            partials = {**self.base_partials, "cohort_30_plus": int(cohort[window_of[i]]),
+                        "retained_30_plus": int(retained[combo_of[i]]),
+                        "n_churned": segments["Churned"], "n_at_risk": segments["At-Risk"],
+                        "n_active": segments["Active"],
+                        "n_active_last_30_days": stages["Engagement"] + stages["Retained"]}
+            tiers = zip(REVENUE_SEGMENTS, revenue_counts[tier_of[i]].tolist())
+            counts = {**{f"stage_{name}": count for name, count in stages.items()},
+                      **{f"segment_{name}": count for name, count in segments.items()},
+                      **{f"revenue_{name}": count for name, count in tiers}}
+            results.append(({**kpis_from_partials(partials), **self.revenue_kpis}, counts))
+        return results
+
+    def _results(self, scenarios: List[Scenario]) -> Dict[Scenario, Any]:
+        results = {s: self.cache.get(s) for s in dict.fromkeys(scenarios)}
+        missing = [s for s, result in results.items() if result is None]
+        if missing:
+            for scenario, result in zip(missing, self._evaluate(missing)):
+                self.cache.put(scenario, result)
+                results[scenario] = result
+        return results
+
+    def sweep(self, scenarios: Sequence[Scenario]) -> pd.DataFrame:
+        """
+        One row per scenario: its thresholds, the KPIs calculate_kpis would report,
+        and customers per stage / lifecycle segment / revenue segment. Scenarios not in
+        the cache are evaluated together in one batched pass.
+        """
+        scenarios = [Scenario(*s) for s in scenarios]
+        results = self._results(scenarios)
+        return pd.DataFrame([{**s._asdict(), **results[s][0], **results[s][1]} for s in scenarios])
+
+    def kpis(self, scenario: Scenario = Scenario()) -> Dict[str, Any]:
+        """The KPI dict (as calculate_kpis returns it) under one scenario."""
+        scenario = Scenario(*scenario)
+        return dict(self._results([scenario])[scenario][0])
+
+    def customers(self, scenario: Scenario = Scenario()) -> pd.DataFrame:
+        """customer_id, stage, lifecycle_segment and revenue_segment per customer under one scenario (not cached)."""
+        scenario = Scenario(*scenario)
+        codes = self._stage_codes(np.arange(len(self.customer_id)), [scenario.activation_window_days],
+                                  [scenario.churn_window_days])[:, 0]
+        revenue = revenue_segment_codes(self.amount, scenario.high_tier_revenue)
+        return pd.DataFrame({
+            "customer_id": self.customer_id,
+            "stage": np.array(STAGES, dtype=object)[codes],
+            "lifecycle_segment": np.array(LIFECYCLE_SEGMENTS, dtype=object)[LIFECYCLE_CODES[codes]],
+            "revenue_segment": np.array(REVENUE_SEGMENTS, dtype=object)[revenue],
+        })
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    defaults = Scenario()
+    for field in Scenario._fields:
+        parser.add_argument(f"--{field.replace('_', '-')}", type=float, nargs="+", default=[getattr(defaults, field)])
+    parser.add_argument("--output", type=Path, default=WHATIF_GRID_FILE)
+    args = parser.parse_args(argv)
+
+    data = load_data()
+    whatif = WhatIf.from_data(data)
+    grid = scenario_grid(**{field: getattr(args, field) for field in Scenario._fields})
+    start = time.perf_counter()
+    table = whatif.sweep(grid)
+    logger.info(f"Evaluated {len(grid)} scenarios in {time.perf_counter() - start:.3f}s")
+    write_table(table, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
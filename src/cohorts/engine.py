@@ -0,0 +1,79 @@
+import pandas as pd
+import numpy as np
+from typing import Optional
+from src.etl.customers import fact_keys
+from src.utils.config import COHORT_MAX_PERIODS
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+GRAINS = ["day", "week", "month"]
+GRAIN_ADJECTIVES = {"day": "daily", "week": "weekly", "month": "monthly"}
+EPOCH_DAY = np.datetime64("1970-01-01", "D")
+EPOCH_MONDAY_OFFSET = 3 # 1970-01-01 was a Thursday; shifting by 3 days puts week boundaries on Mondays
+
+def period_numbers(ts: pd.Series, grain: str) -> np.ndarray:
+    """Integer period number per timestamp (days, Monday-based weeks or months since 1970-01)."""
+    days = ts.to_numpy(dtype="datetime64[ns]").astype("datetime64[D]")
+    if grain == "day":
+        return (days - EPOCH_DAY).astype(np.int64)
+    if grain == "week":
+        return ((days - EPOCH_DAY).astype(np.int64) + EPOCH_MONDAY_OFFSET) // 7
+    if grain == "month":
+        return days.astype("datetime64[M]").astype(np.int64)
+    raise ValueError(f"Unknown cohort grain '{grain}', expected one of {GRAINS}")
+
+def period_starts(periods: np.ndarray, grain: str) -> pd.DatetimeIndex:
+    """First day of each integer period from period_numbers()."""
+    if grain == "month":
+        return pd.DatetimeIndex(periods.astype("datetime64[M]").astype("datetime64[ns]"))
+    days = periods * 7 - EPOCH_MONDAY_OFFSET if grain == "week" else periods
+    return pd.DatetimeIndex((EPOCH_DAY + days.astype("timedelta64[D]")).astype("datetime64[ns]"))
+
+def compute_cohort_retention(users: pd.DataFrame, events: pd.DataFrame, grain: str = "month",
+                             max_periods: Optional[int] = None) -> pd.DataFrame:
+    """
+    Signup-cohort retention matrix: share of each signup cohort with at least one event
+    in period 0, 1, ... max_periods-1 after its signup period (default: the grain's
+    COHORT_MAX_PERIODS). All arithmetic is on integer period numbers, and distinct
+    (customer, offset) pairs are marked in a flat bitmap and counted per cohort with one
+    bincount, so there is no per-cohort loop.
+    """
+    if grain not in GRAINS:
+        raise ValueError(f"Unknown cohort grain '{grain}', expected one of {GRAINS}")
+    if max_periods is None:
+        max_periods = COHORT_MAX_PERIODS[grain]
+    logger.info(f"Computing {GRAIN_ADJECTIVES[grain]} cohort retention ({max_periods} periods)...")
+    label = f"signup_{grain}"
+    has_signup = users["signup_date"].notna().to_numpy()
+    columns = [label] + [str(k) for k in range(max_periods)]
+    if not has_signup.any():
+        return pd.DataFrame(columns=columns)
+    # Per customer_key (users row); customers without a signup date get no cohort
+    signup_period = np.zeros(len(users), dtype=np.int64)
+    signup_period[has_signup] = period_numbers(users["signup_date"][has_signup], grain)
+
+    # Events -> customer_key of their customer (-1 when unknown)
+    user_pos = fact_keys(users, events)
+    known = (user_pos >= 0) & events["event_timestamp"].notna().to_numpy()
+    known[known] = has_signup[user_pos[known]]
+    user_pos = user_pos[known]
+    offset = period_numbers(events["event_timestamp"][known], grain) - signup_period[user_pos]
+    in_window = (offset >= 0) & (offset < max_periods)
+
+    # Distinct (customer, offset) pairs
+    active = np.zeros(len(users) * max_periods, dtype=bool)
+    active[user_pos[in_window] * max_periods + offset[in_window]] = True
+    active_user, active_offset = np.divmod(np.flatnonzero(active), max_periods)
+
+    first_cohort = signup_period[has_signup].min()
+    cohort = signup_period - first_cohort
+    n_cohorts = int(cohort[has_signup].max()) + 1
+    sizes = np.bincount(cohort[has_signup], minlength=n_cohorts)
+    retained = np.bincount(cohort[active_user] * max_periods + active_offset,
+                           minlength=n_cohorts * max_periods).reshape(n_cohorts, max_periods)
+
+    has_users = sizes > 0
+    matrix = pd.DataFrame(retained[has_users] / sizes[has_users, None], columns=columns[1:])
+    matrix.insert(0, label, period_starts(np.flatnonzero(has_users) + first_cohort, grain).strftime("%Y-%m-%d"))
+    return matrix
@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+import pandas as pd
+from pathlib import Path
+from typing import Callable, Dict, Any, Optional
+from src.etl.schema import SCHEMAS, apply_schema, schema_fingerprint
+from src.utils.config import INPUT_CACHE_DIR
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MANIFEST_FILE = "manifest.json"
+
+def file_fingerprint(path: Path) -> Dict[str, Any]:
+    """Size, mtime and SHA-256 of a source file."""
+    stat = path.stat()
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": digest.hexdigest()}
+
+
+def _read_manifest(cache_dir: Path) -> Dict[str, Any]:
+    path = cache_dir / MANIFEST_FILE
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_manifest(cache_dir: Path, manifest: Dict[str, Any]):
+    tmp = cache_dir / (MANIFEST_FILE + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, cache_dir / MANIFEST_FILE)
+
+
+def _schema_key(name: str) -> Optional[str]:
+    return schema_fingerprint(name) if name in SCHEMAS else None
+
+
+def _is_fresh(name: str, entry: Optional[Dict[str, Any]], source: Path, cache_file: Path) -> bool:
+    """
+    A cache entry is fresh when its Parquet file exists, was written under the current
+    schema of `name` (src.etl.schema) and the source is unchanged.
+    Size and mtime are checked first; the content hash is only recomputed when the
+    mtime moved, so a touched-but-identical file is still a hit.
+    """
+    if entry is None or entry.get("source") != str(source) or not cache_file.exists():
+        return False
+    if entry.get("schema") != _schema_key(name):
+        return False
+    stat = source.stat()
+    if stat.st_size != entry["size"]:
+        return False
+    if stat.st_mtime_ns == entry["mtime_ns"]:
+        return True
+    if file_fingerprint(source)["sha256"] != entry["sha256"]:
+        return False
+    entry["mtime_ns"] = stat.st_mtime_ns
+    return True
+
+
+def load_cached(name: str, source: Path, parse: Callable[[], pd.DataFrame],
+                rebuild: bool = False, cache_dir: Path = INPUT_CACHE_DIR) -> pd.DataFrame:
+    """
+    Returns the typed frame for `source`, from the Parquet cache when the source
+    fingerprint still matches, otherwise by calling `parse`, applying the declared
+    schema of `name` (if any) and refreshing the cache.
+    """
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    cache_file = cache_dir / f"{name}.parquet"
+    manifest = _read_manifest(cache_dir)
+    entry = manifest.get(name)
+
+    if not rebuild and entry is not None:
+        mtime_ns = entry["mtime_ns"]
+        if _is_fresh(name, entry, source, cache_file):
+            if entry["mtime_ns"] != mtime_ns:
+                _write_manifest(cache_dir, manifest)
+            logger.info(f"Cache hit for {name} ({cache_file.name})")
+            # Parquet keeps "string" columns but not their storage; read them back as Arrow strings
+            with pd.option_context("mode.string_storage", "pyarrow"):
+                return pd.read_parquet(cache_file)
+
+    logger.info(f"Cache {'rebuild' if rebuild else 'miss'} for {name}; parsing {source.name}")
+    fingerprint = file_fingerprint(source)
+    df = apply_schema(name, parse()) if name in SCHEMAS else parse()
+    tmp = cache_file.with_suffix(".parquet.tmp")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, cache_file)
+    manifest[name] = {"source": str(source), "schema": _schema_key(name), **fingerprint}
+    _write_manifest(cache_dir, manifest)
+    return df
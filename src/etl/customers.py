@@ -0,0 +1,103 @@
+import numpy as np
+import pandas as pd
+from typing import Dict
+from src.etl.schema import SchemaError
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Dense int32 surrogate key: the row position of the customer in users
+KEY_COLUMN = "customer_key"
+KEYED_TABLES = ["events", "subscriptions", "revenue", "support_tickets"]
+
+
+def build_customer_dimension(customers: pd.DataFrame) -> pd.Index:
+    """customer_id per surrogate key (row order of `customers`); ids must be unique."""
+    ids = customers["customer_id"]
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        dimension = ids.cat.categories.take(ids.cat.codes.to_numpy())
+    else:
+        dimension = pd.Index(ids.to_numpy())
+    if not dimension.is_unique:
+        raise SchemaError(f"users.customer_id has {int(dimension.duplicated().sum())} duplicate ids")
+    return dimension.rename("customer_id")
+
+
+def encode_customer_ids(dimension: pd.Index, ids: pd.Series) -> np.ndarray:
+    """
+    Surrogate key per row of `ids` (-1 when the customer is not in the dimension).
+    Categorical ids are looked up once per category and expanded through their codes,
+    so the string hashing is proportional to distinct customers, not rows.
+    """
+    if isinstance(ids.dtype, pd.CategoricalDtype):
+        lookup = dimension.get_indexer(ids.cat.categories).astype(np.int32)
+        codes = ids.cat.codes.to_numpy()
+        return np.where(codes >= 0, lookup[codes], -1).astype(np.int32)
+    return dimension.get_indexer(ids.to_numpy()).astype(np.int32)
+
+
+def resolve_customer_ids(ids: pd.Series, id_map: pd.Series) -> pd.Series:
+    """
+    Rewrites ids from another system (e.g. the helpdesk's usr_ ids) to users.customer_id
+    through `id_map` (indexed by source id). Ids absent from the map are kept as they are.
+    Categorical ids are remapped per category, so the lookup is proportional to
+    distinct ids; several source ids may resolve to the same customer.
+    """
+    if not isinstance(ids.dtype, pd.CategoricalDtype):
+        ids = ids.astype("category")
+    categories = ids.cat.categories
+    mapped = id_map.reindex(categories).to_numpy(dtype=object)
+    resolved = np.where(pd.isna(mapped), categories.to_numpy(dtype=object), mapped)
+    category_codes, uniques = pd.factorize(resolved)
+    codes = ids.cat.codes.to_numpy()
+    codes = np.where(codes >= 0, category_codes[codes], -1)
+    return pd.Series(pd.Categorical.from_codes(codes, uniques), index=ids.index, name=ids.name)
+
+
+def attach_customer_keys(data: Dict[str, pd.DataFrame]) -> Dict[str, pd.DataFrame]:
+    """
+    Builds the customer dimension from data["users"] once and adds a customer_key
+    column to users and to every fact table present in `data` (returns a new dict).
+    """
+    dimension = build_customer_dimension(data["users"])
+    keyed = dict(data)
+    keyed["users"] = data["users"].assign(**{KEY_COLUMN: np.arange(len(dimension), dtype=np.int32)})
+    for table in KEYED_TABLES:
+        if data.get(table) is not None:
+            keys = encode_customer_ids(dimension, data[table]["customer_id"])
+            keyed[table] = data[table].assign(**{KEY_COLUMN: keys})
+            unmatched = int((keys < 0).sum())
+            if unmatched:
+                logger.warning(f"{table}: {unmatched} of {len(keys)} rows match no customer in users")
+    logger.info(f"Customer dimension: {len(dimension)} customers")
+    return keyed
+
+
+def is_keyed(customers: pd.DataFrame) -> bool:
+    """True when row i of a customer-level frame (users, journey, segments) has customer_key i."""
+    if KEY_COLUMN in customers.columns:
+        keys = customers[KEY_COLUMN].to_numpy()
+    elif customers.index.name == KEY_COLUMN:
+        keys = customers.index.to_numpy()
+    else:
+        return False
+    return bool(np.array_equal(keys, np.arange(len(customers))))
+
+
+def fact_keys(customers: pd.DataFrame, table: pd.DataFrame) -> np.ndarray:
+    """
+    customer_key of each `table` row against the rows of `customers` (-1 when unknown):
+    the precomputed column when both sides come from attach_customer_keys, otherwise
+    encoded on the fly from customer_id.
+    """
+    if KEY_COLUMN in table.columns and is_keyed(customers):
+        return table[KEY_COLUMN].to_numpy()
+    return encode_customer_ids(build_customer_dimension(customers), table["customer_id"])
+
+
+def per_customer_sum(keys: np.ndarray, n_customers: int, weights=None) -> np.ndarray:
+    """Row count (or weight sum) per customer_key; rows with key -1 are ignored."""
+    known = keys >= 0
+    if weights is not None:
+        weights = np.asarray(weights, dtype=np.float64)[known]
+    return np.bincount(keys[known], weights=weights, minlength=n_customers)
@@ -0,0 +1,197 @@
+import pandas as pd
+import numpy as np
+from typing import Dict, Any, Optional
+from src.etl.customers import KEY_COLUMN, build_customer_dimension, is_keyed
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ACTIVATE_EVENT = "activate"
+EPOCH = pd.Timestamp("1970-01-01")
+# How per-customer columns fold when two indexes are merged
+CUSTOMER_AGGS = {"last_seen": "max", "first_activation": "min", "activation_ms": "sum", "timed_activations": "sum"}
+
+
+def encode_event_names(event_name: pd.Series) -> pd.Categorical:
+    """
+    Lower-cases event names once per distinct value instead of once per row.
+    Returns a Categorical aligned with the input rows.
+    """
+    raw = pd.Categorical(event_name)
+    lowered, remap = np.unique(np.asarray(raw.categories.astype(str).str.lower()), return_inverse=True)
+    codes = np.where(raw.codes >= 0, remap[raw.codes], -1)
+    return pd.Categorical.from_codes(codes, categories=lowered)
+
+
+def daily_event_counts(events: pd.DataFrame, event_name: Optional[pd.Categorical] = None) -> pd.Series:
+    """Events per (calendar day, lower-cased event_name), from a single groupby."""
+    if event_name is None:
+        event_name = encode_event_names(events["event_name"])
+    names = pd.Series(event_name, index=events.index, name="event_name")
+    days = events["event_timestamp"].dt.normalize().rename("date")
+    daily_counts = names.groupby([days, names], observed=True).size()
+    daily_counts.index = pd.MultiIndex.from_arrays(
+        [daily_counts.index.get_level_values(0), daily_counts.index.get_level_values(1).astype(str)],
+        names=["date", "event_name"],
+    )
+    return daily_counts
+
+
+def build_event_index(events: pd.DataFrame, n_customers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Scans the events table once and builds the per-customer index shared by the
+    funnel, journey and KPI stages. With `n_customers` and a customer_key column
+    (src.etl.customers) the per-customer frames are dense over keys 0..n_customers-1
+    (index "customer_key", events of unknown customers only counted in n_events and
+    daily_counts); otherwise they are indexed by the customer_ids seen in the events:
+    - customers: first_activation, last_seen, activation_ms / timed_activations (integer
+      sum and count of activation timestamps as epoch milliseconds, so repeated
+      activations can be averaged exactly regardless of merge order)
+    - event_counts: events per customer per (lower-cased) event_name
+    - daily_counts: events per (calendar day, event_name)
+    - event_name: categorical-encoded event_name aligned with the events rows
+    - n_events: total number of events scanned
+
+    Indexes are mergeable (see merge_event_indexes), so chunks of a larger
+    events file can be folded into one index.
+    """
+    logger.info("Building event index...")
+
+    event_name = encode_event_names(events["event_name"])
+    # Everything below groups on dense int codes: the surrogate keys, or the
+    # customer_ids hashed once
+    if n_customers is not None and KEY_COLUMN in events.columns:
+        cust_codes = events[KEY_COLUMN].to_numpy()
+        index = pd.RangeIndex(n_customers, name=KEY_COLUMN)
+    else:
+        cust_codes, cust_ids = pd.factorize(events["customer_id"])
+        index = pd.Index(cust_ids, name="customer_id")
+    has_cust = cust_codes >= 0
+    cust_codes = cust_codes[has_cust]
+    name_codes = np.asarray(event_name.codes)[has_cust]
+    ts = events["event_timestamp"][has_cust].reset_index(drop=True)
+
+    customers = pd.DataFrame(index=index)
+    customers["last_seen"] = ts.groupby(cust_codes).max().reindex(range(len(index))).to_numpy()
+
+    act_code = event_name.categories.get_indexer([ACTIVATE_EVENT])[0]
+    is_act = (name_codes == act_code) if act_code >= 0 else np.zeros(len(name_codes), dtype=bool)
+    act_ts = ts[is_act]
+    act_codes = cust_codes[is_act]
+    customers["first_activation"] = act_ts.groupby(act_codes).min().reindex(range(len(index))).to_numpy()
+    timed = act_ts.notna().to_numpy()
+    act_ms = ((act_ts[timed] - EPOCH) // pd.Timedelta(milliseconds=1)).astype("int64")
+    act_ms_sums = act_ms.groupby(act_codes[timed]).agg(["sum", "size"]).reindex(range(len(index)), fill_value=0)
+    customers["activation_ms"] = act_ms_sums["sum"].to_numpy(dtype="int64")
+    customers["timed_activations"] = act_ms_sums["size"].to_numpy(dtype="int64")
+
+    # Counts per (customer, event_name) from a single bincount over paired codes
+    n_names = len(event_name.categories)
+    named = name_codes >= 0
+    counts = np.bincount(
+        cust_codes[named].astype(np.int64) * n_names + name_codes[named],
+        minlength=len(index) * n_names,
+    ).reshape(len(index), n_names)
+    event_counts = pd.DataFrame(
+        counts, index=index, columns=pd.Index(event_name.categories.astype(str), name="event_name")
+    )
+
+    return {
+        "customers": customers,
+        "event_counts": event_counts,
+        "daily_counts": daily_event_counts(events, event_name),
+        "event_name": event_name,
+        "n_events": int(len(events)),
+    }
+
+
+def merge_event_indexes(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Folds two event indexes built over disjoint slices of the events table.
+    The merged index no longer carries row-aligned event_name codes.
+    """
+    if left["customers"].index.equals(right["customers"].index):
+        return _merge_aligned(left, right)
+    # customers and event_counts share row order, so one groupby folds both
+    stacked = pd.concat([
+        pd.concat([left["customers"], left["event_counts"]], axis=1),
+        pd.concat([right["customers"], right["event_counts"]], axis=1),
+    ])
+    count_cols = stacked.columns.difference(list(CUSTOMER_AGGS), sort=False)
+    stacked[count_cols] = stacked[count_cols].fillna(0)
+    merged = stacked.groupby(level=0, sort=False).agg({**CUSTOMER_AGGS, **{c: "sum" for c in count_cols}})
+    customers = merged[list(CUSTOMER_AGGS)]
+    event_counts = merged[count_cols].astype("int64")
+    event_counts.columns.name = "event_name"
+    daily_counts = left["daily_counts"].add(right["daily_counts"], fill_value=0).astype("int64")
+    return {
+        "customers": customers,
+        "event_counts": event_counts,
+        "daily_counts": daily_counts,
+        "event_name": None,
+        "n_events": left["n_events"] + right["n_events"],
+    }
+
+
+def _merge_aligned(left: Dict[str, Any], right: Dict[str, Any]) -> Dict[str, Any]:
+    """merge_event_indexes for indexes over the same customers in the same order (dense keys): elementwise."""
+    lc, rc = left["customers"], right["customers"]
+    customers = pd.DataFrame({
+        "last_seen": np.fmax(lc["last_seen"].to_numpy(), rc["last_seen"].to_numpy()),
+        "first_activation": np.fmin(lc["first_activation"].to_numpy(), rc["first_activation"].to_numpy()),
+        "activation_ms": lc["activation_ms"].to_numpy() + rc["activation_ms"].to_numpy(),
+        "timed_activations": lc["timed_activations"].to_numpy() + rc["timed_activations"].to_numpy(),
+    }, index=lc.index)
+    left_names, right_names = left["event_counts"].columns, right["event_counts"].columns
+    columns = left_names.append(right_names.difference(left_names, sort=False))
+    event_counts = (left["event_counts"].reindex(columns=columns, fill_value=0)
+                    + right["event_counts"].reindex(columns=columns, fill_value=0))
+    event_counts.columns.name = "event_name"
+    daily_counts = left["daily_counts"].add(right["daily_counts"], fill_value=0).astype("int64")
+    return {
+        "customers": customers,
+        "event_counts": event_counts,
+        "daily_counts": daily_counts,
+        "event_name": None,
+        "n_events": left["n_events"] + right["n_events"],
+    }
+
+
+def align_event_index(event_index: Dict[str, Any], customers: pd.DataFrame) -> Dict[str, Any]:
+    """
+    The event index with dense per-customer frames over the rows of `customers` (row i
+    = customer_key i), as engines index it. An index keyed by customer_id (merged
+    chunks, incremental state) is re-keyed once per distinct customer.
+    """
+    index = event_index["customers"].index
+    if index.name == KEY_COLUMN and len(index) == len(customers) and is_keyed(customers):
+        return event_index
+    if index.name == KEY_COLUMN:
+        raise ValueError("event index is keyed to a different customer dimension")
+    position = build_customer_dimension(customers).get_indexer(index)
+    known = position >= 0
+    dense = pd.RangeIndex(len(customers), name=KEY_COLUMN)
+    def scatter(frame):
+        return frame[known].set_axis(position[known]).reindex(dense)
+    aligned_customers = scatter(event_index["customers"])
+    for col in ["activation_ms", "timed_activations"]:
+        aligned_customers[col] = aligned_customers[col].fillna(0).astype("int64")
+    return {
+        **event_index,
+        "customers": aligned_customers,
+        "event_counts": scatter(event_index["event_counts"]).fillna(0).astype("int64"),
+    }
+
+
+def activated_ids(event_index: Dict[str, Any]) -> pd.Index:
+    """Customers with at least one activate event."""
+    customers = event_index["customers"]
+    return customers.index[customers["first_activation"].notna()]
+
+
+def activation_counts(event_index: Dict[str, Any]) -> pd.Series:
+    """Number of activate events per customer (0 when never activated)."""
+    counts = event_index["event_counts"]
+    if ACTIVATE_EVENT in counts.columns:
+        return counts[ACTIVATE_EVENT]
+    return pd.Series(0, index=counts.index, dtype="int64")
@@ -0,0 +1,226 @@
+import hashlib
+import io
+import json
+import os
+import shutil
+import pandas as pd
+from pathlib import Path
+from typing import Dict, Any, Optional, Tuple
+from src.utils.config import EVENTS_FILE, REVENUE_FILE, STATE_DIR, EVENTS_CHUNK_SIZE
+from src.etl.event_index import build_event_index, merge_event_indexes, align_event_index
+from src.etl.customers import attach_customer_keys
+from src.etl.loader import read_support_tickets, read_table
+from src.etl.schema import apply_schema, csv_options
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+POINTER_FILE = "CURRENT"
+TAIL_BYTES = 4096 # bytes before the watermark hashed to detect rewritten (not appended) files
+
+
+class _BoundedReader(io.RawIOBase):
+    """Exposes bytes [start, end) of a binary file so pandas never sees a half-written last row."""
+
+    def __init__(self, f, start: int, end: int):
+        self._f = f
+        self._f.seek(start)
+        self._remaining = end - start
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        n = min(len(buffer), self._remaining)
+        if n <= 0:
+            return 0
+        data = self._f.read(n)
+        buffer[:len(data)] = data
+        self._remaining -= len(data)
+        return len(data)
+
+
+def _tail_digest(f, offset: int) -> str:
+    f.seek(max(0, offset - TAIL_BYTES))
+    return hashlib.sha256(f.read(min(offset, TAIL_BYTES))).hexdigest()
+
+
+def _last_complete_row(f, size: int) -> int:
+    """Offset just past the last newline in the file."""
+    pos = size
+    while pos > 0:
+        start = max(0, pos - 65536)
+        f.seek(start)
+        block = f.read(pos - start)
+        nl = block.rfind(b"\n")
+        if nl >= 0:
+            return start + nl + 1
+        pos = start
+    return 0
+
+
+def appended_range(path: Path, watermark: Optional[Dict[str, Any]]) -> Optional[Tuple[int, int, Dict[str, Any]]]:
+    """
+    Byte range [start, end) of complete rows appended to `path` since `watermark`
+    (a byte offset plus a digest of the bytes just before it), and the new watermark.
+    Returns None when the file was rewritten rather than appended to.
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        size = os.fstat(f.fileno()).st_size
+        start = len(header)
+        if watermark is not None:
+            if watermark["offset"] > size or _tail_digest(f, watermark["offset"]) != watermark["tail_sha256"]:
+                return None
+            start = watermark["offset"]
+        end = max(_last_complete_row(f, size), start)
+        return start, end, {"offset": end, "tail_sha256": _tail_digest(f, end)}
+
+
+def read_range(path: Path, start: int, end: int, name: str, chunksize: int):
+    """Yields the rows in byte range [start, end) of dataset `name`'s CSV file in chunks, schema applied."""
+    if end <= start:
+        return
+    with open(path, "rb") as f:
+        columns = pd.read_csv(io.BytesIO(f.readline()), nrows=0).columns
+        body = io.BufferedReader(_BoundedReader(f, start, end))
+        with pd.read_csv(body, header=None, names=columns, chunksize=chunksize, **csv_options(name)) as reader:
+            for chunk in reader:
+                yield apply_schema(name, chunk)
+
+
+def empty_state() -> Dict[str, Any]:
+    return {"event_index": None, "revenue": None, "watermarks": {}}
+
+
+def load_state(state_dir: Path = STATE_DIR) -> Dict[str, Any]:
+    """Loads the last committed per-customer state, or an empty state on the first run."""
+    pointer = Path(state_dir) / POINTER_FILE
+    if not pointer.exists():
+        return empty_state()
+    current = Path(state_dir) / pointer.read_text().strip()
+    with open(current / "meta.json") as f:
+        meta = json.load(f)
+    daily = pd.read_parquet(current / "daily_counts.parquet")
+    event_index = {
+        "customers": pd.read_parquet(current / "customers.parquet"),
+        "event_counts": pd.read_parquet(current / "event_counts.parquet"),
+        "daily_counts": daily.set_index(["date", "event_name"])["count"],
+        "event_name": None,
+        "n_events": meta["n_events"],
+    }
+    event_index["event_counts"].columns.name = "event_name"
+    revenue = pd.read_parquet(current / "revenue.parquet")
+    return {"event_index": event_index, "revenue": revenue, "watermarks": meta["watermarks"]}
+
+
+def save_state(state: Dict[str, Any], state_dir: Path = STATE_DIR):
+    """
+    Writes the state to a fresh directory, then atomically repoints CURRENT at it,
+    so an interrupted save never leaves a watermark ahead of its aggregates.
+    """
+    state_dir = Path(state_dir)
+    state_dir.mkdir(parents=True, exist_ok=True)
+    pointer = state_dir / POINTER_FILE
+    previous = pointer.read_text().strip() if pointer.exists() else None
+    name = f"state-{pd.Timestamp.now():%Y%m%dT%H%M%S%f}"
+    target = state_dir / name
+    target.mkdir()
+
+    index = state["event_index"]
+    index["customers"].to_parquet(target / "customers.parquet")
+    index["event_counts"].to_parquet(target / "event_counts.parquet")
+    index["daily_counts"].rename("count").reset_index().to_parquet(target / "daily_counts.parquet", index=False)
+    state["revenue"].to_parquet(target / "revenue.parquet", index=False)
+    with open(target / "meta.json", "w") as f:
+        json.dump({"n_events": index["n_events"], "watermarks": state["watermarks"]}, f, indent=2)
+
+    tmp = state_dir / (POINTER_FILE + ".tmp")
+    tmp.write_text(name)
+    os.replace(tmp, pointer)
+    if previous and previous != name:
+        shutil.rmtree(state_dir / previous, ignore_errors=True)
+    logger.info(f"Saved incremental state {name}")
+
+
+def _fold_events(state: Dict[str, Any], chunksize: int) -> Optional[int]:
+    """Folds appended events into state["event_index"]; returns the row count, or None if rewritten."""
+    appended = appended_range(EVENTS_FILE, state["watermarks"].get("events"))
+    if appended is None:
+        return None
+    start, end, watermark = appended
+    index = state["event_index"]
+    n_new = 0
+    for chunk in read_range(EVENTS_FILE, start, end, "events", chunksize):
+        chunk_index = build_event_index(chunk)
+        index = chunk_index if index is None else merge_event_indexes(index, chunk_index)
+        n_new += len(chunk)
+    if index is None:
+        index = build_event_index(apply_schema("events", pd.read_csv(EVENTS_FILE, nrows=0, **csv_options("events"))))
+    index["event_name"] = None
+    state["event_index"] = index
+    state["watermarks"]["events"] = watermark
+    return n_new
+
+
+def _fold_revenue(state: Dict[str, Any], chunksize: int) -> Optional[int]:
+    """Adds appended revenue into per-customer lifetime totals; returns the row count, or None if rewritten."""
+    appended = appended_range(REVENUE_FILE, state["watermarks"].get("revenue"))
+    if appended is None:
+        return None
+    start, end, watermark = appended
+    parts = [] if state["revenue"] is None else [state["revenue"]]
+    n_new = 0
+    for chunk in read_range(REVENUE_FILE, start, end, "revenue", chunksize):
+        parts.append(chunk[["customer_id", "amount"]])
+        n_new += len(chunk)
+    if parts:
+        revenue = pd.concat(parts).groupby("customer_id", sort=False, observed=True, as_index=False)["amount"].sum()
+    else:
+        revenue = pd.DataFrame({"customer_id": pd.Series(dtype=object), "amount": pd.Series(dtype="int64")})
+    state["revenue"] = revenue
+    state["watermarks"]["revenue"] = watermark
+    return n_new
+
+
+def update_state(state: Dict[str, Any], chunksize: int = EVENTS_CHUNK_SIZE) -> Dict[str, Any]:
+    """
+    Merges event and revenue rows appended since the stored watermarks into the state.
+    Falls back to a rebuild from scratch if either source was rewritten rather than appended.
+    """
+    n_events = _fold_events(state, chunksize)
+    n_revenue = _fold_revenue(state, chunksize) if n_events is not None else None
+    if n_events is None or n_revenue is None:
+        logger.warning("A source file was rewritten since the last run; rebuilding incremental state.")
+        return update_state(empty_state(), chunksize)
+    logger.info(f"Incremental update: {n_events} new events, {n_revenue} new revenue rows.")
+    return state
+
+
+def load_incremental(state_dir: Path = STATE_DIR, chunksize: int = EVENTS_CHUNK_SIZE,
+                     use_cache: bool = False, rebuild_cache: bool = False) -> Dict[str, Any]:
+    """
+    load_data() counterpart for incremental runs. Users, subscriptions and support
+    tickets are small, mutable tables and are re-read in full; events and revenue come from the
+    updated per-customer state ("revenue" holds lifetime revenue per customer).
+    The returned "state" should be passed to save_state() once outputs are written.
+    State stays keyed by customer_id (the users table may change between runs); the
+    returned tables and event index are re-keyed to this run's customer dimension.
+    """
+    state = update_state(load_state(state_dir), chunksize)
+    users = read_table("users", use_cache, rebuild_cache)
+    data = attach_customer_keys({
+        "users": users,
+        "subscriptions": read_table("subscriptions", use_cache, rebuild_cache),
+        "revenue": state["revenue"],
+        "support_tickets": read_support_tickets(users, use_cache, rebuild_cache),
+    })
+    return {
+        "users": data["users"],
+        "events": None,
+        "subscriptions": data["subscriptions"],
+        "revenue": data["revenue"],
+        "support_tickets": data["support_tickets"],
+        "event_index": align_event_index(state["event_index"], data["users"]),
+        "state": state,
+    }
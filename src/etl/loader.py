@@ -1,27 +1,142 @@
+import numpy as np
 import pandas as pd
-from typing import Dict
-from src.utils.config import USERS_FILE, EVENTS_FILE, SUBSCRIPTIONS_FILE, REVENUE_FILE
+from typing import Dict, Any, Optional
+from src.utils.config import (
+    USERS_FILE, EVENTS_FILE, SUBSCRIPTIONS_FILE, REVENUE_FILE, SUPPORT_TICKETS_FILE, CUSTOMER_ID_MAP_FILE,
+    EVENTS_CHUNK_SIZE
+)
+from src.etl.event_index import build_event_index, merge_event_indexes
+from src.etl.customers import (
+    attach_customer_keys, build_customer_dimension, encode_customer_ids, resolve_customer_ids, KEY_COLUMN
+)
+from src.etl.cache import load_cached
+from src.etl.schema import SchemaError, apply_schema, csv_options
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def load_data() -> Dict[str, pd.DataFrame]:
-    """Loads all datasets with proper types."""
+def stream_event_index(path=EVENTS_FILE, chunksize: int = EVENTS_CHUNK_SIZE,
+                       users: Optional[pd.DataFrame] = None) -> Dict[str, Any]:
+    """
+    Reads the events file in bounded-size chunks and folds each chunk into the
+    per-customer event index, so memory grows with customers, not events.
+    With `users`, chunks are keyed to its customer dimension (src.etl.customers) and
+    folded elementwise into one dense index.
+    """
+    index: Optional[Dict[str, Any]] = None
+    dimension = build_customer_dimension(users) if users is not None else None
+    n_customers = len(dimension) if dimension is not None else None
+    n_chunks = 0
+    with pd.read_csv(path, chunksize=chunksize, **csv_options("events")) as reader:
+        for chunk in reader:
+            chunk = apply_schema("events", chunk)
+            if dimension is not None:
+                chunk[KEY_COLUMN] = encode_customer_ids(dimension, chunk["customer_id"])
+            chunk_index = build_event_index(chunk, n_customers)
+            index = chunk_index if index is None else merge_event_indexes(index, chunk_index)
+            n_chunks += 1
+    if index is None:
+        empty = apply_schema("events", pd.read_csv(path, **csv_options("events")))
+        index = build_event_index(empty.assign(**{KEY_COLUMN: np.zeros(0, dtype=np.int32)}), n_customers)
+    index["event_name"] = None
+    logger.info(f"Streamed {index['n_events']} events in {n_chunks} chunks of <= {chunksize} rows.")
+    return index
+
+# Source file per dataset (column dtypes are declared in src.etl.schema)
+SOURCES = {
+    "users": USERS_FILE,
+    "events": EVENTS_FILE,
+    "subscriptions": SUBSCRIPTIONS_FILE,
+    "revenue": REVENUE_FILE,
+    "support_tickets": SUPPORT_TICKETS_FILE,
+}
+
+def read_table(name: str, use_cache: bool = False, rebuild_cache: bool = False) -> pd.DataFrame:
+    """
+    Parses one dataset from CSV into its declared compact schema (src.etl.schema), or
+    loads it from the typed Parquet cache (src.etl.cache). Raises SchemaError on bad input.
+    """
+    path = SOURCES[name]
+    parse = lambda: pd.read_csv(path, **csv_options(name))
+    if use_cache:
+        return load_cached(name, path, parse, rebuild=rebuild_cache)
+    return apply_schema(name, parse())
+
+def read_optional_table(name: str, use_cache: bool = False, rebuild_cache: bool = False) -> Optional[pd.DataFrame]:
+    """read_table() for inputs the pipeline can run without (support tickets); None when the file is absent."""
+    if not SOURCES[name].exists():
+        logger.info(f"No {SOURCES[name].name}; continuing without {name}.")
+        return None
+    return read_table(name, use_cache, rebuild_cache)
+
+def read_customer_id_map(path=CUSTOMER_ID_MAP_FILE) -> Optional[pd.Series]:
+    """
+    customer_id per source-system id from the optional `source_id,customer_id` alias
+    file (None when absent). A source id may appear only once.
+    """
+    if not path.exists():
+        return None
+    aliases = pd.read_csv(path, dtype="string", usecols=["source_id", "customer_id"])
+    duplicated = aliases["source_id"].duplicated()
+    if duplicated.any():
+        raise SchemaError(f"{path.name}: {int(duplicated.sum())} duplicate source_id values")
+    return aliases.set_index("source_id")["customer_id"]
+
+def read_support_tickets(users: pd.DataFrame, use_cache: bool = False,
+                         rebuild_cache: bool = False) -> Optional[pd.DataFrame]:
+    """
+    Support tickets, with helpdesk customer ids resolved to users.customer_id through
+    read_customer_id_map() before they are keyed. None without the file, and None when
+    no ticket resolves to one of `users` (e.g. helpdesk ids without the alias file), so
+    no ticket-derived columns or features are built from tickets that match nobody.
+    """
+    tickets = read_optional_table("support_tickets", use_cache, rebuild_cache)
+    if tickets is None:
+        return None
+    id_map = read_customer_id_map()
+    if id_map is not None:
+        tickets["customer_id"] = resolve_customer_ids(tickets["customer_id"], id_map)
+    if len(tickets) and not tickets["customer_id"].isin(users["customer_id"]).any():
+        logger.warning(f"None of the {len(tickets)} support tickets matches a customer (helpdesk ids need "
+                       f"{CUSTOMER_ID_MAP_FILE.name}); continuing without support tickets.")
+        return None
+    return tickets
+
+def load_data(stream_events: bool = False, chunksize: int = EVENTS_CHUNK_SIZE,
+              use_cache: bool = False, rebuild_cache: bool = False) -> Dict[str, Any]:
+    """
+    Loads all datasets with proper types.
+
+    With stream_events=True the raw events are never held in memory: "events" is
+    None and "event_index" holds the per-customer aggregates folded chunk by chunk.
+    With use_cache=True each CSV is served from a typed Parquet copy that is
+    rebuilt whenever the source file changes (or when rebuild_cache=True).
+    "support_tickets" is None when the tickets file does not exist or none of its
+    tickets resolves to a customer through the optional alias map (read_support_tickets).
+    Every table gets a customer_key column from the customer dimension (the users
+    rows, src.etl.customers), and the event index is dense over those keys.
+    """
     logger.info("Loading datasets...")
     
     try:
-        users = pd.read_csv(USERS_FILE, parse_dates=["signup_date"])
-        events = pd.read_csv(EVENTS_FILE, parse_dates=["event_timestamp"])
-        subs = pd.read_csv(SUBSCRIPTIONS_FILE, parse_dates=["start_date", "end_date"])
-        revenue = pd.read_csv(REVENUE_FILE, parse_dates=["revenue_date"])
+        users = read_table("users", use_cache, rebuild_cache)
+        subs = read_table("subscriptions", use_cache, rebuild_cache)
+        revenue = read_table("revenue", use_cache, rebuild_cache)
+        tickets = read_support_tickets(users, use_cache, rebuild_cache)
+        if stream_events:
+            events = None
+            event_index = stream_event_index(EVENTS_FILE, chunksize, users)
+            n_events = event_index["n_events"]
+        else:
+            events = read_table("events", use_cache, rebuild_cache)
+            event_index = None
+            n_events = len(events)
         
-        logger.info(f"Loaded {len(users)} users, {len(events)} events, {len(subs)} subs.")
-        return {
-            "users": users,
-            "events": events,
-            "subscriptions": subs,
-            "revenue": revenue
-        }
+        logger.info(f"Loaded {len(users)} users, {n_events} events, {len(subs)} subs.")
+        data = attach_customer_keys({"users": users, "events": events, "subscriptions": subs, "revenue": revenue,
+                                     "support_tickets": tickets})
+        data["event_index"] = event_index
+        return data
     except FileNotFoundError as e:
         logger.error(f"Data file not found: {e}")
         raise
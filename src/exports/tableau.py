@@ -0,0 +1,249 @@
+"""
+Tableau extracts under outputs/tableau_ready/, built from the frames the pipeline has
+already loaded:
+- customer_master_extract.csv: users left-joined to their subscriptions, one chunk of
+  users at a time (the wide join is never materialized whole)
+- daily_events_extract.csv: events per (date, event_name), from the event index's daily counts
+- revenue_transaction_extract.csv: one row per invoice, copied from revenue.csv as is
+- kpi_summary_for_tableau.csv: one KPI snapshot row per run (run_date first)
+- cohort_retention_for_tableau.csv: the cohort retention matrix
+
+The daily events and revenue extracts are appended to rather than rewritten, in full
+and --incremental runs alike: a manifest records where the last day starts (and a
+digest of the days before it) and how far into revenue.csv the extract reaches. Only
+the last day and newer days, or the invoices appended to revenue.csv, are written;
+anything else (a late event, a rewritten revenue.csv) triggers a rebuild. The KPI
+snapshot file keeps every earlier row when the KPI columns change.
+"""
+import hashlib
+import io
+import json
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional
+import numpy as np
+import pandas as pd
+from src.etl.customers import KEY_COLUMN
+from src.etl.incremental import appended_range
+from src.utils.config import EXTRACT_CHUNK_ROWS, REVENUE_FILE, TABLEAU_DIR
+from src.utils.writers import atomic_path, write_table, write_text
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+CUSTOMER_MASTER = "customer_master_extract.csv"
+DAILY_EVENTS = "daily_events_extract.csv"
+REVENUE_TRANSACTIONS = "revenue_transaction_extract.csv"
+KPI_SNAPSHOTS = "kpi_summary_for_tableau.csv"
+COHORT_RETENTION = "cohort_retention_for_tableau.csv"
+MANIFEST = ".manifest.json"
+# Suffix of subscription columns whose name is also a users column (status -> status_sub)
+SUBSCRIPTION_SUFFIX = "_sub"
+COPY_BLOCK_BYTES = 1 << 20
+
+
+def customer_master_chunks(users: pd.DataFrame, subs: pd.DataFrame,
+                           chunk_rows: int = EXTRACT_CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    users.merge(subs, how="left", on="customer_id", suffixes=("", "_sub")) in users order,
+    yielded per `chunk_rows` users. Subscriptions are ordered by customer_key once; each
+    chunk then takes its users' subscriptions as one contiguous slice of that order.
+    Integer subscription columns are float, as in the merge (customers without one get NaN).
+    """
+    n_users = len(users)
+    left = users.drop(columns=[KEY_COLUMN], errors="ignore")
+    right = subs.drop(columns=["customer_id", KEY_COLUMN], errors="ignore")
+    right = right.rename(columns={c: c + SUBSCRIPTION_SUFFIX for c in right.columns if c in left.columns})
+    right = right.astype({c: np.float64 for c in right.columns
+                          if pd.api.types.is_integer_dtype(right[c]) or pd.api.types.is_bool_dtype(right[c])})
+
+    keys = subs[KEY_COLUMN].to_numpy()
+    matched = np.flatnonzero(keys >= 0)
+    order = matched[np.argsort(keys[matched], kind="stable")]
+    bounds = np.searchsorted(keys[order], np.arange(n_users + 1))
+    counts = np.diff(bounds)
+    rows = np.maximum(counts, 1)
+    # take() fills the -1 positions with each dtype's missing value (NaN, NaT, <NA>)
+    columns = {c: right[c].array if isinstance(right[c].dtype, pd.api.extensions.ExtensionDtype)
+               else right[c].to_numpy() for c in right.columns}
+
+    for start in range(0, n_users, chunk_rows):
+        end = min(start + chunk_rows, n_users)
+        user_pos = np.repeat(np.arange(start, end), rows[start:end])
+        sub_pos = np.full(len(user_pos), -1, dtype=np.intp)
+        sub_pos[np.repeat(counts[start:end] > 0, rows[start:end])] = order[bounds[start]:bounds[end]]
+        chunk = left.iloc[user_pos].reset_index(drop=True)
+        for column, values in columns.items():
+            chunk[column] = pd.api.extensions.take(values, sub_pos, allow_fill=True)
+        yield chunk
+
+
+def write_customer_master(users: pd.DataFrame, subs: pd.DataFrame, path: Path,
+                          chunk_rows: int = EXTRACT_CHUNK_ROWS) -> int:
+    """Writes the customer master extract chunk by chunk; returns its row count."""
+    n_rows = 0
+
+    def write(f):
+        nonlocal n_rows
+        for i, chunk in enumerate(customer_master_chunks(users, subs, chunk_rows)):
+            chunk.to_csv(f, header=i == 0, index=False)
+            n_rows += len(chunk)
+
+    write_text(path, write)
+    return n_rows
+
+
+def daily_events_frame(daily_counts: pd.Series) -> pd.DataFrame:
+    """The daily events extract rows (date, event_name, count), ordered by date then event name."""
+    counts = daily_counts.sort_index()
+    return pd.DataFrame({
+        "date": counts.index.get_level_values("date").strftime("%Y-%m-%d"),
+        "event_name": counts.index.get_level_values("event_name").astype(str),
+        "count": counts.to_numpy(dtype=np.int64),
+    })
+
+
+def _digest(frame: pd.DataFrame) -> str:
+    return hashlib.sha256(pd.util.hash_pandas_object(frame, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def _unchanged(path: Path, entry: Optional[Dict[str, Any]]) -> bool:
+    """Whether `path` is still the file described by its manifest entry."""
+    return entry is not None and path.exists() and path.stat().st_size == entry["size"]
+
+
+def _append_at(path: Path, offset: int, text: str):
+    """Truncates `path` to `offset` bytes and writes `text` there."""
+    with open(path, "r+b") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        f.write(text.encode())
+
+
+def write_daily_events(daily_counts: pd.Series, path: Path, entry: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Brings the daily events extract up to date with `daily_counts` and returns its new
+    manifest entry. When the days before the last written day are unchanged (same
+    digest), the file is cut back to where that day starts and only that day and later
+    ones are written; otherwise it is rewritten whole.
+    """
+    frame = daily_events_frame(daily_counts)
+    offset, start = None, 0
+    if _unchanged(path, entry) and entry["last_day"] is not None:
+        earlier = (frame["date"] < entry["last_day"]).to_numpy()
+        if _digest(frame[earlier]) == entry["digest"]:
+            offset, start = entry["last_day_offset"], int(earlier.sum())
+
+    last_day = frame["date"].iloc[-1] if len(frame) else None
+    cut = int((frame["date"] < last_day).sum()) if last_day is not None else 0
+    head = frame.iloc[start:max(cut, start)].to_csv(index=False, header=offset is None)
+    tail = frame.iloc[max(cut, start):].to_csv(index=False, header=False)
+    if offset is None:
+        write_text(path, lambda f: f.write(head + tail))
+        logger.info(f"Rewrote {len(frame)} rows to {path.name}")
+        offset = 0
+    else:
+        _append_at(path, offset, head + tail)
+        logger.info(f"Appended {len(frame) - start} rows from {entry['last_day']} to {path.name}")
+    return {"size": path.stat().st_size, "last_day": last_day, "last_day_offset": offset + len(head.encode()),
+            "digest": _digest(frame.iloc[:cut])}
+
+
+def _copy_range(source: Path, start: int, end: int, f) -> int:
+    """Copies bytes [start, end) of `source` to the binary file `f`; returns the rows copied."""
+    n_rows = 0
+    with open(source, "rb") as src:
+        src.seek(start)
+        while start < end:
+            block = src.read(min(COPY_BLOCK_BYTES, end - start))
+            if not block:
+                break
+            f.write(block)
+            n_rows += block.count(b"\n")
+            start += len(block)
+    return n_rows
+
+
+def write_revenue_transactions(path: Path, entry: Optional[Dict[str, Any]],
+                               watermark: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Brings the revenue transaction extract up to revenue.csv's `watermark` and returns
+    its manifest entry. The rows between the extract's own watermark and that one are
+    copied byte for byte, so amounts and dates keep revenue.csv's formatting. When the
+    extract is missing or revenue.csv was rewritten, everything up to `watermark` is
+    copied to a fresh file.
+    """
+    appended = None
+    if _unchanged(path, entry) and entry["watermark"] is not None:
+        appended = appended_range(REVENUE_FILE, entry["watermark"])
+    if appended is None:
+        start = appended_range(REVENUE_FILE, None)[0]
+        with atomic_path(path) as tmp, open(tmp, "wb") as f:
+            _copy_range(REVENUE_FILE, 0, start, f)  # header
+            n_rows = _copy_range(REVENUE_FILE, start, watermark["offset"], f)
+        logger.info(f"Rewrote {n_rows} rows to {path.name}")
+    else:
+        with open(path, "ab") as f:
+            n_rows = _copy_range(REVENUE_FILE, appended[0], watermark["offset"], f)
+        logger.info(f"Appended {n_rows} rows to {path.name}")
+        n_rows += entry["rows"]
+    return {"size": path.stat().st_size, "rows": n_rows, "watermark": watermark}
+
+
+def append_kpi_snapshot(kpis: Dict[str, Any], path: Path, run_date: Optional[str] = None):
+    """
+    Appends this run's KPIs as one row. When the KPI columns changed, the file is
+    rewritten with the union of the old and new columns: earlier rows keep their
+    values (empty in new columns) and this row is empty in dropped ones.
+    """
+    text = pd.DataFrame([{"run_date": run_date or pd.Timestamp.now().isoformat(), **kpis}]).to_csv(index=False)
+    header, row = text.split("\n", 1)
+    if not path.exists():
+        write_text(path, lambda f: f.write(text))
+        return
+    with open(path, newline="") as f:
+        current = f.readline().rstrip("\r\n")
+    if current == header:
+        with open(path, "a", newline="") as f:
+            f.write(row)
+        return
+    # Read back as text so earlier rows are rewritten exactly as they were
+    as_text = {"dtype": str, "keep_default_na": False}
+    history = pd.concat([pd.read_csv(path, **as_text), pd.read_csv(io.StringIO(text), **as_text)], ignore_index=True)
+    write_text(path, lambda f: history.fillna("").to_csv(f, index=False))
+    logger.info(f"KPI columns changed; rewrote {path.name} with {len(history.columns) - 1} KPI columns")
+
+
+def _load_manifest(directory: Path) -> Dict[str, Any]:
+    path = directory / MANIFEST
+    return json.loads(path.read_text()) if path.exists() else {}
+
+
+def build_extracts(data: Dict[str, Any], daily_counts: pd.Series, kpis: Optional[Dict[str, Any]] = None,
+                   cohorts: Optional[pd.DataFrame] = None, directory: Path = TABLEAU_DIR,
+                   chunk_rows: int = EXTRACT_CHUNK_ROWS) -> Dict[str, Any]:
+    """
+    Writes every Tableau extract from the loaded `data` (load_data / load_incremental),
+    the event index's daily counts and the KPI / cohort stage results (skipped when None),
+    then saves the manifest the next run appends from. Returns the manifest.
+    """
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    manifest = _load_manifest(directory)
+
+    n_rows = write_customer_master(data["users"], data["subscriptions"], directory / CUSTOMER_MASTER, chunk_rows)
+    logger.info(f"Wrote {n_rows} rows to {CUSTOMER_MASTER}")
+    manifest["daily_events"] = write_daily_events(daily_counts, directory / DAILY_EVENTS,
+                                                  manifest.get("daily_events"))
+    # Invoices are copied from revenue.csv past the extract's watermark in every mode, up
+    # to what this run loaded (in --incremental runs, the state's watermark)
+    state = data.get("state")
+    watermark = appended_range(REVENUE_FILE, None)[2] if state is None else state["watermarks"]["revenue"]
+    manifest["revenue_transactions"] = write_revenue_transactions(
+        directory / REVENUE_TRANSACTIONS, manifest.get("revenue_transactions"), watermark)
+    if kpis is not None:
+        append_kpi_snapshot(kpis, directory / KPI_SNAPSHOTS)
+    if cohorts is not None:
+        write_table(cohorts, directory / COHORT_RETENTION)
+
+    write_text(directory / MANIFEST, lambda f: json.dump(manifest, f, indent=2))
+    return manifest
@@ -1,23 +1,28 @@
 import pandas as pd
-from typing import Dict, Any
+import numpy as np
+from typing import Dict, Any, Optional
+from src.etl.event_index import build_event_index, align_event_index
+from src.etl.customers import fact_keys, per_customer_sum
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def compute_funnel_metrics(users: pd.DataFrame, events: pd.DataFrame, subs: pd.DataFrame) -> Dict[str, Any]:
-    """Computes Acquisition -> Activation -> Paid funnel."""
-    logger.info("Computing funnel metrics...")
-    
+def funnel_counts(users: pd.DataFrame, subs: pd.DataFrame, event_index: Dict[str, Any]) -> Dict[str, int]:
+    """
+    Customer counts per funnel step. Counts over disjoint sets of customers
+    (e.g. customer_id shards) can be summed and finalized with funnel_from_counts().
+    """
+    # Per-customer flags over customer_key (src.etl.customers); customers outside
+    # users never count
     # Acquisition
-    signups = set(users["customer_id"])
+    signups = len(users)
     
     # Activation (within 14 days)
     # Ensure simplified logic for robustness
-    act_events = events[events["event_name"].str.lower() == "activate"]
-    activated_users = set(act_events["customer_id"])
+    activated_users = align_event_index(event_index, users)["customers"]["first_activation"].notna().to_numpy()
     
     # Paid
-    paid_users = set(subs["customer_id"])
+    paid_users = per_customer_sum(fact_keys(users, subs), len(users)) > 0
     
     # Intersection for funnel integrity (A user can't be paid without being signed up, strictly speaking)
     # Ideally: Signup -> (maybe Activate) -> Paid.
@@ -28,10 +33,15 @@ def compute_funnel_metrics(users: pd.DataFrame, events: pd.DataFrame, subs: pd.D
     # For this funnel we typically track PURE conversion.)
     
     # Let's check overlap for stages
-    step1 = len(signups)
-    step2 = len(signups.intersection(activated_users))
-    step3 = len(signups.intersection(activated_users).intersection(paid_users)) # strict funnel
-    
+    return {
+        "acquisition": signups,
+        "activation": int(np.count_nonzero(activated_users)),
+        "retention": int(np.count_nonzero(activated_users & paid_users)), # strict funnel
+    }
+
+def funnel_from_counts(counts: Dict[str, int]) -> Dict[str, Any]:
+    """Conversion and drop-off rates from (merged) step counts."""
+    step1, step2, step3 = counts["acquisition"], counts["activation"], counts["retention"]
     logger.info(f"Funnel counts: {step1} -> {step2} -> {step3}")
     
     return {
@@ -50,3 +60,14 @@ def compute_funnel_metrics(users: pd.DataFrame, events: pd.DataFrame, subs: pd.D
             "paid_drop_off": 1 - (step3 / step2) if step2 > 0 else 0
         }
     }
+
+def compute_funnel_metrics(users: pd.DataFrame, events: pd.DataFrame, subs: pd.DataFrame,
+                           event_index: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Computes Acquisition -> Activation -> Paid funnel.
+    Pass a prebuilt event_index (src.etl.event_index) to avoid rescanning events.
+    """
+    logger.info("Computing funnel metrics...")
+    if event_index is None:
+        event_index = build_event_index(events)
+    return funnel_from_counts(funnel_counts(users, subs, event_index))
@@ -0,0 +1,118 @@
+import numpy as np
+import pandas as pd
+from typing import List, Optional, Tuple
+from src.etl.customers import fact_keys
+from src.etl.event_index import encode_event_names
+from src.utils.config import ACTIVATION_WINDOW_DAYS
+from src.utils.timeline import DAY_NS
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# (step name, event name, conversion window in days from the previous step or None)
+Step = Tuple[str, str, Optional[float]]
+DEFAULT_STEPS: List[Step] = [
+    ("acquisition", "signup", None),
+    ("activation", "activate", ACTIVATION_WINDOW_DAYS),
+    ("retention", "upgrade", None),  # paid: the generator emits upgrade at subscription start
+]
+BREAKDOWNS = ["acquisition_channel", "country", "pricing_plan"]
+
+
+def parse_steps(spec: str) -> List[Step]:
+    """Steps from "event[:window_days],..." (e.g. "signup,activate:14,login:30,upgrade"), named by event."""
+    steps = []
+    for item in spec.split(","):
+        event, _, window = item.strip().partition(":")
+        steps.append((event, event, float(window) if window else None))
+    if not steps or not all(event for _, event, _ in steps):
+        raise ValueError(f"Invalid funnel steps {spec!r}")
+    return steps
+
+
+def reached_steps(users: pd.DataFrame, events: pd.DataFrame, steps: List[Step] = DEFAULT_STEPS) -> List[np.ndarray]:
+    """
+    Per step, which customers (rows of `users`) completed the funnel up to it: step k
+    counts the customer's earliest step-k event at or after the step k-1 event that
+    was used (strictly after when both steps are the same event), within the step's
+    window. Events are coded as customer_key * R + timestamp rank, so each step is
+    one sort plus one searchsorted over all customers still in the funnel.
+    """
+    n_customers = len(users)
+    names = encode_event_names(events["event_name"])
+    step_codes = names.categories.get_indexer([event.lower() for _, event, _ in steps])
+    keys = fact_keys(users, events)
+    ts = events["event_timestamp"].to_numpy()
+    name_codes = np.asarray(names.codes)
+    used = (keys >= 0) & ~np.isnat(ts) & np.isin(name_codes, step_codes[step_codes >= 0])
+
+    # Dense timestamp ranks keep the composite key exact and inside int64
+    times, rank = np.unique(ts[used].view(np.int64), return_inverse=True)
+    span = len(times) + 1
+    customer, name_codes = keys[used].astype(np.int64), name_codes[used]
+
+    reached = []
+    candidates = np.arange(n_customers, dtype=np.int64)
+    start_rank = np.zeros(n_customers, dtype=np.int64)
+    previous_rank = None
+    for k, (_, _, window) in enumerate(steps):
+        mask = np.zeros(n_customers, dtype=bool)
+        of_step = name_codes == step_codes[k]
+        composite = np.sort(customer[of_step] * span + rank[of_step])
+        if step_codes[k] >= 0 and len(composite) and len(candidates):
+            position = np.searchsorted(composite, candidates * span + start_rank)
+            hit = composite[np.minimum(position, len(composite) - 1)]
+            found = (position < len(composite)) & (hit // span == candidates)
+            step_rank = hit % span
+            if window is not None and previous_rank is not None:
+                found &= times[step_rank] - times[previous_rank] <= window * DAY_NS
+            candidates, previous_rank = candidates[found], step_rank[found]
+            mask[candidates] = True
+        else:
+            candidates, previous_rank = candidates[:0], start_rank[:0]
+        reached.append(mask)
+        same_event = k + 1 < len(steps) and step_codes[k + 1] == step_codes[k]
+        start_rank = previous_rank + 1 if same_event else previous_rank
+    return reached
+
+
+def ordered_funnel(users: pd.DataFrame, events: pd.DataFrame, steps: List[Step] = DEFAULT_STEPS,
+                   breakdowns: List[str] = BREAKDOWNS) -> pd.DataFrame:
+    """
+    Ordered, windowed funnel: customers reaching each step overall and per value of each
+    `breakdowns` column of users (all from one evaluation of the steps), with conversion
+    from the previous and from the first step.
+    Columns: breakdown, value, step_number, step, event, window_days, customers,
+    conversion_rate, overall_conversion.
+    """
+    logger.info(f"Computing ordered funnel: {' -> '.join(event for _, event, _ in steps)}")
+    reached = np.array(reached_steps(users, events, steps))
+    groups = [("all", np.zeros(len(users), dtype=np.int64), pd.Index(["all"]))]
+    for column in [c for c in breakdowns if c in users.columns]:
+        codes, labels = pd.factorize(users[column], sort=True)
+        groups.append((column, codes, pd.Index(labels).astype(str)))
+
+    tables = []
+    for breakdown, codes, labels in groups:
+        known = codes >= 0
+        counts = np.array([np.bincount(codes[known & step], minlength=len(labels)) for step in reached])
+        previous = np.vstack([counts[:1], counts[:-1]])
+        with np.errstate(divide="ignore", invalid="ignore"):
+            rate = np.where(previous > 0, counts / previous, 0.0)
+            overall = np.where(counts[:1] > 0, counts / counts[:1], 0.0)
+        n_steps, n_labels = counts.shape
+        tables.append(pd.DataFrame({
+            "breakdown": breakdown,
+            "value": np.tile(labels.to_numpy(dtype=object), n_steps),
+            "step_number": np.repeat(np.arange(1, n_steps + 1), n_labels),
+            "step": np.repeat([name for name, _, _ in steps], n_labels),
+            "event": np.repeat([event for _, event, _ in steps], n_labels),
+            "window_days": np.repeat([np.nan if w is None else w for _, _, w in steps], n_labels),
+            "customers": counts.ravel(),
+            "conversion_rate": rate.ravel(),
+            "overall_conversion": overall.ravel(),
+        }))
+    funnel = pd.concat(tables, ignore_index=True)
+    overall_counts = funnel.loc[funnel["breakdown"] == "all", "customers"].tolist()
+    logger.info(f"Ordered funnel counts: {' -> '.join(map(str, overall_counts))}")
+    return funnel
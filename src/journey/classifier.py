@@ -1,56 +1,166 @@
 import pandas as pd
 import numpy as np
-from typing import Dict
+from typing import Dict, Any, NamedTuple, Optional
+from src.etl.event_index import build_event_index, align_event_index
+from src.etl.customers import KEY_COLUMN, fact_keys, per_customer_sum
 from src.utils.logger import get_logger
-from src.utils.config import ACTIVATION_WINDOW_DAYS
+from src.utils.config import ACTIVATION_WINDOW_DAYS, CHURN_WINDOW_DAYS
+from src.utils.timeline import Timeline, ceil_days, floor_days
 
 logger = get_logger(__name__)
 
-def classify_journey_stages(users: pd.DataFrame, events: pd.DataFrame, subs: pd.DataFrame) -> pd.DataFrame:
+
+class StageThresholds(NamedTuple):
+    """Day cutoffs of the stage rules. Fields may also be arrays that broadcast against the journey columns."""
+    activation_window_days: float = ACTIVATION_WINDOW_DAYS  # New customers stay in Acquisition this long
+    churn_window_days: float = CHURN_WINDOW_DAYS  # Activated customers seen this recently are Engaged
+
+
+DEFAULT_THRESHOLDS = StageThresholds()
+
+# Ordered rule table: the first matching rule wins, anything unmatched is "Churned".
+# Each rule is (stage, predicate over the columnar journey frame and the StageThresholds).
+STAGE_RULES = [
+    ("Retained", lambda j, t: j["has_active_sub"]),  # Paying customer
+    ("Engagement", lambda j, t: j["is_activated"] & (j["days_since_last_seen"] <= t.churn_window_days)),
+    ("Dormant", lambda j, t: j["is_activated"]),
+    ("Acquisition", lambda j, t: j["days_since_signup"] <= t.activation_window_days),  # New
+]
+DEFAULT_STAGE = "Churned"  # Not activated, old enough, or no sub
+# Integer stage codes index this list (stage_history, src.journey.transitions)
+STAGES = [stage for stage, _ in STAGE_RULES] + [DEFAULT_STAGE]
+NOT_SIGNED_UP = -1  # stage_history code for dates before the customer's signup
+# Customer x date cells evaluated at once by stage_history (bounds its temporaries)
+HISTORY_BLOCK_CELLS = 2_000_000
+
+
+def assign_stage_codes(journey, thresholds: StageThresholds = DEFAULT_THRESHOLDS) -> np.ndarray:
+    """
+    Evaluates STAGE_RULES over whole columns at once (no per-row Python) and returns
+    int8 codes into STAGES. `journey` may also be a dict of arrays that broadcast
+    together (and with array-valued thresholds).
+    """
+    conditions = [np.asarray(rule(journey, thresholds), dtype=bool) for _, rule in STAGE_RULES]
+    conditions = np.broadcast_arrays(*conditions)
+    choices = [np.int8(code) for code in range(len(STAGE_RULES))]
+    return np.select(conditions, choices, default=np.int8(len(STAGE_RULES)))
+
+
+def assign_stages(journey: pd.DataFrame, thresholds: StageThresholds = DEFAULT_THRESHOLDS) -> np.ndarray:
+    """Stage name per row of `journey` (see STAGE_RULES)."""
+    return np.array(STAGES, dtype=object)[assign_stage_codes(journey, thresholds)]
+
+
+def classify_journey_stages(users: pd.DataFrame, events: pd.DataFrame, subs: pd.DataFrame,
+                            event_index: Optional[Dict[str, Any]] = None,
+                            thresholds: StageThresholds = DEFAULT_THRESHOLDS) -> pd.DataFrame:
     """
     Classifies each user into a Journey Stage:
     - New: Signup < 14 days, no activation
     - Onboarding: Signup < 30 days, activated
     - Active: Active subscription or recent activity
     - Churned: Cancelled subscription or no activity > 30 days
+
+    Pass a prebuilt event_index (src.etl.event_index) to avoid rescanning events, and
+    `thresholds` to change the day cutoffs of the rules.
+    Rows follow `users`, indexed by customer_key (src.etl.customers); per-customer
+    facts are gathered by key, without joins on customer_id.
     """
     logger.info("Classifying journey stages...")
+    if event_index is None:
+        event_index = build_event_index(events)
+    customers = align_event_index(event_index, users)["customers"]
     
     # Create master DF
-    journey = users[["customer_id", "signup_date"]].copy()
+    journey = users[["customer_id", "signup_date"]].set_axis(pd.RangeIndex(len(users), name=KEY_COLUMN))
     today = pd.Timestamp.now().normalize()
     
     # 1. Activation Status
-    act_events = events[events["event_name"].str.lower() == "activate"]
-    activated_ids = set(act_events["customer_id"])
-    journey["is_activated"] = journey["customer_id"].apply(lambda x: x in activated_ids)
+    journey["is_activated"] = customers["first_activation"].notna().to_numpy()
     
     # 2. Subscription Status
-    active_sub_ids = set(subs[subs["status"] == "active"]["customer_id"])
-    journey["has_active_sub"] = journey["customer_id"].apply(lambda x: x in active_sub_ids)
+    active_subs = subs[subs["status"] == "active"]
+    journey["has_active_sub"] = per_customer_sum(fact_keys(users, active_subs), len(users)) > 0
     
     # 3. Last Activity
-    last_active = events.groupby("customer_id")["event_timestamp"].max().reset_index()
-    last_active.rename(columns={"event_timestamp": "last_seen"}, inplace=True)
-    journey = journey.merge(last_active, on="customer_id", how="left")
+    journey["last_seen"] = customers["last_seen"].to_numpy()
     
     journey["days_since_signup"] = (today - journey["signup_date"]).dt.days
     journey["days_since_last_seen"] = (today - journey["last_seen"]).dt.days.fillna(9999)
 
-    # Classification Logic
-    def classify(row):
-        if row["has_active_sub"]:
-            return "Retained" # Paying customer
-        if row["is_activated"]:
-            if row["days_since_last_seen"] <= 30:
-                return "Engagement"
-            else:
-                return "Dormant"
-        if row["days_since_signup"] <= 14:
-            return "Acquisition" # New
-        return "Churned" # Not activated, old enough, or no sub
-
-    journey["stage"] = journey.apply(classify, axis=1)
+    # Classification Logic (see STAGE_RULES)
+    journey["stage"] = assign_stages(journey, thresholds)
     
     logger.info(f"Stages classified: {journey['stage'].value_counts().to_dict()}")
     return journey
+
+
+def stage_history(users: pd.DataFrame, events: pd.DataFrame, subs: pd.DataFrame, dates,
+                  event_index: Optional[Dict[str, Any]] = None,
+                  thresholds: StageThresholds = DEFAULT_THRESHOLDS) -> pd.DataFrame:
+    """
+    Stage code (index into STAGES; NOT_SIGNED_UP before signup) of every customer as of
+    each of `dates`: what classify_journey_stages returns with `today` set to that date
+    and only the events and subscriptions dated up to its end. Subscriptions are active
+    from start_date until end_date; rows with a non-active status and no end_date are
+    ignored. Rows follow `users` (customer_key), columns are the dates.
+
+    Events and subscriptions are sorted once into (customer_key, day) timelines; each
+    block of customers is then evaluated for all dates by one searchsorted sweep.
+    """
+    dates = pd.DatetimeIndex(dates).normalize()
+    n_customers, day = len(users), floor_days(dates)
+    if event_index is None:
+        event_index = build_event_index(events)
+    customers = align_event_index(event_index, users)["customers"]
+    first_day, last_day = (int(day.min()), int(day.max())) if len(day) else (0, 0)
+    never = np.iinfo(np.int64).max
+
+    first_activation = customers["first_activation"]
+    activation_day = np.where(first_activation.notna(), floor_days(first_activation), never)
+    signup = users["signup_date"]
+    has_signup = signup.notna().to_numpy()
+    # Customers without a signup date count as signed up on every date, as in the snapshot
+    signup_day = np.where(has_signup, floor_days(signup), np.iinfo(np.int64).min)
+    signup_ceil = np.where(has_signup, ceil_days(signup), 0)
+
+    keys = fact_keys(users, events)
+    seen = (keys >= 0) & events["event_timestamp"].notna().to_numpy()
+    seen_ts = events["event_timestamp"].to_numpy()[seen]
+    activity = Timeline(keys[seen], floor_days(seen_ts), n_customers, first_day, last_day,
+                        tiebreak=seen_ts.view(np.int64))
+    seen_ceil = ceil_days(seen_ts)
+
+    sub_keys = fact_keys(users, subs)
+    counted = (sub_keys >= 0) & subs["start_date"].notna().to_numpy() & (
+        (subs["status"] == "active").to_numpy() | subs["end_date"].notna().to_numpy())
+    ended = counted & subs["end_date"].notna().to_numpy()
+    sub_starts = Timeline(sub_keys[counted], floor_days(subs["start_date"].to_numpy()[counted]),
+                          n_customers, first_day, last_day)
+    sub_ends = Timeline(sub_keys[ended], floor_days(subs["end_date"].to_numpy()[ended]),
+                        n_customers, first_day, last_day)
+
+    codes = np.empty((n_customers, len(dates)), dtype=np.int8)
+    block = max(1, HISTORY_BLOCK_CELLS // max(1, len(dates)))
+    for start in range(0, n_customers, block):
+        key = np.arange(start, min(start + block, n_customers))
+        k, d = key[:, None], day[None, :]
+        last_event = activity.last_through(k, d)
+        journey = {
+            "has_active_sub": sub_starts.count_through(k, d) > sub_ends.count_through(k, d),
+            "is_activated": activation_day[k] <= d,
+            "days_since_signup": np.where(has_signup[k], d - signup_ceil[k], np.nan),
+            "days_since_last_seen": np.where(last_event >= 0, d - seen_ceil[np.maximum(last_event, 0)], 9999),
+        }
+        codes[key] = np.where(signup_day[k] <= d, assign_stage_codes(journey, thresholds), NOT_SIGNED_UP)
+    return pd.DataFrame(codes, index=pd.RangeIndex(n_customers, name=KEY_COLUMN), columns=dates)
+
+
+def stage_counts(history: pd.DataFrame) -> pd.DataFrame:
+    """Customers in each stage per date of a stage_history frame (date, one column per stage)."""
+    codes = history.to_numpy()
+    counts = [np.bincount(codes[:, i][codes[:, i] >= 0], minlength=len(STAGES)) for i in range(codes.shape[1])]
+    table = pd.DataFrame(np.array(counts, dtype=np.int64).reshape(-1, len(STAGES)), columns=STAGES)
+    table.insert(0, "date", history.columns)
+    return table
+
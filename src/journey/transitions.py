@@ -0,0 +1,134 @@
+"""
+Stage / lifecycle-segment transition matrices (Sankey flows).
+
+Compare two saved snapshots (customer_journey or segmentation outputs, CSV or Parquet):
+    python -m src.journey.transitions BEFORE AFTER [--column stage] [--output flows.csv]
+"""
+import argparse
+import sys
+from pathlib import Path
+from typing import List
+import numpy as np
+import pandas as pd
+from src.etl.customers import build_customer_dimension
+from src.journey.classifier import NOT_SIGNED_UP, STAGES
+from src.segmentation.engine import LIFECYCLE_BY_STAGE, LIFECYCLE_SEGMENTS
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+ABSENT = "(none)"  # State of customers missing from a snapshot (not signed up yet / not in the file)
+LEVELS = ["stage", "lifecycle_segment"]
+# Known state order per snapshot column; other columns use their sorted values
+STATE_LABELS = {"stage": STAGES, "lifecycle_segment": LIFECYCLE_SEGMENTS}
+# Stage code -> lifecycle segment code (same rule as create_segments)
+LIFECYCLE_CODES = np.array([LIFECYCLE_SEGMENTS.index(LIFECYCLE_BY_STAGE.get(stage, "Churned")) for stage in STAGES],
+                           dtype=np.int8)
+
+
+def transition_matrix(before: np.ndarray, after: np.ndarray, labels: List[str]) -> pd.DataFrame:
+    """
+    Customers per (state before, state after) pair as a from x to count matrix.
+    Codes index `labels`; -1 is the ABSENT state. One bincount over the paired codes.
+    """
+    n = len(labels) + 1
+    pairs = (np.asarray(before, dtype=np.int64) + 1) * n + (np.asarray(after, dtype=np.int64) + 1)
+    counts = np.bincount(pairs, minlength=n * n).reshape(n, n)
+    states = [ABSENT] + list(labels)
+    return pd.DataFrame(counts, index=pd.Index(states, name="from_state"), columns=pd.Index(states, name="to_state"))
+
+
+def flows(matrix: pd.DataFrame) -> pd.DataFrame:
+    """Non-zero cells of a transition matrix as Sankey links (from_state, to_state, customers)."""
+    counts = matrix.to_numpy()
+    before, after = np.nonzero(counts)
+    return pd.DataFrame({"from_state": matrix.index[before], "to_state": matrix.columns[after],
+                         "customers": counts[before, after]})
+
+
+def level_codes(stage_codes: np.ndarray, level: str) -> np.ndarray:
+    """Stage codes (stage_history) re-coded to `level`, keeping -1 for absent customers."""
+    if level == "stage":
+        return stage_codes
+    return np.where(stage_codes == NOT_SIGNED_UP, -1, LIFECYCLE_CODES[np.maximum(stage_codes, 0)])
+
+
+def snapshot_transitions(history: pd.DataFrame, start, end, level: str = "stage") -> pd.DataFrame:
+    """Transition matrix between two dates (columns) of a stage_history frame."""
+    before, after = (level_codes(history[pd.Timestamp(day)].to_numpy(), level) for day in (start, end))
+    return transition_matrix(before, after, STATE_LABELS[level])
+
+
+def rolling_transitions(history: pd.DataFrame, step: int = 1, levels: List[str] = LEVELS) -> pd.DataFrame:
+    """
+    Sankey links for every `step`-column window ending at the last date of a
+    stage_history frame: from_date, to_date, level, from_state, to_state, customers
+    (customers staying in a state included, empty links omitted).
+    """
+    dates = history.columns
+    ends = list(range(len(dates) - 1, step - 1, -step))[::-1]
+    codes = history.to_numpy()
+    tables = []
+    for end in ends:
+        for level in levels:
+            matrix = transition_matrix(level_codes(codes[:, end - step], level), level_codes(codes[:, end], level),
+                                       STATE_LABELS[level])
+            link = flows(matrix)
+            link.insert(0, "level", level)
+            link.insert(0, "to_date", dates[end])
+            link.insert(0, "from_date", dates[end - step])
+            tables.append(link)
+    if not tables:
+        return pd.DataFrame(columns=["from_date", "to_date", "level", "from_state", "to_state", "customers"])
+    return pd.concat(tables, ignore_index=True)
+
+
+def compare_snapshots(before: pd.DataFrame, after: pd.DataFrame, column: str = "stage") -> pd.DataFrame:
+    """
+    Transition matrix of `column` between two customer-level snapshots (e.g. two
+    segmentation outputs), aligned on customer_id; customers found in only one of
+    them move from / to ABSENT.
+    """
+    before_ids, after_ids = build_customer_dimension(before), build_customer_dimension(after)
+    customers = after_ids.append(before_ids[~before_ids.isin(after_ids)])
+    known = STATE_LABELS.get(column, [])
+    seen = pd.unique(pd.concat([before[column], after[column]], ignore_index=True).dropna().astype(str))
+    labels = list(known) + sorted(set(seen) - set(known))
+    states = pd.Index(labels)
+
+    def codes(snapshot, ids):
+        position = ids.get_indexer(customers)
+        state = states.get_indexer(snapshot[column].astype(str).to_numpy())
+        return np.where(position >= 0, state[np.maximum(position, 0)], -1)
+
+    return transition_matrix(codes(before, before_ids), codes(after, after_ids), labels)
+
+
+def read_snapshot(path: Path, column: str) -> pd.DataFrame:
+    """customer_id and `column` of a saved journey/segmentation output (.csv, .csv.gz or Parquet)."""
+    path = Path(path)
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path, columns=["customer_id", column])
+    return pd.read_csv(path, usecols=["customer_id", column], dtype={"customer_id": "category", column: "category"})
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("before", type=Path)
+    parser.add_argument("after", type=Path)
+    parser.add_argument("--column", default="stage", help="State column to compare (default: stage)")
+    parser.add_argument("--output", type=Path, default=None, help="Write the Sankey links as CSV instead of printing")
+    args = parser.parse_args(argv)
+
+    matrix = compare_snapshots(read_snapshot(args.before, args.column), read_snapshot(args.after, args.column),
+                               args.column)
+    if args.output is None:
+        print(matrix.to_string())
+    else:
+        flows(matrix).to_csv(args.output, index=False)
+        logger.info(f"Transitions written to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,41 +1,53 @@
+import numpy as np
 import pandas as pd
-from typing import Dict
+from typing import Dict, Optional
+from src.etl.customers import fact_keys, per_customer_sum
 from src.utils.logger import get_logger
 
 logger = get_logger(__name__)
 
-def create_segments(journey_df: pd.DataFrame, revenue_df: pd.DataFrame) -> pd.DataFrame:
+# Journey stage -> lifecycle segment; any other stage is "Churned"
+LIFECYCLE_BY_STAGE = {"Acquisition": "New", "Retained": "Active", "Engagement": "Active", "Dormant": "At-Risk"}
+LIFECYCLE_SEGMENTS = ["New", "Active", "At-Risk", "Churned"]
+# Lifetime revenue at or above which a paying customer is High-Tier
+HIGH_TIER_REVENUE = 500
+REVENUE_SEGMENTS = ["Free", "Low-Tier", "High-Tier"]
+
+def revenue_segment_codes(amount, high_tier_revenue=HIGH_TIER_REVENUE) -> np.ndarray:
+    """Index into REVENUE_SEGMENTS per amount (arrays broadcast with the threshold)."""
+    amount = np.asarray(amount)
+    free, low = np.broadcast_arrays(amount == 0, amount < high_tier_revenue)
+    return np.select([free, low], [np.int8(0), np.int8(1)], default=np.int8(2))
+
+def create_segments(journey_df: pd.DataFrame, revenue_df: pd.DataFrame,
+                    high_tier_revenue: float = HIGH_TIER_REVENUE,
+                    support: Optional[pd.DataFrame] = None) -> pd.DataFrame:
     """
     Creates segments:
     - Lifecycle: New, Active, At-Risk, Churned (mapped from stages)
-    - Revenue: Free, Low-Tier, High-Tier
+    - Revenue: Free, Low-Tier (below `high_tier_revenue`), High-Tier
+    `support` (src.analytics.support.ticket_features, row-aligned with journey_df)
+    is appended as the support-load columns.
     """
     logger.info("Creating segments...")
     
     df = journey_df.copy()
     
     # Lifecycle Segment
-    # Mapping our Stages to the requested segments
+    # Mapping our Stages to the requested segments (LIFECYCLE_BY_STAGE)
     # Requested: New, Active, At-Risk, Churned
-    def map_lifecycle(stage):
-        if stage == "Acquisition": return "New"
-        if stage in ["Retained", "Engagement"]: return "Active"
-        if stage == "Dormant": return "At-Risk"
-        return "Churned"
-    
-    df["lifecycle_segment"] = df["stage"].apply(map_lifecycle)
+    df["lifecycle_segment"] = df["stage"].map(LIFECYCLE_BY_STAGE).fillna("Churned")
     
     # Revenue Segment
-    # Calc total Lifetime Revenue
-    ltv = revenue_df.groupby("customer_id")["amount"].sum().reset_index()
-    df = df.merge(ltv, on="customer_id", how="left")
-    df["amount"] = df["amount"].fillna(0)
+    # Calc total Lifetime Revenue, summed per customer_key and gathered by row
+    df["amount"] = per_customer_sum(fact_keys(journey_df, revenue_df), len(df), weights=revenue_df["amount"])
     
-    def map_revenue(amount):
-        if amount == 0: return "Free"
-        if amount < 500: return "Low-Tier"
-        return "High-Tier"
-        
-    df["revenue_segment"] = df["amount"].apply(map_revenue)
+    codes = revenue_segment_codes(df["amount"].to_numpy(), high_tier_revenue)
+    df["revenue_segment"] = np.array(REVENUE_SEGMENTS, dtype=object)[codes]
+
+    # Support load (ticket counts, resolution percentiles, priority / category mix)
+    if support is not None:
+        for column in support.columns:
+            df[column] = support[column].to_numpy()
     
     return df
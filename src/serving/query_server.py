@@ -0,0 +1,294 @@
+"""
+Local query server over the pipeline outputs.
+
+Loads segmentation (journey stage + segments per customer), churn scores and
+metrics.json once, indexes them by customer_id, stage and segment, and answers
+JSON queries over HTTP/1.1 (keep-alive) from memory:
+
+    GET /health                      snapshot info
+    GET /metrics[/<name>]            metrics.json, or one KPI
+    GET /customers/<customer_id>     one customer's row
+    GET /stages[/<stage>]            customers per stage, or the ids in a stage
+    GET /segments[/<segment>]        customers per lifecycle / revenue segment, or the ids in one
+    (ids are paged with ?offset=0&limit=100)
+
+The snapshot is rebuilt in a worker thread whenever a pipeline run finishes (the
+run's profile.json, written after every output, changes) and swapped in with one
+reference assignment, so every request is answered from one complete run.
+
+Usage:
+    python -m src.serving.query_server [--host 127.0.0.1] [--port 8765] [--reload-seconds 1.0] [--outputs-dir outputs]
+"""
+import argparse
+import asyncio
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, unquote, urlsplit
+import numpy as np
+import pandas as pd
+from src.utils.config import (
+    CHURN_SCORES_FILE, CUSTOMER_JOURNEY_FILE, METRICS_FILE, OUTPUTS_DIR, PROFILE_FILE, SEGMENTS_FILE, SERVER_HOST,
+    SERVER_PORT, SERVER_RELOAD_SECONDS, SHARDED_CHURN_DIR, SHARDED_JOURNEY_DIR, SHARDED_SEGMENTS_DIR,
+)
+from src.utils.writers import FORMATS, output_path
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SEGMENT_COLUMNS = ["lifecycle_segment", "revenue_segment"]
+DEFAULT_PAGE = 100
+MAX_REQUEST_BYTES = 8192
+STATUS_TEXT = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed", 503: "Service Unavailable"}
+
+
+def _located(outputs_dir: Path, path: Path) -> Path:
+    """A configured output path (src.utils.config) inside `outputs_dir` instead of OUTPUTS_DIR."""
+    return Path(outputs_dir) / Path(path).relative_to(OUTPUTS_DIR)
+
+
+def latest_output(path: Path, sharded_dir: Optional[Path] = None) -> Optional[Path]:
+    """Most recently written form of a tabular output: path in any of FORMATS, or the --shards part directory."""
+    candidates = [output_path(path, fmt) for fmt in FORMATS]
+    if sharded_dir is not None and any(Path(sharded_dir).glob("part-*")):
+        candidates.append(Path(sharded_dir))
+    existing = [p for p in candidates if p.exists()]
+    return max(existing, key=lambda p: p.stat().st_mtime_ns) if existing else None
+
+
+def read_output(path: Path) -> pd.DataFrame:
+    """Reads a .csv / .csv.gz / .parquet output (file or partitioned directory) or a directory of part files."""
+    path = Path(path)
+    if path.is_dir() and not path.suffix:
+        parts = sorted(path.glob("part-*"))
+        return pd.concat([read_output(p) for p in parts], ignore_index=True) if parts else pd.DataFrame()
+    if path.suffix == ".parquet":
+        return pd.read_parquet(path)
+    return pd.read_csv(path, dtype={"customer_id": str})
+
+
+def _json_column(values: pd.Series) -> List[Any]:
+    """Column as JSON-ready Python values: dates as ISO strings, missing values as None."""
+    if pd.api.types.is_datetime64_any_dtype(values):
+        text = values.dt.strftime("%Y-%m-%d").astype(object)
+        return text.where(values.notna(), None).tolist()
+    if isinstance(values.dtype, pd.CategoricalDtype):
+        values = values.astype(object)
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+class Snapshot:
+    """
+    One pipeline run's outputs with in-memory indexes: customer_id -> row, and per
+    stage / segment value the rows holding it (sorted positions). Rows are kept as
+    per-column lists of Python values so a lookup only builds one small dict.
+    """
+
+    def __init__(self, customers: pd.DataFrame, metrics: Dict[str, Any], version: int = 0):
+        self.metrics = metrics
+        self.version = version
+        self.loaded_at = pd.Timestamp.now().isoformat(timespec="seconds")
+        self.columns = list(customers.columns)
+        self.values = {column: _json_column(customers[column]) for column in self.columns}
+        self.ids = self.values.get("customer_id", [])
+        self.by_id = {customer_id: row for row, customer_id in enumerate(self.ids)}
+        self.groups = {}
+        for column in ["stage"] + SEGMENT_COLUMNS:
+            if column not in customers.columns:
+                continue
+            codes, labels = pd.factorize(customers[column].astype(object), sort=True)
+            order = np.argsort(codes, kind="stable")
+            bounds = np.searchsorted(codes[order], np.arange(len(labels) + 1))
+            self.groups[column] = {str(label): order[bounds[i]:bounds[i + 1]] for i, label in enumerate(labels)}
+
+    def customer(self, customer_id: str) -> Optional[Dict[str, Any]]:
+        row = self.by_id.get(customer_id)
+        if row is None:
+            return None
+        return {column: self.values[column][row] for column in self.columns}
+
+    def counts(self, column: str) -> Dict[str, int]:
+        return {label: len(rows) for label, rows in self.groups.get(column, {}).items()}
+
+    def members(self, column: str, label: str, offset: int = 0, limit: int = DEFAULT_PAGE) -> Optional[List[str]]:
+        rows = self.groups.get(column, {}).get(label)
+        if rows is None:
+            return None
+        return [self.ids[row] for row in rows[offset:offset + limit]]
+
+
+def load_snapshot(outputs_dir: Path = OUTPUTS_DIR, version: int = 0) -> Snapshot:
+    """Reads the latest segmentation (or journey) rows, churn scores and metrics.json into a Snapshot."""
+    at = lambda path: _located(outputs_dir, path)
+    source = (latest_output(at(SEGMENTS_FILE), at(SHARDED_SEGMENTS_DIR))
+              or latest_output(at(CUSTOMER_JOURNEY_FILE), at(SHARDED_JOURNEY_DIR)))
+    customers = read_output(source) if source is not None else pd.DataFrame({"customer_id": []})
+    churn_source = latest_output(at(CHURN_SCORES_FILE), at(SHARDED_CHURN_DIR))
+    if churn_source is not None and len(customers):
+        scores = read_output(churn_source)[["customer_id", "churn_score"]]
+        customers = customers.merge(scores, on="customer_id", how="left")
+    metrics = {}
+    if at(METRICS_FILE).exists():
+        with open(at(METRICS_FILE)) as f:
+            metrics = json.load(f)
+    logger.info(f"Loaded {len(customers)} customers from {source.name if source else 'nothing'}")
+    return Snapshot(customers, metrics, version)
+
+
+def run_marker(outputs_dir: Path = OUTPUTS_DIR) -> int:
+    """Changes when a pipeline run completes: profile.json is written after all of its outputs."""
+    marker = _located(outputs_dir, PROFILE_FILE)
+    return marker.stat().st_mtime_ns if marker.exists() else 0
+
+
+class QueryService:
+    """Routes queries to the current Snapshot; reload_if_changed() swaps in a new one after a pipeline run."""
+
+    def __init__(self, outputs_dir: Path = OUTPUTS_DIR):
+        self.outputs_dir = Path(outputs_dir)
+        self.snapshot: Optional[Snapshot] = None
+        self.address: Optional[Tuple[str, int]] = None
+
+    def reload_if_changed(self) -> bool:
+        """Loads a new snapshot when the run marker moved; returns True when it did."""
+        marker = run_marker(self.outputs_dir)
+        if self.snapshot is not None and marker == self.snapshot.version:
+            return False
+        self.snapshot = load_snapshot(self.outputs_dir, marker)
+        return True
+
+    def handle(self, target: str) -> Tuple[int, Any]:
+        """(HTTP status, JSON payload) for a GET of `target` (path and query string)."""
+        snapshot = self.snapshot  # one snapshot for the whole request, even if a reload swaps it
+        if snapshot is None:
+            return 503, {"error": "outputs not loaded yet"}
+        url = urlsplit(target)
+        parts = [unquote(p) for p in url.path.split("/") if p]
+        query = parse_qs(url.query)
+        try:
+            offset = int(query.get("offset", ["0"])[0])
+            limit = int(query.get("limit", [str(DEFAULT_PAGE)])[0])
+        except ValueError:
+            return 400, {"error": "offset and limit must be integers"}
+        if offset < 0 or limit < 0:
+            return 400, {"error": "offset and limit must be non-negative"}
+
+        if parts == ["health"]:
+            return 200, {"status": "ok", "customers": len(snapshot.ids), "loaded_at": snapshot.loaded_at,
+                         "version": snapshot.version}
+        if parts[:1] == ["metrics"] and len(parts) <= 2:
+            if len(parts) == 1:
+                return 200, snapshot.metrics
+            if parts[1] not in snapshot.metrics:
+                return 404, {"error": f"unknown metric {parts[1]!r}"}
+            return 200, {parts[1]: snapshot.metrics[parts[1]]}
+        if parts[:1] == ["customers"] and len(parts) == 2:
+            row = snapshot.customer(parts[1])
+            return (200, row) if row is not None else (404, {"error": f"unknown customer {parts[1]!r}"})
+        if parts[:1] == ["stages"] and len(parts) <= 2:
+            return self._group(snapshot, ["stage"], parts[1:], offset, limit)
+        if parts[:1] == ["segments"] and len(parts) <= 2:
+            return self._group(snapshot, SEGMENT_COLUMNS, parts[1:], offset, limit)
+        return 404, {"error": f"no route for {url.path}"}
+
+    @staticmethod
+    def _group(snapshot: Snapshot, columns: List[str], label: List[str], offset: int, limit: int):
+        if not label:
+            counts = {column: snapshot.counts(column) for column in columns}
+            return 200, counts if len(columns) > 1 else counts[columns[0]]
+        for column in columns:
+            ids = snapshot.members(column, label[0], offset, limit)
+            if ids is not None:
+                return 200, {column: label[0], "customers": len(snapshot.groups[column][label[0]]),
+                             "offset": offset, "customer_ids": ids}
+        return 404, {"error": f"unknown {' / '.join(columns)} {label[0]!r}"}
+
+
+def _response(status: int, payload: Any, keep_alive: bool) -> bytes:
+    body = json.dumps(payload).encode()
+    head = (f"HTTP/1.1 {status} {STATUS_TEXT[status]}\r\nContent-Type: application/json\r\n"
+            f"Content-Length: {len(body)}\r\nConnection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n")
+    return head.encode() + body
+
+
+async def _serve_connection(service: QueryService, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    try:
+        while True:
+            try:
+                head = await reader.readuntil(b"\r\n\r\n")
+            except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+                break
+            lines = head.decode("latin-1").split("\r\n")
+            request = lines[0].split(" ")
+            headers = {k.strip().lower(): v.strip() for k, _, v in (line.partition(":") for line in lines[1:] if line)}
+            keep_alive = headers.get("connection", "").lower() != "close" and request[-1] == "HTTP/1.1"
+            if len(request) != 3:
+                status, payload, keep_alive = 400, {"error": "malformed request line"}, False
+            elif request[0] != "GET":
+                # Any request body is left unread, so the connection cannot be reused
+                status, payload, keep_alive = 405, {"error": "only GET is supported"}, False
+            else:
+                status, payload = service.handle(request[1])
+            writer.write(_response(status, payload, keep_alive))
+            await writer.drain()
+            if not keep_alive:
+                break
+    finally:
+        writer.close()
+
+
+async def _watch(service: QueryService, interval: float):
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Parsing runs off the event loop; requests keep using the old snapshot meanwhile
+            if await loop.run_in_executor(None, service.reload_if_changed):
+                logger.info(f"Reloaded outputs (version {service.snapshot.version})")
+        except Exception:
+            logger.exception("Reload failed; still serving the previous snapshot")
+
+
+async def serve(service: QueryService, host: str = SERVER_HOST, port: int = SERVER_PORT,
+                reload_seconds: float = SERVER_RELOAD_SECONDS, ready: Optional[asyncio.Event] = None):
+    """Serves `service` until cancelled; with reload_seconds > 0 polls for finished pipeline runs."""
+    server = await asyncio.start_server(lambda r, w: _serve_connection(service, r, w), host, port,
+                                        limit=MAX_REQUEST_BYTES)
+    watcher = asyncio.create_task(_watch(service, reload_seconds)) if reload_seconds > 0 else None
+    address = server.sockets[0].getsockname()
+    service.address = address[:2]
+    logger.info(f"Query server listening on http://{address[0]}:{address[1]}")
+    if ready is not None:
+        ready.set()
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        if watcher is not None:
+            watcher.cancel()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--outputs-dir", type=Path, default=OUTPUTS_DIR, help="Pipeline outputs to serve")
+    parser.add_argument("--reload-seconds", type=float, default=SERVER_RELOAD_SECONDS,
+                        help=f"How often to check for a finished pipeline run (default: {SERVER_RELOAD_SECONDS}; "
+                             "0 disables reloading)")
+    args = parser.parse_args(argv)
+    service = QueryService(args.outputs_dir)
+    start = time.perf_counter()
+    service.reload_if_changed()
+    logger.info(f"Indexed {len(service.snapshot.ids)} customers in {time.perf_counter() - start:.3f}s")
+    try:
+        asyncio.run(serve(service, args.host, args.port, args.reload_seconds))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,26 @@
+import os
 from pathlib import Path
 
 # Project Root
 ROOT_DIR = Path(__file__).resolve().parents[2]
-DATA_DIR = ROOT_DIR / "data"
-OUTPUTS_DIR = ROOT_DIR / "outputs"
+# P5_DATA_DIR / P5_OUTPUTS_DIR / P5_CACHE_DIR point a run at other inputs (e.g. generated scale data)
+DATA_DIR = Path(os.environ.get("P5_DATA_DIR", ROOT_DIR / "data"))
+OUTPUTS_DIR = Path(os.environ.get("P5_OUTPUTS_DIR", ROOT_DIR / "outputs"))
 SAMPLE_DIR = DATA_DIR / "sample"
+CACHE_DIR = Path(os.environ.get("P5_CACHE_DIR", ROOT_DIR / ".cache"))
+INPUT_CACHE_DIR = CACHE_DIR / "inputs" # Parquet copies of the parsed input CSVs
+STATE_DIR = CACHE_DIR / "state" # Per-customer state and watermarks for incremental runs
+SKETCH_DIR = CACHE_DIR / "sketches" # Daily distinct-count / quantile sketches (python -m src.analytics.approx)
+MODELS_DIR = ROOT_DIR / "models"
+CHURN_MODEL_FILE = MODELS_DIR / "churn_model.json" # Logistic churn model (python -m src.analytics.churn)
 
 # File Paths
 USERS_FILE = DATA_DIR / "users.csv"
 EVENTS_FILE = DATA_DIR / "events.csv"
 SUBSCRIPTIONS_FILE = DATA_DIR / "subscriptions.csv"
 REVENUE_FILE = DATA_DIR / "revenue.csv"
+SUPPORT_TICKETS_FILE = DATA_DIR / "support_tickets.csv"
+CUSTOMER_ID_MAP_FILE = DATA_DIR / "customer_id_map.csv" # Optional source_id -> customer_id aliases (e.g. helpdesk usr_ ids)
 
 # Output Paths
 KPI_SUMMARY_FILE = OUTPUTS_DIR / "kpi_summary.csv"
@@ -19,8 +29,46 @@ FUNNEL_FILE = OUTPUTS_DIR / "funnel.json"
 METRICS_FILE = OUTPUTS_DIR / "metrics.json" # As per checklist C1
 SEGMENTS_FILE = OUTPUTS_DIR / "segmentation.csv"
 COHORT_MATRIX_FILE = OUTPUTS_DIR / "cohort_retention_matrix.csv"
+ORDERED_FUNNEL_FILE = OUTPUTS_DIR / "funnel_steps.csv" # Ordered, windowed funnel with breakdowns
+MRR_BREAKDOWN_FILE = OUTPUTS_DIR / "mrr_breakdown.csv"
+CHURN_SCORES_FILE = OUTPUTS_DIR / "churn_scores.csv" # Churn features and model score per customer
+STAGE_HISTORY_FILE = OUTPUTS_DIR / "journey_stage_history.csv" # Customers per stage per day (--history-days)
+STAGE_TRANSITIONS_FILE = OUTPUTS_DIR / "journey_stage_transitions.csv" # Stage / segment Sankey links (--history-days)
+WHATIF_GRID_FILE = OUTPUTS_DIR / "whatif_grid.csv" # KPIs per threshold scenario (python -m src.analytics.whatif)
+SHARDED_JOURNEY_DIR = OUTPUTS_DIR / "customer_journey" # part-NNNNN.csv per shard (--shards mode)
+SHARDED_SEGMENTS_DIR = OUTPUTS_DIR / "segmentation"
+SHARDED_CHURN_DIR = OUTPUTS_DIR / "churn_scores"
+TABLEAU_DIR = OUTPUTS_DIR / "tableau_ready" # Tableau extracts (src/exports/tableau.py)
+INSPECTIONS_DIR = OUTPUTS_DIR / "inspections"
+PROFILE_FILE = INSPECTIONS_DIR / "profile.json" # Per-stage time / memory / rows of the last run
+PROFILE_STATS_DIR = INSPECTIONS_DIR / "profile" # <stage>.prof cProfile dumps (--profile)
 
 # Configuration
 ACTIVATION_WINDOW_DAYS = 14
 RETENTION_WINDOW_DAYS = 30
 CHURN_WINDOW_DAYS = 30
+
+# Approximate mode (src.utils.sketches): HyperLogLog registers 2^p (1.04 / sqrt(2^p) relative
+# standard error, 1.6% at 12) and the quantile sketches' relative error bound
+SKETCH_PRECISION = 12
+SKETCH_RELATIVE_ACCURACY = 0.01
+
+# What-if sweeps (src.analytics.whatif): scenario results kept in the LRU cache
+WHATIF_CACHE_SIZE = 4096
+
+# Cohort retention matrix: periods 0..N-1 after signup, per --cohort-grain
+COHORT_MAX_PERIODS = {"day": 30, "week": 12, "month": 8}
+
+# Streaming ingestion: max event rows held in memory at once (load_data(stream_events=True))
+EVENTS_CHUNK_SIZE = 1_000_000
+
+# Output writers: rows converted per Parquet row group
+OUTPUT_ROW_GROUP_ROWS = 250_000
+
+# Tableau extracts: users joined to their subscriptions per chunk of this many users
+EXTRACT_CHUNK_ROWS = 250_000
+
+# Query server (python -m src.serving.query_server)
+SERVER_HOST = "127.0.0.1"
+SERVER_PORT = 8765
+SERVER_RELOAD_SECONDS = 1.0 # How often the server checks for a finished pipeline run
@@ -0,0 +1,61 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Any, Callable, Dict, List, Tuple
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Stage name -> (function, names of the stages whose results it takes, in order)
+Stages = Dict[str, Tuple[Callable[..., Any], List[str]]]
+
+
+def check_stages(stages: Stages):
+    """Raises ValueError on unknown dependencies or cycles."""
+    for name, (_, deps) in stages.items():
+        missing = [d for d in deps if d not in stages]
+        if missing:
+            raise ValueError(f"Stage '{name}' depends on unknown stages: {missing}")
+    state = {}
+    def visit(name, path):
+        if state.get(name) == "done":
+            return
+        if state.get(name) == "visiting":
+            raise ValueError(f"Cycle in stage graph: {' -> '.join(path + [name])}")
+        state[name] = "visiting"
+        for dep in stages[name][1]:
+            visit(dep, path + [name])
+        state[name] = "done"
+    for name in stages:
+        visit(name, [])
+
+
+def _run_stage(fn, args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def run_dag(stages: Stages, workers: int = 1) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Runs each stage once all of its dependencies have finished, with up to `workers`
+    stages in flight on a thread pool (workers=1 runs them serially in definition order).
+    Returns (results, seconds) keyed by stage name. The first stage error is re-raised.
+    """
+    check_stages(stages)
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    pending = dict(stages)
+    running = {}
+
+    with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+        while pending or running:
+            ready = [name for name, (_, deps) in pending.items() if all(d in results for d in deps)]
+            for name in ready[:max(1, workers) - len(running)]:
+                fn, deps = pending.pop(name)
+                running[pool.submit(_run_stage, fn, [results[d] for d in deps])] = name
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                name = running.pop(future)
+                results[name], timings[name] = future.result()
+                logger.info(f"Stage '{name}' finished in {timings[name]:.3f}s")
+    return results, timings
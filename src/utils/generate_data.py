@@ -0,0 +1,250 @@
+"""
+Scale-parameterized synthetic dataset in the schemas of data/*.csv.
+
+Usage:
+    python -m src.utils.generate_data --events 10000000 --out data/scale/1e7 [--seed 42] [--as-of 2025-12-31]
+
+Users are generated in fixed-size blocks with a per-block RNG, so the output only
+depends on (events, events_per_user, seed, as_of) and memory stays bounded by one
+block even at 10^8 events. Defaults follow the distributions of the checked-in data:
+~60% of users activate within 14 days, ~25% subscribe 7-120 days after signup and
+subscriptions churn with a monthly hazard; support tickets reference customer_id.
+"""
+import argparse
+from pathlib import Path
+from typing import Dict, Iterator, Optional
+import numpy as np
+import pandas as pd
+from src.etl.schema import apply_schema
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+BLOCK_USERS = 250_000
+SIGNUP_WINDOW_DAYS = 365
+
+COUNTRIES = (["US", "GB", "IN", "CA", "AU"], [0.2, 0.2, 0.2, 0.2, 0.2])
+CHANNELS = (["organic", "ads", "partner", "referral"], [0.26, 0.26, 0.25, 0.23])
+PLANS = (["free", "pro", "enterprise"], [0.35, 0.33, 0.32])
+ISSUE_CATEGORIES = (["Access", "Billing", "Feature_Req", "Technical"], [0.27, 0.25, 0.24, 0.24])
+PRIORITIES = (["High", "Medium", "Low"], [0.35, 0.33, 0.32])
+
+ACTIVATION_RATE = 0.55
+SUBSCRIBER_ACTIVATION_RATE = 0.85
+SUBSCRIPTION_RATE = {"free": 0.12, "pro": 0.32, "enterprise": 0.32}
+PRO_PRICES = [199, 499]
+ENTERPRISE_PRICE = 999
+ANNUAL_SHARE = 0.15
+ANNUAL_MONTHS_BILLED = 10 # annual plans cost 10 monthly prices
+MONTHLY_CHURN_HAZARD = 0.03
+ANNUAL_CHURN_HAZARD = 0.2 # per renewal
+TICKETS_PER_USER = 0.5
+UNRESOLVED_TICKET_RATE = 0.01
+# signup + activate + upgrade at the rates above; extra events are logins
+LIFECYCLE_EVENTS_PER_USER = 1.85
+
+
+def add_months(days: np.ndarray, months: np.ndarray) -> np.ndarray:
+    """datetime64[D] + whole months, clipping the day to the target month's length."""
+    month = days.astype("datetime64[M]")
+    day = (days - month.astype("datetime64[D]")).astype(np.int64)
+    target = month + months
+    month_len = ((target + 1).astype("datetime64[D]") - target.astype("datetime64[D]")).astype(np.int64)
+    return target.astype("datetime64[D]") + np.minimum(day, month_len - 1)
+
+
+_DIGITS = np.frombuffer(b"0123456789abcdef", np.uint8)
+
+
+def _format(values: np.ndarray, unit: str) -> np.ndarray:
+    text = np.datetime_as_string(values, unit=unit)
+    return np.where(np.isnat(values), "", text)
+
+
+def _ids(prefix: str, numbers: np.ndarray, width: int, base: int = 10) -> np.ndarray:
+    """prefix + zero-padded numbers, built as a uint8 digit matrix (np.char is ~5x slower)."""
+    width = max(width, len(np.base_repr(int(numbers.max(initial=0)), base)))
+    digits = _DIGITS[numbers[:, None] // base ** np.arange(width - 1, -1, -1, dtype=np.int64) % base]
+    head = np.broadcast_to(np.frombuffer(prefix.encode(), np.uint8), (len(numbers), len(prefix)))
+    chars = np.ascontiguousarray(np.hstack([head, digits]))
+    return chars.view(f"S{chars.shape[1]}").ravel().astype(str)
+
+
+def _block(rng: np.random.Generator, first_user: int, n_users: int, counters: Dict[str, int],
+           as_of: np.datetime64, events_per_user: float, id_width: int) -> Dict[str, pd.DataFrame]:
+    """One block of users with all of their events, subscriptions, invoices and tickets."""
+    user_no = np.arange(first_user, first_user + n_users)
+    customer_id = _ids("C", user_no + 1, id_width)
+    signup = as_of - rng.integers(0, SIGNUP_WINDOW_DAYS, n_users).astype("timedelta64[D]")
+    plan = np.array(PLANS[0])[rng.choice(len(PLANS[0]), n_users, p=PLANS[1])]
+
+    # Subscriptions: at most one per user, starting 7-120 days after signup (not after as_of)
+    sub_rate = np.select([plan == p for p in SUBSCRIPTION_RATE], list(SUBSCRIPTION_RATE.values()))
+    sub_start = signup + rng.integers(7, 121, n_users).astype("timedelta64[D]")
+    subscribed = (rng.random(n_users) < sub_rate) & (sub_start <= as_of)
+    owner = np.flatnonzero(subscribed)
+    n_subs = len(owner)
+    start = sub_start[owner]
+    enterprise = plan[owner] == "enterprise"
+    monthly_price = np.where(enterprise, ENTERPRISE_PRICE, rng.choice(PRO_PRICES, n_subs))
+    annual = rng.random(n_subs) < ANNUAL_SHARE
+    step = np.where(annual, 12, 1)
+    hazard = np.where(annual, ANNUAL_CHURN_HAZARD, MONTHLY_CHURN_HAZARD)
+    lifetime_months = rng.geometric(hazard) * step
+    end = add_months(start, lifetime_months)
+    ended = end <= as_of
+    end = np.where(ended, end, np.datetime64("NaT", "D"))
+    sub_no = counters["subscriptions"] + np.arange(n_subs)
+    subscriptions = pd.DataFrame({
+        "subscription_id": _ids("S", sub_no + 1, 6),
+        "customer_id": customer_id[owner],
+        "plan": np.where(enterprise, "enterprise", "pro"),
+        "start_date": _format(start, "D"),
+        "end_date": _format(end, "D"),
+        "status": np.where(ended, "cancelled", "active"),
+        "price": np.where(annual, monthly_price * ANNUAL_MONTHS_BILLED, monthly_price),
+        "billing_period": np.where(annual, "annual", "monthly"),
+    })
+
+    # Invoices: one per billing period from start until the end date (or as_of)
+    last_day = np.where(ended, end - 1, as_of)
+    periods = ((last_day.astype("datetime64[M]") - start.astype("datetime64[M]")).astype(np.int64) // step) + 1
+    inv_sub = np.repeat(np.arange(n_subs), periods)
+    k = np.arange(periods.sum()) - np.repeat(np.cumsum(periods) - periods, periods)
+    inv_date = add_months(start[inv_sub], k * step[inv_sub])
+    keep = inv_date <= last_day[inv_sub]
+    inv_sub, k, inv_date = inv_sub[keep], k[keep], inv_date[keep]
+    revenue = pd.DataFrame({
+        "invoice_id": pd.Series(_ids("I", sub_no[inv_sub] + 1, 6)) + "_" + pd.Series(k).astype(str),
+        "customer_id": customer_id[owner][inv_sub],
+        "amount": subscriptions["price"].to_numpy()[inv_sub],
+        "revenue_date": _format(inv_date, "D"),
+        "revenue_type": "recurring",
+    })
+
+    # Events: signup, activation within 14 days, upgrade at subscription start, logins
+    # spread over the user's active life (until churn or as_of)
+    activation_rate = np.where(subscribed, SUBSCRIBER_ACTIVATION_RATE, ACTIVATION_RATE)
+    activated = rng.random(n_users) < activation_rate
+    signup_s = signup.astype("datetime64[s]")
+    activate_at = signup_s + rng.integers(0, 15 * 86400, n_users).astype("timedelta64[s]")
+    activated &= activate_at <= as_of.astype("datetime64[s]")
+    active_until = np.full(n_users, as_of + 1)
+    active_until[owner] = np.where(ended, end, as_of + 1)
+    n_logins = rng.poisson(max(0.0, events_per_user - LIFECYCLE_EVENTS_PER_USER), n_users)
+    login_user = np.repeat(np.arange(n_users), n_logins)
+    span = (active_until - signup).astype("timedelta64[s]").astype(np.int64)[login_user]
+    login_at = signup_s[login_user] + (rng.random(len(login_user)) * span).astype("timedelta64[s]")
+
+    act = np.flatnonzero(activated)
+    who = np.concatenate([np.arange(n_users), act, owner, login_user])
+    when = np.concatenate([signup_s, activate_at[act], start.astype("datetime64[s]"), login_at])
+    name = np.repeat(np.array(["signup", "activate", "upgrade", "login"]),
+                     [n_users, len(act), n_subs, len(login_user)])
+    order = np.lexsort((when, who))
+    who, when, name = who[order], when[order], name[order]
+    event_no = counters["events"] + np.arange(len(who))
+    events = pd.DataFrame({
+        "event_id": _ids("E", event_no + 1, 7),
+        "customer_id": customer_id[who],
+        "event_name": name,
+        "event_timestamp": _format(when, "s"),
+    })
+
+    cancelled = np.zeros(n_users, dtype=bool)
+    cancelled[owner] = ended
+    no_sub = ~subscribed
+    cancelled[no_sub] = rng.random(no_sub.sum()) < 0.5
+    users = pd.DataFrame({
+        "customer_id": customer_id,
+        "email": "user" + pd.Series(user_no + 1).astype(str) + "@example.com",
+        "signup_date": _format(signup, "D"),
+        "country": np.array(COUNTRIES[0])[rng.choice(len(COUNTRIES[0]), n_users, p=COUNTRIES[1])],
+        "pricing_plan": plan,
+        "acquisition_channel": np.array(CHANNELS[0])[rng.choice(len(CHANNELS[0]), n_users, p=CHANNELS[1])],
+        "status": np.where(cancelled, "cancelled", "active"),
+    })
+
+    # Support tickets: created between signup and as_of, resolved 1-100 hours later
+    n_tickets = rng.poisson(TICKETS_PER_USER, n_users)
+    ticket_user = np.repeat(np.arange(n_users), n_tickets)
+    created = signup[ticket_user] + (rng.random(len(ticket_user))
+                                     * (as_of - signup + 1)[ticket_user].astype(np.int64)).astype(np.int64).astype("timedelta64[D]")
+    resolved = created.astype("datetime64[h]") + rng.integers(1, 101, len(ticket_user)).astype("timedelta64[h]")
+    resolved[rng.random(len(ticket_user)) < UNRESOLVED_TICKET_RATE] = np.datetime64("NaT")
+    ticket_no = counters["support_tickets"] + np.arange(len(ticket_user))
+    support_tickets = pd.DataFrame({
+        "ticket_id": _ids("tkt_", ticket_no + 1, 8, base=16),
+        "customer_id": customer_id[ticket_user],
+        "created_at": _format(created, "D"),
+        "resolved_at": np.char.replace(_format(resolved.astype("datetime64[s]"), "s"), "T", " "),
+        "issue_category": np.array(ISSUE_CATEGORIES[0])[rng.choice(4, len(ticket_user), p=ISSUE_CATEGORIES[1])],
+        "priority": np.array(PRIORITIES[0])[rng.choice(3, len(ticket_user), p=PRIORITIES[1])],
+    })
+
+    counters["subscriptions"] += n_subs
+    counters["events"] += len(events)
+    counters["support_tickets"] += len(support_tickets)
+    return {"users": users, "events": events, "subscriptions": subscriptions,
+            "revenue": revenue, "support_tickets": support_tickets}
+
+
+def generate_blocks(n_events: int, events_per_user: float = LIFECYCLE_EVENTS_PER_USER, seed: int = 42,
+                    as_of: Optional[str] = None) -> Iterator[Dict[str, pd.DataFrame]]:
+    """
+    Yields per-block tables (string columns, exactly as written to CSV) for about
+    `n_events` events; the user count is n_events / events_per_user.
+    """
+    as_of = np.datetime64(pd.Timestamp.now() if as_of is None else pd.Timestamp(as_of), "D")
+    n_users = max(1, int(round(n_events / events_per_user)))
+    id_width = max(5, len(str(n_users)))
+    counters = {"subscriptions": 0, "events": 0, "support_tickets": 0}
+    for block, first in enumerate(range(0, n_users, BLOCK_USERS)):
+        rng = np.random.default_rng([seed, block])
+        yield _block(rng, first, min(BLOCK_USERS, n_users - first), counters, as_of, events_per_user, id_width)
+
+
+def generate_dataset(n_events: int, **kwargs) -> Dict[str, pd.DataFrame]:
+    """All blocks concatenated in memory (small sizes / tests)."""
+    blocks = list(generate_blocks(n_events, **kwargs))
+    return {name: pd.concat([b[name] for b in blocks], ignore_index=True) for name in blocks[0]}
+
+
+def generate_tables(n_users: int, events_per_user: float = LIFECYCLE_EVENTS_PER_USER,
+                    **kwargs) -> Dict[str, pd.DataFrame]:
+    """
+    generate_dataset() for about `n_users` users, each table cast to the dtypes
+    load_data() returns (src.etl.schema): in-memory inputs for the benchmarks.
+    """
+    tables = generate_dataset(max(1, int(round(n_users * events_per_user))), events_per_user=events_per_user,
+                              **kwargs)
+    return {name: apply_schema(name, df) for name, df in tables.items()}
+
+
+def write_dataset(out_dir: Path, n_events: int, **kwargs) -> Dict[str, int]:
+    """Writes <name>.csv per table block by block; returns rows written per table."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rows: Dict[str, int] = {}
+    for tables in generate_blocks(n_events, **kwargs):
+        for name, df in tables.items():
+            df.to_csv(out_dir / f"{name}.csv", mode="a" if name in rows else "w", header=name not in rows, index=False)
+            rows[name] = rows.get(name, 0) + len(df)
+    logger.info(f"Synthetic dataset written to {out_dir}: " + ", ".join(f"{k}={v}" for k, v in rows.items()))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, required=True, help="Approximate number of events (10^4 .. 10^8)")
+    parser.add_argument("--out", type=Path, required=True, help="Directory for the generated CSVs")
+    parser.add_argument("--events-per-user", type=float, default=LIFECYCLE_EVENTS_PER_USER,
+                        help="Mean events per user; above ~1.85 the extra events are logins")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--as-of", default=None, help="Last day of the generated history (default: today)")
+    args = parser.parse_args()
+    write_dataset(args.out, args.events, events_per_user=args.events_per_user, seed=args.seed, as_of=args.as_of)
+
+
+if __name__ == "__main__":
+    main()
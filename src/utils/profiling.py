@@ -0,0 +1,119 @@
+import cProfile
+import json
+import re
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from src.utils.dag import Stages
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+MB = 1024 * 1024
+# ru_maxrss is reported in KiB on Linux and in bytes on macOS
+_MAXRSS_UNIT = 1 if sys.platform == "darwin" else 1024
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * _MAXRSS_UNIT / MB
+
+
+def row_count(obj: Any):
+    """Rows of a frame/series/array, {key: rows} for a dict of them, None for anything else."""
+    if isinstance(obj, (pd.DataFrame, pd.Series, np.ndarray)):
+        return len(obj)
+    if isinstance(obj, dict):
+        counts = {key: row_count(value) for key, value in obj.items()}
+        return {key: rows for key, rows in counts.items() if isinstance(rows, int)} or None
+    return None
+
+
+class StageProfiler:
+    """
+    Records wall time, CPU time, peak RSS and rows in/out for each stage it runs.
+    With `trace_memory` it also records the tracemalloc delta/peak (costs ~20% run
+    time), and with `cprofile_dir` it dumps cProfile stats per stage.
+
+    CPU time is the stage thread's own; RSS and tracemalloc figures are process-wide,
+    so they are only attributable to a single stage when stages run serially (--workers 1).
+    """
+
+    def __init__(self, cprofile_dir: Optional[Path] = None, trace_memory: bool = False):
+        self.cprofile_dir = cprofile_dir
+        self.trace_memory = trace_memory
+        self.records: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        if cprofile_dir is not None:
+            cprofile_dir.mkdir(parents=True, exist_ok=True)
+        self._owns_tracing = trace_memory and not tracemalloc.is_tracing()
+        if self._owns_tracing:
+            tracemalloc.start()
+
+    def call(self, name: str, fn: Callable[..., Any], *args, inputs: Optional[List[str]] = None):
+        """Runs fn(*args) and records it as stage `name`; `inputs` names the args for rows_in."""
+        rss_before = peak_rss_mb()
+        if self.trace_memory:
+            traced_before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+        profiler = cProfile.Profile() if self.cprofile_dir is not None else None
+        wall, cpu = time.perf_counter(), time.thread_time()
+        if profiler is not None:
+            profiler.enable()
+        try:
+            result = fn(*args)
+        finally:
+            if profiler is not None:
+                profiler.disable()
+        cpu, wall = time.thread_time() - cpu, time.perf_counter() - wall
+        if self.trace_memory:
+            traced_after, traced_peak = tracemalloc.get_traced_memory()
+        rss_after = peak_rss_mb()
+
+        if profiler is not None:
+            profiler.dump_stats(self.cprofile_dir / (re.sub(r"[^\w.-]", "_", name) + ".prof"))
+        names = inputs or [f"arg{i}" for i in range(len(args))]
+        record = {
+            "stage": name,
+            "wall_seconds": round(wall, 6),
+            "cpu_seconds": round(cpu, 6),
+            "peak_rss_mb": round(rss_after, 1),
+            "peak_rss_growth_mb": round(rss_after - rss_before, 1),
+            "tracemalloc_delta_mb": round((traced_after - traced_before) / MB, 3) if self.trace_memory else None,
+            "tracemalloc_peak_mb": round((traced_peak - traced_before) / MB, 3) if self.trace_memory else None,
+            "rows_in": {arg: row_count(value) for arg, value in zip(names, args)},
+            "rows_out": row_count(result),
+        }
+        with self._lock:
+            self.records.append(record)
+        return result
+
+    def wrap(self, stages: Stages) -> Stages:
+        """The same stage graph with every stage run through call()."""
+        return {
+            name: (lambda *args, name=name, fn=fn, deps=deps: self.call(name, fn, *args, inputs=deps), deps)
+            for name, (fn, deps) in stages.items()
+        }
+
+    def report(self, **run_info) -> Dict[str, Any]:
+        return {
+            **run_info,
+            "total_wall_seconds": round(time.perf_counter() - self._started, 6),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "stages": self.records,
+        }
+
+    def write(self, path: Path, **run_info):
+        """Writes the report as JSON and stops tracemalloc if this profiler started it."""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(self.report(**run_info), f, indent=2)
+        if self._owns_tracing:
+            tracemalloc.stop()
+        logger.info(f"Stage profile written to {path}")
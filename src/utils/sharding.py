@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, List, Tuple
+from src.etl.event_index import build_event_index
+from src.etl.customers import attach_customer_keys
+from src.funnel.engine import funnel_counts, funnel_from_counts
+from src.journey.classifier import classify_journey_stages
+from src.segmentation.engine import create_segments
+from src.analytics.churn import score_customers
+from src.analytics.support import ticket_features
+from src.analytics.kpis import kpi_partials, merge_kpi_partials, kpis_from_partials
+from src.utils.writers import write_table
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+SHARDED_TABLES = ["users", "events", "subscriptions", "revenue", "support_tickets"]
+
+
+def shard_ids(customer_id: pd.Series, n_shards: int) -> np.ndarray:
+    """
+    Stable shard number per row. pandas' hash_array uses a fixed key, so a customer
+    lands in the same shard in every process and every run.
+    """
+    values = np.asarray(customer_id.astype(object))
+    return (pd.util.hash_array(values, categorize=True) % np.uint64(n_shards)).astype(np.int64)
+
+
+def partition_by_customer(data: Dict[str, Any], n_shards: int) -> List[Dict[str, pd.DataFrame]]:
+    """Hash-partitions every table by customer_id; shard i holds all rows of its customers."""
+    shards = [{} for _ in range(n_shards)]
+    for table in SHARDED_TABLES:
+        df = data.get(table)
+        if df is None:
+            continue
+        rows = shard_ids(df["customer_id"], n_shards)
+        order = np.argsort(rows, kind="stable")
+        bounds = np.searchsorted(rows[order], np.arange(n_shards + 1))
+        for i in range(n_shards):
+            shards[i][table] = df.iloc[order[bounds[i]:bounds[i + 1]]].reset_index(drop=True)
+    return shards
+
+
+def part_path(directory: Path, shard: int, fmt: str = "csv") -> Path:
+    return Path(directory) / f"part-{shard:05d}.{fmt}"
+
+
+def run_shard(shard: int, tables: Dict[str, pd.DataFrame], journey_dir: Path, segments_dir: Path,
+              fmt: str = "csv", churn_dir: Path = None) -> Tuple[Dict, Dict]:
+    """
+    Runs the per-customer chain for one shard, writes its journey/segment (and, with
+    `churn_dir`, churn score) rows straight to part files and returns the additive
+    funnel and KPI partials. Customers are re-keyed to the shard's own dense customer
+    dimension first.
+    """
+    tables = attach_customer_keys(tables)
+    users, events, subs = tables["users"], tables["events"], tables["subscriptions"]
+    event_index = build_event_index(events, len(users))
+    journey_df = classify_journey_stages(users, events, subs, event_index)
+    write_table(journey_df, part_path(journey_dir, shard, fmt), fmt)
+    tickets = tables.get("support_tickets")
+    support = None if tickets is None else ticket_features(users, tickets)
+    segments_df = create_segments(journey_df, tables["revenue"], support=support)
+    write_table(segments_df, part_path(segments_dir, shard, fmt), fmt)
+    churn = score_customers(users, event_index, tables["revenue"], tickets)
+    if churn_dir is not None and churn is not None:
+        write_table(churn, part_path(churn_dir, shard, fmt), fmt)
+    return funnel_counts(users, subs, event_index), kpi_partials(users, segments_df, subs, event_index, churn)
+
+
+def run_sharded(data: Dict[str, Any], n_shards: int, journey_dir: Path, segments_dir: Path,
+                processes: int = None, fmt: str = "csv",
+                churn_dir: Path = None) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Sharded execution: partitions inputs by customer_id, runs run_shard() in a process
+    pool, then merges the shard partials into the global funnel metrics and KPIs.
+    Journey and segmentation (and churn score) rows are left in per-shard part files in `fmt`.
+    """
+    for directory in [d for d in (journey_dir, segments_dir, churn_dir) if d is not None]:
+        Path(directory).mkdir(parents=True, exist_ok=True)
+        for stale in Path(directory).glob("part-*"):
+            stale.unlink()
+
+    shards = partition_by_customer(data, n_shards)
+    logger.info(f"Running {n_shards} shards on {processes or n_shards} processes...")
+    with ProcessPoolExecutor(max_workers=processes or n_shards) as pool:
+        futures = [pool.submit(run_shard, i, tables, journey_dir, segments_dir, fmt, churn_dir)
+                   for i, tables in enumerate(shards)]
+        partials = [f.result() for f in futures]
+
+    counts = {key: sum(p[0][key] for p in partials) for key in partials[0][0]}
+    kpis = kpis_from_partials(merge_kpi_partials(*[p[1] for p in partials]))
+    return funnel_from_counts(counts), kpis
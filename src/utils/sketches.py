@@ -0,0 +1,248 @@
+"""
+Mergeable, serializable sketches for very large streams:
+- HyperLogLog: approximate distinct counts (relative standard error 1.04 / sqrt(2^p))
+- QuantileSketch: DDSketch-style quantiles with a bounded relative error, plus the
+  exact count / sum / min / max
+Both are built from whole arrays at once and merge elementwise, so sketches of chunks,
+shards or days combine into the sketch of their union.
+"""
+import base64
+import zlib
+from typing import Any, Dict, List, Optional
+import numpy as np
+import pandas as pd
+from src.utils.config import SKETCH_PRECISION, SKETCH_RELATIVE_ACCURACY
+
+HASH_BITS = 64
+
+
+def hash_values(values) -> np.ndarray:
+    """
+    Stable 64-bit hash per value (pandas' fixed-key hash_array, the same in every process
+    and run). Categoricals are hashed once per category.
+    """
+    if isinstance(values, pd.Series):
+        values = values.array
+    if isinstance(values, pd.Categorical):
+        hashed = pd.util.hash_array(np.asarray(values.categories.astype(object)))
+        codes = values.codes
+        return hashed[codes[codes >= 0]]
+    values = np.asarray(values, dtype=object)
+    return pd.util.hash_array(values[pd.notna(values)])
+
+
+def _bit_length(values: np.ndarray) -> np.ndarray:
+    """Bit length of uint64 values, from frexp on 32-bit halves (exact in float64)."""
+    high = (values >> np.uint64(32)).astype(np.float64)
+    low = (values & np.uint64(0xFFFFFFFF)).astype(np.float64)
+    return np.where(high > 0, np.frexp(high)[1] + 32, np.frexp(low)[1])
+
+
+def _register_ranks(hashes: np.ndarray, p: int):
+    """HyperLogLog register (top p bits) and rank (leading zeros of the other bits + 1) per hash."""
+    hashes = np.asarray(hashes, dtype=np.uint64)
+    index = (hashes >> np.uint64(HASH_BITS - p)).astype(np.intp)
+    rest = hashes & np.uint64((1 << (HASH_BITS - p)) - 1)
+    return index, (HASH_BITS - p + 1 - _bit_length(rest)).astype(np.uint8)
+
+
+def _encode(array: np.ndarray) -> str:
+    return base64.b64encode(zlib.compress(array.tobytes())).decode("ascii")
+
+
+def _decode(text: str, dtype) -> np.ndarray:
+    return np.frombuffer(zlib.decompress(base64.b64decode(text)), dtype=dtype).copy()
+
+
+class HyperLogLog:
+    """
+    HyperLogLog distinct counter with 2^p one-byte registers. The estimate has a
+    relative standard error of 1.04 / sqrt(2^p) (1.6% at p=12, 0.8% at p=14); small
+    cardinalities fall back to linear counting (about 1% error at a few hundred).
+    """
+
+    def __init__(self, p: int = SKETCH_PRECISION, registers: Optional[np.ndarray] = None):
+        if not 4 <= p <= 18:
+            raise ValueError(f"HyperLogLog precision must be in [4, 18], got {p}")
+        self.p = p
+        self.registers = np.zeros(1 << p, dtype=np.uint8) if registers is None else registers
+
+    @property
+    def relative_error(self) -> float:
+        return 1.04 / np.sqrt(len(self.registers))
+
+    def add_hashes(self, hashes: np.ndarray) -> "HyperLogLog":
+        """Adds 64-bit hashes: the top p bits pick the register, the rest give the rank."""
+        index, rank = _register_ranks(hashes, self.p)
+        np.maximum.at(self.registers, index, rank)
+        return self
+
+    def add(self, values) -> "HyperLogLog":
+        return self.add_hashes(hash_values(values))
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        if other.p != self.p:
+            raise ValueError(f"Cannot merge HyperLogLog sketches of precision {self.p} and {other.p}")
+        np.maximum(self.registers, other.registers, out=self.registers)
+        return self
+
+    def copy(self) -> "HyperLogLog":
+        return HyperLogLog(self.p, self.registers.copy())
+
+    def estimate(self) -> float:
+        m = len(self.registers)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.ldexp(1.0, -self.registers.astype(np.int64)).sum()
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return m * np.log(m / zeros)
+        return float(raw)
+
+    def count(self) -> int:
+        return int(round(self.estimate()))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": "hll", "p": self.p, "registers": _encode(self.registers)}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "HyperLogLog":
+        return cls(d["p"], _decode(d["registers"], np.uint8))
+
+
+def grouped_hyperloglogs(groups: np.ndarray, n_groups: int, hashes: np.ndarray,
+                         p: int = SKETCH_PRECISION) -> List[HyperLogLog]:
+    """One HyperLogLog per group code 0..n_groups-1 over its rows' hashes, in a single scatter-max."""
+    index, rank = _register_ranks(hashes, p)
+    registers = np.zeros((n_groups, 1 << p), dtype=np.uint8)
+    np.maximum.at(registers.reshape(-1), np.asarray(groups, dtype=np.intp) * (1 << p) + index, rank)
+    return [HyperLogLog(p, row.copy()) for row in registers]
+
+
+class _Bins:
+    """Dense bucket counts for bucket indexes offset .. offset + len(counts) - 1."""
+
+    def __init__(self, offset: int = 0, counts: Optional[np.ndarray] = None):
+        self.offset = offset
+        self.counts = np.zeros(0, dtype=np.int64) if counts is None else counts
+
+    def add(self, index: np.ndarray):
+        if not len(index):
+            return
+        low = int(index.min())
+        self.add_dense(low, np.bincount(index - low).astype(np.int64))
+
+    def add_dense(self, offset: int, counts: np.ndarray):
+        if not len(counts):
+            return
+        if not len(self.counts):
+            self.offset, self.counts = offset, counts.copy()
+            return
+        low = min(self.offset, offset)
+        high = max(self.offset + len(self.counts), offset + len(counts))
+        merged = np.zeros(high - low, dtype=np.int64)
+        merged[self.offset - low:self.offset - low + len(self.counts)] += self.counts
+        merged[offset - low:offset - low + len(counts)] += counts
+        self.offset, self.counts = low, merged
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"offset": self.offset, "counts": _encode(self.counts)}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "_Bins":
+        return cls(d["offset"], _decode(d["counts"], np.int64))
+
+
+class QuantileSketch:
+    """
+    DDSketch quantiles: value x > 0 falls in bucket ceil(log_gamma(x)) with
+    gamma = (1 + a) / (1 - a), so every reported quantile is within relative error `a`
+    (relative_accuracy) of the exact order statistic at rank floor(q * (count - 1)).
+    Negative values use a mirrored set of buckets; |x| below `min_value` counts as 0.
+    Buckets grow with log(max / min), not with the number of values. count, sum, min
+    and max are exact, so mean() is too.
+    """
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY, min_value: float = 1e-9):
+        if not 0 < relative_accuracy < 1:
+            raise ValueError(f"relative_accuracy must be in (0, 1), got {relative_accuracy}")
+        self.relative_accuracy = relative_accuracy
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.positive, self.negative = _Bins(), _Bins()
+        self.zero_count = self.count = 0
+        self.sum = 0.0
+        self.min, self.max = np.inf, -np.inf
+
+    def _bucket(self, magnitude: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(magnitude) / self._log_gamma).astype(np.int64)
+
+    def _value(self, bucket: int) -> float:
+        return 2 * self.gamma ** bucket / (self.gamma + 1)
+
+    def add(self, values) -> "QuantileSketch":
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        if not len(values):
+            return self
+        positive, negative = values > self.min_value, values < -self.min_value
+        self.positive.add(self._bucket(values[positive]))
+        self.negative.add(self._bucket(-values[negative]))
+        self.zero_count += int(len(values) - positive.sum() - negative.sum())
+        self.count += len(values)
+        self.sum += float(values.sum())
+        self.min, self.max = min(self.min, float(values.min())), max(self.max, float(values.max()))
+        return self
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        if other.relative_accuracy != self.relative_accuracy or other.min_value != self.min_value:
+            raise ValueError("Cannot merge QuantileSketches with different relative_accuracy / min_value")
+        self.positive.add_dense(other.positive.offset, other.positive.counts)
+        self.negative.add_dense(other.negative.offset, other.negative.counts)
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min, self.max = min(self.min, other.min), max(self.max, other.max)
+        return self
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Approximate q-quantile (None when empty), clamped to the exact min / max."""
+        if not self.count:
+            return None
+        rank = int(np.floor(q * (self.count - 1)))
+        negative = int(self.negative.counts.sum())
+        if rank < negative:
+            # Ascending values run through the negative buckets from the largest magnitude down
+            counts = self.negative.counts[::-1]
+            position = int(np.searchsorted(np.cumsum(counts), rank, side="right"))
+            value = -self._value(self.negative.offset + len(counts) - 1 - position)
+        elif rank < negative + self.zero_count:
+            value = 0.0
+        else:
+            cumulative = np.cumsum(self.positive.counts)
+            position = int(np.searchsorted(cumulative, rank - negative - self.zero_count, side="right"))
+            value = self._value(self.positive.offset + position)
+        return float(min(max(value, self.min), self.max))
+
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"type": "ddsketch", "relative_accuracy": self.relative_accuracy, "min_value": self.min_value,
+                "count": self.count, "sum": self.sum, "zero_count": self.zero_count,
+                "min": self.min if self.count else None, "max": self.max if self.count else None,
+                "positive": self.positive.to_dict(), "negative": self.negative.to_dict()}
+
+    @classmethod
+    def from_dict(cls, d: Dict[str, Any]) -> "QuantileSketch":
+        sketch = cls(d["relative_accuracy"], d["min_value"])
+        sketch.count, sketch.sum, sketch.zero_count = d["count"], d["sum"], d["zero_count"]
+        if d["count"]:
+            sketch.min, sketch.max = d["min"], d["max"]
+        sketch.positive, sketch.negative = _Bins.from_dict(d["positive"]), _Bins.from_dict(d["negative"])
+        return sketch
+
+
+def sketch_from_dict(d: Dict[str, Any]):
+    """HyperLogLog or QuantileSketch from its to_dict() form."""
+    return {"hll": HyperLogLog, "ddsketch": QuantileSketch}[d["type"]].from_dict(d)
@@ -0,0 +1,63 @@
+import numpy as np
+import pandas as pd
+
+HOUR_NS = 3_600 * 10**9
+DAY_NS = 24 * HOUR_NS
+
+
+def floor_days(ts) -> np.ndarray:
+    """Day number (days since 1970-01-01) containing each timestamp; NaT must be masked by the caller."""
+    return np.floor_divide(np.asarray(ts, dtype="datetime64[ns]").view(np.int64), DAY_NS)
+
+
+def ceil_days(ts) -> np.ndarray:
+    """
+    First midnight at or after each timestamp, as a day number. For a midnight `today`,
+    (today - ts).days == today_day - ceil_days(ts), matching Timedelta.days flooring.
+    """
+    return -np.floor_divide(-np.asarray(ts, dtype="datetime64[ns]").view(np.int64), DAY_NS)
+
+
+class Timeline:
+    """
+    Items (events, subscription starts, ...) of `n_keys` customers sorted by (key, day),
+    with an optional tiebreak, flattened to one int64 composite key = key * span + day.
+    Per-customer "as of day D" lookups for many customers and days are then a single
+    np.searchsorted over the composite keys instead of a filter per day.
+    """
+
+    def __init__(self, keys: np.ndarray, days: np.ndarray, n_keys: int, first_day: int, last_day: int,
+                 tiebreak: np.ndarray = None):
+        keys, days = np.asarray(keys, dtype=np.int64), np.asarray(days, dtype=np.int64)
+        # Days outside [first_day, last_day] only matter as "before" / "after" the queried range
+        self.first_day = first_day - 1
+        self.span = last_day - self.first_day + 2
+        days = np.clip(days - self.first_day, 0, self.span - 1)
+        self.order = np.lexsort((tiebreak, days, keys) if tiebreak is not None else (days, keys))
+        self.composite = keys[self.order] * self.span + days[self.order]
+        # Position of each customer's first item
+        self.starts = np.searchsorted(self.composite, np.arange(n_keys, dtype=np.int64) * self.span)
+
+    def _positions(self, keys: np.ndarray, days: np.ndarray) -> np.ndarray:
+        query = np.asarray(keys, dtype=np.int64) * self.span + (np.asarray(days, dtype=np.int64) - self.first_day)
+        return np.searchsorted(self.composite, query, side="right")
+
+    def count_through(self, keys: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """Items of customer keys[i] dated on or before days[i] (arrays broadcast together)."""
+        return self._positions(keys, days) - self.starts[keys]
+
+    def last_through(self, keys: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """
+        Original row of the last item (in (day, tiebreak) order) of keys[i] dated on or
+        before days[i], or -1 when there is none.
+        """
+        position = self._positions(keys, days)
+        if not len(self.order):
+            return np.full(position.shape, -1)
+        found = position > self.starts[keys]
+        return np.where(found, self.order[np.maximum(position - 1, 0)], -1)
+
+
+def day_range(start, end, freq: str = "D") -> pd.DatetimeIndex:
+    """Midnight-normalized snapshot dates from `start` to `end` inclusive."""
+    return pd.date_range(pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize(), freq=freq)
@@ -0,0 +1,155 @@
+import gzip
+import io
+import os
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+from urllib.parse import quote
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from src.utils.config import OUTPUT_ROW_GROUP_ROWS
+from src.utils.logger import get_logger
+
+logger = get_logger(__name__)
+
+# Formats for tabular outputs; JSON outputs are always written as JSON
+FORMATS = ["csv", "csv.gz", "parquet"]
+GZIP_LEVEL = 6
+# Hive convention for rows whose partition value is missing
+NULL_PARTITION = "__HIVE_DEFAULT_PARTITION__"
+
+# Frame -> partition label per row; the series name becomes the directory key
+# (name=value/) and a column of the same name is dropped from the files
+Partitioner = Callable[[pd.DataFrame], pd.Series]
+
+
+def output_path(path: Path, fmt: str) -> Path:
+    """`path` of a .csv output with the extension of `fmt`."""
+    return Path(path).with_suffix("." + fmt)
+
+
+def _sibling(path: Path, tag: str) -> Path:
+    # Unique per writer thread, in the target's directory so the final rename stays on one filesystem
+    return path.with_name(f".{path.name}.{os.getpid()}-{threading.get_ident()}.{tag}")
+
+
+@contextmanager
+def atomic_path(path: Path) -> Iterator[Path]:
+    """
+    Yields a temporary file next to `path` that replaces `path` in one rename once the
+    block succeeds; on error it is removed and `path` keeps its previous contents.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = _sibling(path, "tmp")
+    try:
+        yield tmp
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+
+
+@contextmanager
+def atomic_dir(path: Path) -> Iterator[Path]:
+    """
+    atomic_path for a directory: readers see either the previous directory or the
+    complete new one (the old one is swapped out and deleted after the rename).
+    """
+    path = Path(path)
+    tmp, old = _sibling(path, "tmp"), _sibling(path, "old")
+    shutil.rmtree(tmp, ignore_errors=True)
+    tmp.mkdir(parents=True)
+    try:
+        yield tmp
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    if path.exists():
+        os.replace(path, old)
+    os.replace(tmp, path)
+    if old.is_dir():
+        shutil.rmtree(old)
+    else:
+        old.unlink(missing_ok=True)
+
+
+def write_text(path: Path, write: Callable[[io.TextIOBase], None], compress: bool = False):
+    """
+    Atomically writes what write(handle) emits to a text handle, gzip-compressed when
+    `compress` (no file name or timestamp in the header, so equal text gives equal bytes).
+    """
+    with atomic_path(path) as tmp:
+        if not compress:
+            with open(tmp, "w", newline="") as f:
+                write(f)
+            return
+        with open(tmp, "wb") as raw, \
+                gzip.GzipFile(filename="", mode="wb", fileobj=raw, mtime=0, compresslevel=GZIP_LEVEL) as gz, \
+                io.TextIOWrapper(gz, encoding="utf-8", newline="") as f:
+            write(f)
+
+
+def _stream_parquet(df: pd.DataFrame, positions: np.ndarray, path: Path, schema: pa.Schema, row_group_rows: int):
+    """Writes the rows of `df` at `positions` to `path`, converting one row group at a time."""
+    with pq.ParquetWriter(path, schema) as writer:
+        for start in range(0, len(positions), row_group_rows):
+            chunk = df.iloc[positions[start:start + row_group_rows]]
+            writer.write_table(pa.Table.from_pandas(chunk, schema=schema, preserve_index=False),
+                               row_group_size=row_group_rows)
+
+
+def write_parquet(df: pd.DataFrame, path: Path, partition_by: Optional[Partitioner] = None,
+                  row_group_rows: int = OUTPUT_ROW_GROUP_ROWS):
+    """
+    Writes `df` as one Parquet file, or with `partition_by` as a hive-style dataset
+    directory (path/<key>=<value>/part-00000.parquet, readable with pd.read_parquet(path)).
+    Only one row group of Arrow data is materialized at a time.
+    """
+    if partition_by is None:
+        with atomic_path(path) as tmp:
+            _stream_parquet(df, np.arange(len(df)), tmp, pa.Schema.from_pandas(df, preserve_index=False),
+                            row_group_rows)
+        return
+    labels = partition_by(df)
+    data = df.drop(columns=[labels.name]) if labels.name in df.columns else df
+    schema = pa.Schema.from_pandas(data, preserve_index=False)
+    codes, values = pd.factorize(labels, sort=True)
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(-1, len(values) + 1))
+    with atomic_dir(path) as tmp:
+        for code in range(-1, len(values)):
+            positions = order[bounds[code + 1]:bounds[code + 2]]
+            if not len(positions):
+                continue
+            value = NULL_PARTITION if code < 0 else quote(str(values[code]), safe="")
+            directory = tmp / f"{labels.name}={value}"
+            directory.mkdir()
+            _stream_parquet(data, positions, directory / "part-00000.parquet", schema, row_group_rows)
+
+
+def write_table(df: pd.DataFrame, path: Path, fmt: str = "csv", partition_by: Optional[Partitioner] = None):
+    """
+    Writes a tabular output atomically in `fmt` ("csv", "csv.gz" or "parquet").
+    `partition_by` only applies to Parquet. DataFrame.to_csv already formats and writes
+    rows in chunks, so neither CSV flavour holds the whole serialized file in memory.
+    """
+    if fmt == "parquet":
+        write_parquet(df, path, partition_by)
+    elif fmt in ("csv", "csv.gz"):
+        write_text(path, lambda f: df.to_csv(f, index=False), compress=fmt == "csv.gz")
+    else:
+        raise ValueError(f"Unknown output format {fmt!r}; expected one of {FORMATS}")
+    logger.info(f"Wrote {len(df)} rows to {Path(path).name}")
+
+
+def month_partition(column: str, name: str) -> Partitioner:
+    """Partitioner labelling rows by the YYYY-MM of a datetime column."""
+    def labels(df: pd.DataFrame) -> pd.Series:
+        # Format each distinct month once
+        codes, months = pd.factorize(df[column].dt.to_period("M"), sort=True)
+        return pd.Series(pd.Categorical.from_codes(codes, months.astype(str)), index=df.index, name=name)
+    return labels
@@ -0,0 +1,30 @@
+"""Helpers shared by several test modules."""
+import pandas as pd
+
+
+def split_csv(source, target, n_rows):
+    """Writes the header and first `n_rows` rows of `source` to `target`; returns the remaining lines."""
+    lines = source.read_text().splitlines(keepends=True)
+    target.write_text("".join(lines[:n_rows + 1]))
+    return lines[n_rows + 1:]
+
+
+def make_stage_data():
+    """Four customers whose journey stages change over Jan-Mar 2025 (X's event has no user)."""
+    users = pd.DataFrame({
+        "customer_id": ["A", "B", "C", "D"],
+        "signup_date": pd.to_datetime(["2025-01-01", "2025-01-05", "2025-02-20", None]),
+    })
+    events = pd.DataFrame({
+        "customer_id": ["A", "A", "B", "B", "D", "X"],
+        "event_name": ["activate", "login", "login", "activate", "activate", "activate"],
+        "event_timestamp": pd.to_datetime(["2025-01-02 10:00", "2025-02-10 00:00", "2025-01-06 00:00",
+                                           "2025-03-01 23:59", "2025-01-10 00:00", "2025-01-01 00:00"]),
+    })
+    subs = pd.DataFrame({
+        "customer_id": ["A", "C"],
+        "start_date": pd.to_datetime(["2025-01-20", "2025-02-25"]),
+        "end_date": pd.to_datetime(["2025-02-15", None]),
+        "status": ["cancelled", "active"],
+    })
+    return users, events, subs
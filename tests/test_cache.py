@@ -0,0 +1,49 @@
+import os
+import pandas as pd
+from src.etl.cache import load_cached
+
+
+def make_loader(path, calls):
+    def parse():
+        calls.append(path)
+        return pd.read_csv(path, parse_dates=["event_timestamp"])
+    return parse
+
+
+def write_events(path, names):
+    pd.DataFrame({
+        "event_id": [f"E{i}" for i in range(len(names))],
+        "customer_id": ["C1"] * len(names),
+        "event_name": names,
+        "event_timestamp": ["2025-01-01 10:00:00"] * len(names),
+    }).to_csv(path, index=False)
+
+
+def test_cache_hit_invalidation_and_rebuild(tmp_path):
+    source = tmp_path / "events.csv"
+    cache_dir = tmp_path / "cache"
+    calls = []
+    parse = make_loader(source, calls)
+    write_events(source, ["signup", "activate"])
+
+    cold = load_cached("events", source, parse, cache_dir=cache_dir)
+    warm = load_cached("events", source, parse, cache_dir=cache_dir)
+    assert len(calls) == 1
+    pd.testing.assert_frame_equal(cold, warm)
+    assert isinstance(warm["customer_id"].dtype, pd.CategoricalDtype)
+    assert warm["event_timestamp"].dtype == "datetime64[ns]"
+
+    # Same content, new mtime: still a hit
+    stat = source.stat()
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    load_cached("events", source, parse, cache_dir=cache_dir)
+    assert len(calls) == 1
+
+    # Changed content: rebuilt automatically
+    write_events(source, ["signup", "activate", "upgrade"])
+    assert len(load_cached("events", source, parse, cache_dir=cache_dir)) == 3
+    assert len(calls) == 2
+
+    # Forced rebuild
+    load_cached("events", source, parse, rebuild=True, cache_dir=cache_dir)
+    assert len(calls) == 3
@@ -0,0 +1,185 @@
+import io
+import json
+import numpy as np
+import pandas as pd
+import pytest
+import run_pipeline
+from src.analytics import churn as churn_module
+from src.analytics.churn import (
+    FEATURES, TICKET_FEATURES, ChurnModel, churn_features, fit_churn_model, fit_logistic, load_churn_model, score_customers,
+)
+from src.analytics.kpis import calculate_kpis, kpi_partials, kpis_from_partials, merge_kpi_partials
+from src.etl.event_index import build_event_index
+from src.etl.loader import load_data
+from src.utils.config import CHURN_SCORES_FILE, METRICS_FILE
+
+AS_OF = pd.Timestamp("2025-03-01")
+
+
+def make_data():
+    users = pd.DataFrame({
+        "customer_id": ["A", "B", "C"],
+        "signup_date": pd.to_datetime(["2025-01-01", "2025-02-01", None]),
+    })
+    events = pd.DataFrame({
+        "customer_id": ["A", "A", "A", "C", "Z"],
+        "event_name": ["signup", "login", "login", "login", "login"],
+        "event_timestamp": pd.to_datetime(["2025-01-01 09:00", "2025-02-10 12:00", "2025-02-27 23:00",
+                                           "2025-02-20 08:00", "2025-02-20 08:00"]),
+    })
+    revenue = pd.DataFrame({
+        "customer_id": ["A", "A", "B", "Z"],
+        "amount": [100, 50, 30, 999],
+        "revenue_date": pd.to_datetime(["2025-01-05", "2025-03-05", "2025-02-01", "2025-02-01"]),
+    })
+    tickets = pd.DataFrame({
+        # A: 2 resolved (10h, 20h) and one still open as of AS_OF; Z: unknown customer
+        "customer_id": ["A", "A", "A", "Z", "B"],
+        "created_at": pd.to_datetime(["2025-01-02", "2025-01-03", "2025-02-28", "2025-01-02", "2025-03-02"]),
+        "resolved_at": pd.to_datetime(["2025-01-02 10:00", "2025-01-03 20:00", "2025-03-02 00:00", "2025-01-03 00:00",
+                                       None]),
+    })
+    return users, events, revenue, tickets
+
+
+def test_features_are_point_in_time():
+    users, events, revenue, tickets = make_data()
+    features = churn_features(users, build_event_index(events), revenue, tickets, as_of=AS_OF)
+    assert list(features.columns) == FEATURES
+    expected = pd.DataFrame({
+        "recency_days": [1.0, 28.0, 8.0],        # B has no events: days since signup
+        "frequency": [3.0, 0.0, 1.0],
+        "tenure_days": [59.0, 28.0, 0.0],        # unknown signup date -> 0
+        "revenue": [100.0, 30.0, 0.0],           # A's March invoice is after AS_OF
+        "tickets": [3.0, 0.0, 0.0],              # B's ticket is after AS_OF
+        "resolution_hours": [15.0, 0.0, 0.0],     # median of 10h and 20h; the third is resolved after AS_OF
+    })
+    pd.testing.assert_frame_equal(features, expected)
+    # No support tickets: no ticket features, rather than zeros
+    without = churn_features(users, build_event_index(events), revenue, None, as_of=AS_OF)
+    pd.testing.assert_frame_equal(without, expected.drop(columns=TICKET_FEATURES))
+
+
+def test_score_matches_logistic_formula_and_is_batch_independent():
+    rng = np.random.default_rng(0)
+    model = ChurnModel(rng.normal(size=6), 0.3, rng.normal(size=6), rng.uniform(0.5, 2, 6))
+    features = pd.DataFrame(rng.uniform(0, 100, (1000, 6)), columns=FEATURES)
+    X = model.transform(features)
+    expected = 1 / (1 + np.exp(-(model.intercept + ((X - model.mean) / model.scale) @ model.coef)))
+    scores = model.score(features)
+    np.testing.assert_allclose(scores, expected, rtol=1e-12)
+    np.testing.assert_array_equal(model.score(features.to_numpy()), scores)
+    np.testing.assert_array_equal(model.score(features.iloc[100:300]), scores[100:300])
+
+
+def test_fit_logistic_recovers_coefficients():
+    rng = np.random.default_rng(1)
+    X = rng.normal(size=(20_000, 3))
+    y = (rng.random(20_000) < 1 / (1 + np.exp(-(0.5 + X @ np.array([1.0, -2.0, 0.0]))))).astype(float)
+    coef, intercept = fit_logistic(X, y, l2=0.0)
+    np.testing.assert_allclose(coef, [1.0, -2.0, 0.0], atol=0.1)
+    assert intercept == pytest.approx(0.5, abs=0.1)
+
+
+def test_fit_save_load_round_trip(tmp_path):
+    users, events, revenue, tickets = make_data()
+    # Signed up before the cutoff: A (events after it, retained) and B (none, churned)
+    model = fit_churn_model(users, events, revenue, tickets, as_of=AS_OF, horizon_days=20)
+    assert model.metadata["cutoff"] == "2025-02-09" and model.metadata["n_customers"] == 2
+    model.save(tmp_path / "model.json")
+    loaded = load_churn_model(tmp_path / "model.json")
+    features = churn_features(users, build_event_index(events), revenue, tickets, as_of=AS_OF)
+    np.testing.assert_array_equal(loaded.score(features), model.score(features))
+    assert fit_churn_model(users, events, revenue, None, as_of=AS_OF, horizon_days=20).features == [
+        name for name in FEATURES if name not in TICKET_FEATURES]
+    with pytest.raises(FileNotFoundError):
+        load_churn_model(tmp_path / "missing.json")
+
+
+def make_history(n=4000, seed=5):
+    """
+    Customers observed up to a cutoff 30 days before AS_OF: engaged ones (frequent,
+    recent, paying) mostly stay active after it, the others mostly churn.
+    """
+    rng = np.random.default_rng(seed)
+    cutoff = AS_OF - pd.Timedelta(days=30)
+    ids = [f"C{i}" for i in range(n)]
+    engaged = rng.random(n) < 0.5
+    users = pd.DataFrame({"customer_id": ids,
+                          "signup_date": cutoff - pd.to_timedelta(rng.integers(60, 400, n), unit="D")})
+    n_events = np.where(engaged, rng.poisson(8, n), rng.poisson(1, n)) + 1
+    owner = np.repeat(np.arange(n), n_events)
+    span = np.where(engaged, 20, 200)[owner]
+    before = cutoff - pd.to_timedelta(rng.integers(1, span + 1) * 86_400, unit="s")
+    stays = rng.random(n) < np.where(engaged, 0.85, 0.15)
+    after = cutoff + pd.to_timedelta(rng.integers(0, 29 * 86_400, int(stays.sum())), unit="s")
+    events = pd.DataFrame({"customer_id": np.concatenate([np.array(ids)[owner], np.array(ids)[stays]]),
+                           "event_name": "login", "event_timestamp": np.concatenate([before, after])})
+    paying = np.flatnonzero(engaged | (rng.random(n) < 0.1))
+    revenue = pd.DataFrame({"customer_id": np.array(ids)[paying], "amount": rng.choice([49.0, 199.0], len(paying)),
+                            "revenue_date": cutoff - pd.Timedelta(days=40)})
+    return users, events, revenue
+
+
+def test_fit_gives_sensible_signs_and_scores():
+    users, events, revenue = make_history()
+    model = fit_churn_model(users, events, revenue, as_of=AS_OF)
+    coef = dict(zip(model.features, model.coef))
+    # Churn risk rises with recency and falls with activity and spend
+    assert coef["recency_days"] > 0 and coef["frequency"] < 0 and coef["revenue"] < 0
+    features = churn_features(users, build_event_index(events[events["event_timestamp"] < AS_OF]), revenue,
+                              as_of=AS_OF)
+    scores = model.score(features)
+    assert ((scores > 0) & (scores < 1)).all()
+    # Scores spread over the range, and the mean training score is close to the churn rate
+    assert scores.min() < 0.3 and scores.max() > 0.7
+    train, y, _, _ = churn_module.training_set(users, events, revenue, as_of=AS_OF)
+    assert model.score(train).mean() == pytest.approx(y.mean(), abs=0.02)
+
+
+def test_no_model_falls_back_to_rule_score(tmp_path, monkeypatch):
+    users, events, revenue, tickets = make_data()
+    monkeypatch.setattr(churn_module, "CHURN_MODEL_FILE", tmp_path / "missing.json")
+    assert score_customers(users, build_event_index(events), revenue, tickets, as_of=AS_OF) is None
+    journey = pd.DataFrame({
+        "lifecycle_segment": ["Active", "Churned", "At-Risk"], "days_since_signup": [59, 28, 0],
+        "is_activated": [True, False, False], "stage": ["Engagement", "Churned", "Acquisition"],
+    })
+    subs = pd.DataFrame({"status": pd.Series([], dtype=object), "price": pd.Series([], dtype=float)})
+    kpis = calculate_kpis(users, events, journey, subs, churn_scores=None)
+    assert kpis["churn_risk_score"] == pytest.approx((0.1 + 1.0 + 0.8) / 3)
+
+
+def test_pipeline_scores_with_a_fitted_model(tmp_path, monkeypatch):
+    data = load_data()
+    args = (data["users"], data["events"], data["subscriptions"], data["revenue"], None)
+    monkeypatch.setattr(churn_module, "CHURN_MODEL_FILE", tmp_path / "missing.json")
+    rule_based = run_pipeline.render_outputs(run_pipeline.compute_outputs(*args))
+    assert CHURN_SCORES_FILE.name not in rule_based
+
+    fit_churn_model(data["users"], data["events"], data["revenue"]).save(tmp_path / "model.json")
+    monkeypatch.setattr(churn_module, "CHURN_MODEL_FILE", tmp_path / "model.json")
+    rendered = run_pipeline.render_outputs(run_pipeline.compute_outputs(*args))
+    scores = pd.read_csv(io.StringIO(rendered[CHURN_SCORES_FILE.name]))
+    assert len(scores) == len(data["users"])
+    kpis = json.loads(rendered[METRICS_FILE.name])
+    assert kpis["churn_risk_score"] == pytest.approx(scores["churn_score"].mean(), abs=1e-6)
+    assert kpis["churn_risk_score"] != json.loads(rule_based[METRICS_FILE.name])["churn_risk_score"]
+
+
+def test_kpis_use_model_scores_exactly_across_partials():
+    users, events, revenue, tickets = make_data()
+    index = build_event_index(events, None)
+    model = fit_churn_model(users, events, revenue, tickets, as_of=AS_OF, horizon_days=20)
+    churn = score_customers(users, index, revenue, tickets, model, as_of=AS_OF)
+    assert churn["churn_score"].between(0, 1).all()
+    journey = pd.DataFrame({
+        "lifecycle_segment": ["Active", "Churned", "New"], "days_since_signup": [59, 28, 0],
+        "is_activated": [True, False, False], "stage": ["Engagement", "Churned", "Acquisition"],
+    })
+    subs = pd.DataFrame({"status": pd.Series([], dtype=object), "price": pd.Series([], dtype=int)})
+    whole = kpi_partials(users, journey, subs, index, churn)
+    halves = merge_kpi_partials(*[kpi_partials(users.iloc[rows], journey.iloc[rows], subs, index, churn.iloc[rows])
+                                  for rows in (slice(0, 1), slice(1, 3))])
+    assert kpis_from_partials(whole)["churn_risk_score"] == kpis_from_partials(halves)["churn_risk_score"]
+    assert kpis_from_partials(whole)["churn_risk_score"] == pytest.approx(churn["churn_score"].mean(), abs=1e-6)
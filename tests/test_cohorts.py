@@ -0,0 +1,31 @@
+import pandas as pd
+import pytest
+from benchmarks.reference import REFERENCE_FREQ, reference_matrix
+from src.etl.loader import load_data
+from src.cohorts.engine import compute_cohort_retention
+from src.utils.config import COHORT_MATRIX_FILE, COHORT_MAX_PERIODS
+
+
+def test_monthly_matrix_reproduces_shipped_output():
+    data = load_data()
+    matrix = compute_cohort_retention(data["users"], data["events"])
+    assert matrix.to_csv(index=False) == COHORT_MATRIX_FILE.read_text()
+
+
+@pytest.mark.parametrize("grain,freq", REFERENCE_FREQ.items())
+def test_matrix_matches_period_reference(grain, freq):
+    data = load_data()
+    matrix = compute_cohort_retention(data["users"], data["events"], grain, max_periods=5)
+    expected = reference_matrix(data["users"], data["events"], freq, 5)
+    expected = expected.reindex(pd.PeriodIndex(pd.to_datetime(matrix[f"signup_{grain}"]), freq=freq), fill_value=0.0)
+    assert (expected.index.start_time.strftime("%Y-%m-%d") == matrix[f"signup_{grain}"]).all()
+    assert (abs(matrix.iloc[:, 1:].to_numpy() - expected.to_numpy()) < 1e-12).all()
+
+
+def test_default_periods_follow_the_grain():
+    data = load_data()
+    for grain, n_periods in COHORT_MAX_PERIODS.items():
+        matrix = compute_cohort_retention(data["users"], data["events"], grain)
+        assert list(matrix.columns) == [f"signup_{grain}"] + [str(k) for k in range(n_periods)]
+    with pytest.raises(ValueError, match="Unknown cohort grain"):
+        compute_cohort_retention(data["users"], data["events"], "year")
@@ -0,0 +1,58 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.etl.customers import (
+    KEY_COLUMN, attach_customer_keys, build_customer_dimension, encode_customer_ids, fact_keys, per_customer_sum,
+)
+from src.etl.event_index import align_event_index, build_event_index, merge_event_indexes
+from src.etl.loader import load_data
+from src.etl.schema import SchemaError
+
+
+def make_data():
+    users = pd.DataFrame({"customer_id": pd.Categorical(["B", "A", "C"]), "signup_date": pd.to_datetime(["2025-01-01"] * 3)})
+    events = pd.DataFrame({
+        "customer_id": pd.Categorical(["A", "Z", "C", "A", None]),
+        "event_name": ["activate", "login", "login", "login", "login"],
+        "event_timestamp": pd.to_datetime(["2025-01-02", "2025-01-03", "2025-01-04", "2025-01-05", "2025-01-06"]),
+    })
+    revenue = pd.DataFrame({"customer_id": ["C", "A", "C", "Q"], "amount": [10, 20, 5, 99]})
+    return {"users": users, "events": events, "revenue": revenue}
+
+
+def test_keys_follow_users_row_order():
+    keyed = attach_customer_keys(make_data())
+    assert keyed["users"][KEY_COLUMN].tolist() == [0, 1, 2]
+    assert keyed["events"][KEY_COLUMN].tolist() == [1, -1, 2, 1, -1]
+    assert keyed["revenue"][KEY_COLUMN].tolist() == [2, 1, 2, -1]
+    assert keyed["events"][KEY_COLUMN].dtype == np.int32
+    assert per_customer_sum(keyed["revenue"][KEY_COLUMN].to_numpy(), 3, keyed["revenue"]["amount"]).tolist() == [0, 20, 15]
+
+
+def test_unkeyed_frames_are_encoded_on_the_fly():
+    data = make_data()
+    dimension = build_customer_dimension(data["users"])
+    assert list(dimension) == ["B", "A", "C"]
+    assert encode_customer_ids(dimension, data["revenue"]["customer_id"]).tolist() == [2, 1, 2, -1]
+    assert fact_keys(data["users"], data["events"]).tolist() == [1, -1, 2, 1, -1]
+
+
+def test_duplicate_customer_ids_are_rejected():
+    with pytest.raises(SchemaError, match="duplicate"):
+        build_customer_dimension(pd.DataFrame({"customer_id": ["A", "A"]}))
+
+
+def test_dense_event_index_matches_id_keyed_index():
+    keyed = attach_customer_keys(load_data())
+    users, events = keyed["users"], keyed["events"]
+    dense = build_event_index(events, len(users))
+    by_id = align_event_index(build_event_index(events), users)
+    pd.testing.assert_frame_equal(dense["customers"], by_id["customers"])
+    pd.testing.assert_frame_equal(dense["event_counts"], by_id["event_counts"])
+
+    half = len(events) // 2
+    merged = merge_event_indexes(build_event_index(events.iloc[:half], len(users)),
+                                 build_event_index(events.iloc[half:], len(users)))
+    pd.testing.assert_frame_equal(merged["customers"], dense["customers"])
+    pd.testing.assert_frame_equal(merged["event_counts"], dense["event_counts"], check_like=True)
+    assert merged["n_events"] == dense["n_events"]
@@ -0,0 +1,46 @@
+import threading
+import pytest
+import run_pipeline
+from src.etl.loader import load_data
+from src.utils.dag import run_dag
+
+
+def test_independent_stages_run_concurrently():
+    # Both branches block until the other one has started
+    barrier = threading.Barrier(2, timeout=5)
+    def branch(fn):
+        def run(x):
+            barrier.wait()
+            return fn(x)
+        return run
+    stages = {
+        "load": (lambda: 2, []),
+        "left": (branch(lambda x: x + 1), ["load"]),
+        "right": (branch(lambda x: x * 10), ["load"]),
+        "join": (lambda a, b: (a, b), ["left", "right"]),
+    }
+    results, timings = run_dag(stages, workers=2)
+    assert results["join"] == (3, 20)
+    assert set(timings) == set(stages)
+
+
+def test_invalid_graphs_are_rejected():
+    with pytest.raises(ValueError, match="unknown"):
+        run_dag({"a": (lambda x: x, ["missing"])})
+    with pytest.raises(ValueError, match="Cycle"):
+        run_dag({"a": (lambda b: b, ["b"]), "b": (lambda a: a, ["a"])})
+
+
+def test_stage_errors_propagate():
+    def boom():
+        raise RuntimeError("stage failed")
+    with pytest.raises(RuntimeError, match="stage failed"):
+        run_dag({"a": (boom, []), "b": (lambda x: x, ["a"])}, workers=2)
+
+
+def test_parallel_outputs_match_serial():
+    data = load_data()
+    args = (data["users"], data["events"], data["subscriptions"], data["revenue"], None)
+    serial = run_pipeline.render_outputs(run_pipeline.compute_outputs(*args, workers=1))
+    parallel = run_pipeline.render_outputs(run_pipeline.compute_outputs(*args, workers=4))
+    assert serial == parallel
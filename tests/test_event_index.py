@@ -0,0 +1,30 @@
+import pandas as pd
+from src.etl.loader import load_data
+from src.etl.event_index import build_event_index, activated_ids, activation_counts
+
+
+def test_event_index_matches_direct_scan():
+    events = load_data()["events"]
+    index = build_event_index(events)
+
+    act = events[events["event_name"].str.lower() == "activate"]
+    assert set(activated_ids(index)) == set(act["customer_id"])
+    pd.testing.assert_series_equal(
+        index["customers"]["last_seen"],
+        events.groupby("customer_id", observed=True)["event_timestamp"].max(),
+        check_names=False,
+    )
+    assert index["event_counts"].to_numpy().sum() == index["n_events"] == len(events)
+    assert activation_counts(index).sum() == len(act)
+
+
+def test_event_names_are_case_folded():
+    events = pd.DataFrame({
+        "customer_id": ["A", "A", "B"],
+        "event_name": ["Activate", "ACTIVATE", "login"],
+        "event_timestamp": pd.to_datetime(["2025-01-01", "2025-01-03", "2025-01-02"]),
+    })
+    index = build_event_index(events)
+    assert list(index["event_name"].categories) == ["activate", "login"]
+    assert activation_counts(index).to_dict() == {"A": 2, "B": 0}
+    assert index["customers"].loc["A", "first_activation"] == pd.Timestamp("2025-01-01")
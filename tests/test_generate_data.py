@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from src.utils.config import DATA_DIR
+from src.etl.loader import load_data
+from src.utils.generate_data import add_months, generate_dataset, generate_tables, write_dataset
+
+
+def test_generated_tables_match_checked_in_schemas(tmp_path):
+    rows = write_dataset(tmp_path, 5_000, seed=1, as_of="2025-12-12")
+    for name, n in rows.items():
+        generated = pd.read_csv(tmp_path / f"{name}.csv")
+        assert list(generated.columns) == list(pd.read_csv(DATA_DIR / f"{name}.csv", nrows=0).columns)
+        assert len(generated) == n
+    assert 4_000 < rows["events"] < 6_000
+
+
+def test_generation_is_deterministic_and_consistent(monkeypatch):
+    # Small blocks so ids and counters have to carry across block boundaries
+    monkeypatch.setattr("src.utils.generate_data.BLOCK_USERS", 700)
+    first = generate_dataset(20_000, events_per_user=5, seed=3, as_of="2025-06-30")
+    second = generate_dataset(20_000, events_per_user=5, seed=3, as_of="2025-06-30")
+    for name in first:
+        pd.testing.assert_frame_equal(first[name], second[name])
+
+    users = first["users"]
+    assert users["customer_id"].is_unique
+    for name in ["events", "subscriptions", "revenue", "support_tickets"]:
+        assert first[name]["customer_id"].isin(users["customer_id"]).all()
+    for name, key in [("events", "event_id"), ("subscriptions", "subscription_id"),
+                      ("revenue", "invoice_id"), ("support_tickets", "ticket_id")]:
+        assert first[name][key].is_unique
+    assert set(first["events"]["event_name"]) == {"signup", "activate", "upgrade", "login"}
+    assert pd.to_datetime(first["events"]["event_timestamp"]).max() < pd.Timestamp("2025-07-01")
+    subs = first["subscriptions"]
+    assert (subs["end_date"].ne("") == subs["status"].eq("cancelled")).all()
+
+
+def test_generated_tables_have_loaded_dtypes():
+    tables = generate_tables(500, seed=2, as_of="2025-06-30")
+    loaded = load_data()
+    for name in ["users", "events", "subscriptions", "revenue"]:
+        df = tables[name]
+        assert df.dtypes.astype(str).to_dict() == loaded[name].drop(columns="customer_key").dtypes.astype(str).to_dict()
+    assert tables["subscriptions"]["end_date"].isna().any()
+
+
+def test_add_months_clips_to_month_end():
+    days = np.array(["2025-01-31", "2024-01-31", "2025-03-15"], dtype="datetime64[D]")
+    assert add_months(days, np.array([1, 1, 12])).astype(str).tolist() == ["2025-02-28", "2024-02-29", "2026-03-15"]
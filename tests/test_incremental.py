@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+import run_pipeline
+from src.etl import incremental
+from src.etl.loader import load_data
+from src.etl.event_index import build_event_index
+from src.utils.config import EVENTS_FILE, REVENUE_FILE
+from tests.helpers import split_csv
+
+
+@pytest.fixture
+def appendable_sources(tmp_path, monkeypatch):
+    events, revenue = tmp_path / "events.csv", tmp_path / "revenue.csv"
+    monkeypatch.setattr(incremental, "EVENTS_FILE", events)
+    monkeypatch.setattr(incremental, "REVENUE_FILE", revenue)
+    rest = {
+        events: split_csv(EVENTS_FILE, events, 2000),
+        revenue: split_csv(REVENUE_FILE, revenue, 1500),
+    }
+    return tmp_path / "state", rest
+
+
+def render_incremental(state):
+    data = load_data()
+    results = run_pipeline.compute_outputs(data["users"], None, data["subscriptions"],
+                                           state["revenue"], state["event_index"])
+    return run_pipeline.render_outputs(results)
+
+
+def render_full():
+    data = load_data()
+    results = run_pipeline.compute_outputs(data["users"], data["events"], data["subscriptions"],
+                                           data["revenue"], build_event_index(data["events"]))
+    return run_pipeline.render_outputs(results)
+
+
+def test_incremental_matches_full_rebuild(appendable_sources):
+    state_dir, rest = appendable_sources
+    incremental.save_state(incremental.update_state(incremental.load_state(state_dir), chunksize=700), state_dir)
+
+    # Append the remaining rows, with the last one only half written
+    for path, lines in rest.items():
+        with open(path, "a") as f:
+            f.write("".join(lines[:-1]) + lines[-1][:5])
+    state = incremental.update_state(incremental.load_state(state_dir), chunksize=700)
+    incremental.save_state(state, state_dir)
+    for path, lines in rest.items():
+        with open(path, "a") as f:
+            f.write(lines[-1][5:])
+    state = incremental.update_state(incremental.load_state(state_dir), chunksize=700)
+
+    assert state["event_index"]["n_events"] == len(pd.read_csv(EVENTS_FILE))
+    incremental_outputs, full_outputs = render_incremental(state), render_full()
+    assert incremental_outputs == {name: full_outputs[name] for name in incremental_outputs}
+
+
+def test_rewritten_source_triggers_rebuild(appendable_sources):
+    state_dir, rest = appendable_sources
+    events_path = incremental.EVENTS_FILE
+    incremental.save_state(incremental.update_state(incremental.load_state(state_dir)), state_dir)
+    n_before = incremental.load_state(state_dir)["event_index"]["n_events"]
+
+    lines = events_path.read_text().splitlines(keepends=True)
+    events_path.write_text("".join(lines[:1] + lines[2:] + rest[events_path][:10]))
+    state = incremental.update_state(incremental.load_state(state_dir))
+    assert state["event_index"]["n_events"] == n_before - 1 + 10
@@ -0,0 +1,47 @@
+"""
+Parity test for the vectorized journey classifier against the original row-wise
+implementation (benchmarks.reference, apply/lambda).
+"""
+import pandas as pd
+from benchmarks.reference import reference_classify
+from src.etl.loader import load_data
+from src.journey.classifier import classify_journey_stages
+
+
+def edge_case_data():
+    """Covers every rule branch, boundary days and customers without events."""
+    today = pd.Timestamp.now().normalize()
+    users = pd.DataFrame({
+        "customer_id": ["A", "B", "C", "D", "E", "F", "G", "H"],
+        "signup_date": [today - pd.Timedelta(days=d) for d in [100, 100, 100, 14, 15, 3, 200, 1]],
+    })
+    users.loc[7, "signup_date"] = pd.NaT
+    events = pd.DataFrame({
+        "event_id": ["E1", "E2", "E3", "E4", "E5", "E6"],
+        "customer_id": ["A", "B", "B", "C", "G", "Z"],
+        "event_name": ["ACTIVATE", "activate", "login", "activate", "login", "activate"],
+        "event_timestamp": [today - pd.Timedelta(days=d) for d in [30, 32, 31, 40, 1, 2]],
+    })
+    subs = pd.DataFrame({
+        "subscription_id": ["S1", "S2"],
+        "customer_id": ["C", "D"],
+        "status": ["active", "cancelled"],
+        "price": [100, 200],
+    })
+    return users, events, subs
+
+
+def assert_parity(users, events, subs):
+    # Rows stay in users order; the classifier labels that position as the customer_key
+    expected = reference_classify(users, events, subs).rename_axis("customer_key")
+    actual = classify_journey_stages(users, events, subs)
+    pd.testing.assert_frame_equal(actual, expected)
+
+
+def test_parity_edge_cases():
+    assert_parity(*edge_case_data())
+
+
+def test_parity_repo_data():
+    data = load_data()
+    assert_parity(data["users"], data["events"], data["subscriptions"])
@@ -0,0 +1,96 @@
+import numpy as np
+import pandas as pd
+from src.analytics.kpis import kpi_partials, kpis_from_partials
+from src.analytics.mrr import compute_mrr_movements, revenue_retention_kpis
+from src.etl.event_index import build_event_index
+
+
+def make_subs():
+    return pd.DataFrame({
+        "customer_id": ["A", "A", "B", "C"],
+        "start_date": pd.to_datetime(["2025-01-05", "2025-03-01", "2025-01-10", "2025-02-01"]),
+        "end_date": pd.to_datetime([None, None, "2025-03-15", None]),
+        "status": ["active", "active", "cancelled", "active"],
+        "price": [100, 50, 120, 1200],
+        "billing_period": ["monthly", "monthly", "monthly", "annual"],
+    })
+
+
+def test_movements_on_known_example():
+    table = compute_mrr_movements(make_subs(), as_of="2025-05-02").set_index("month")
+    assert table["mrr"].tolist() == [220.0, 320.0, 250.0, 250.0, 250.0]
+    march = table.loc["2025-03-01"]
+    assert (march["new_mrr"], march["expansion_mrr"], march["churned_mrr"]) == (0.0, 50.0, 120.0)
+    assert march["nrr"] == (320 + 50 - 120) / 320
+    assert march["grr"] == (320 - 120) / 320
+    assert march["quick_ratio"] == 50 / 120
+    assert revenue_retention_kpis(table.reset_index(), as_of="2025-04-10") == {
+        "net_revenue_retention": march["nrr"], "gross_revenue_retention": march["grr"], "quick_ratio": march["quick_ratio"],
+    }
+
+
+def cents(value, expected):
+    return np.isclose(value, expected, rtol=0, atol=0.005 + 1e-9)
+
+
+def test_kpi_mrr_is_the_monthly_price_of_active_subscriptions():
+    subs = make_subs()
+    users = pd.DataFrame({"customer_id": ["A", "B", "C"], "signup_date": pd.to_datetime(["2025-01-01"] * 3)})
+    journey = pd.DataFrame({"lifecycle_segment": ["Active", "Churned", "Active"], "days_since_signup": [120] * 3,
+                            "is_activated": [True] * 3, "stage": ["Retained", "Churned", "Retained"]})
+    events = pd.DataFrame({"customer_id": ["A"], "event_name": ["login"],
+                           "event_timestamp": pd.to_datetime(["2025-04-01"])})
+    kpis = kpis_from_partials(kpi_partials(users, journey, subs, build_event_index(events, None)))
+    # C's annual 1200 counts as 100 a month, as in the MRR table
+    table = compute_mrr_movements(subs, as_of="2025-05-02")
+    assert kpis["total_mrr"] == table["mrr"].iloc[-1] == 250.0
+    assert kpis["total_arr"] == 3000.0 and kpis["avg_revenue_per_user"] == 250.0 / 3
+
+
+def test_cancelled_subscriptions_without_end_date_are_left_out():
+    subs = pd.DataFrame({"customer_id": ["A", "B"], "start_date": pd.to_datetime(["2025-01-01"] * 2),
+                         "end_date": pd.to_datetime([None, None]), "status": ["active", "cancelled"],
+                         "price": [100.0, 50.0], "billing_period": "monthly"})
+    users = pd.DataFrame({"customer_id": ["A", "B"], "signup_date": pd.to_datetime(["2025-01-01"] * 2)})
+    journey = pd.DataFrame({"lifecycle_segment": ["Active", "Churned"], "days_since_signup": [120] * 2,
+                            "is_activated": [True] * 2, "stage": ["Retained", "Churned"]})
+    events = pd.DataFrame({"customer_id": ["A"], "event_name": ["login"],
+                           "event_timestamp": pd.to_datetime(["2025-04-01"])})
+    kpis = kpis_from_partials(kpi_partials(users, journey, subs, build_event_index(events, None)))
+    table = compute_mrr_movements(subs, as_of="2025-06-15")
+    assert table["mrr"].tolist() == [100.0] * 6 and table["churned_mrr"].sum() == 0.0
+    assert kpis["total_mrr"] == table["mrr"].iloc[-1]
+
+
+def test_movements_match_month_by_month_reference():
+    rng = np.random.default_rng(7)
+    n = 400
+    start = pd.Timestamp("2024-01-01") + pd.to_timedelta(rng.integers(0, 500, n), unit="D")
+    ended = rng.random(n) < 0.4
+    end = (start + pd.to_timedelta(rng.integers(1, 300, n), unit="D")).where(ended)
+    subs = pd.DataFrame({
+        "customer_id": rng.choice([f"C{i}" for i in range(120)], n),
+        "start_date": start, "end_date": end, "status": "active",
+        "price": rng.choice([10, 20, 50], n),
+        "billing_period": rng.choice(["monthly", "annual"], n),
+    })
+    as_of = pd.Timestamp("2025-09-15")
+    table = compute_mrr_movements(subs, as_of=as_of)
+
+    monthly = np.where(subs["billing_period"] == "annual", subs["price"] / 12, subs["price"])
+    prev = pd.Series(dtype=float)
+    for _, row in table.iterrows():
+        month_end = pd.Timestamp(row["month"]) + pd.offsets.MonthEnd(0)
+        active = (subs["start_date"] <= month_end) & (subs["end_date"].isna() | (subs["end_date"] > month_end))
+        cur = pd.Series(monthly[active.to_numpy()], index=subs["customer_id"][active]).groupby(level=0).sum()
+        both = pd.concat([prev.rename("prev"), cur.rename("cur")], axis=1).fillna(0.0)
+        delta = both["cur"] - both["prev"]
+        # The table is rounded to cents
+        assert cents(row["mrr"], cur.sum())
+        assert cents(row["new_mrr"], both.loc[both["prev"] == 0, "cur"].sum())
+        assert cents(row["expansion_mrr"], delta[(both["prev"] > 0) & (delta > 0)].sum())
+        assert cents(row["contraction_mrr"], -delta[(both["prev"] > 0) & (delta < 0) & (both["cur"] > 0)].sum())
+        assert cents(row["churned_mrr"], both.loc[(both["prev"] > 0) & (both["cur"] == 0), "prev"].sum())
+        prev = cur
+    money = table[["mrr", "new_mrr", "expansion_mrr", "contraction_mrr", "churned_mrr", "net_new_mrr"]].to_numpy()
+    np.testing.assert_array_equal(money, np.round(money, 2))
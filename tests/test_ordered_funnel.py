@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.funnel.ordered import DEFAULT_STEPS, ordered_funnel, parse_steps, reached_steps
+
+
+def make_data():
+    users = pd.DataFrame({
+        "customer_id": ["A", "B", "C", "D", "E"],
+        "country": ["US", "US", "IN", "IN", None],
+    })
+    at = lambda *days: pd.Timestamp("2025-01-01") + pd.to_timedelta(list(days), unit="D")
+    events = pd.DataFrame({
+        # A: in order; B: activates 20 days after signup; C: upgrade before activation;
+        # D: two logins; E: no signup event; Z: unknown customer
+        "customer_id": ["A", "A", "A", "B", "B", "B", "C", "C", "C", "D", "D", "D", "E", "Z", "Z"],
+        "event_name": ["signup", "Activate", "upgrade", "signup", "activate", "upgrade", "signup", "upgrade",
+                       "activate", "signup", "login", "login", "activate", "signup", "activate"],
+        "event_timestamp": at(0, 3, 40, 0, 20, 25, 0, 1, 2, 0, 1, 1.5, 1, 0, 1),
+    })
+    return users, events
+
+
+def test_steps_respect_order_and_windows():
+    users, events = make_data()
+    reached = reached_steps(users, events)
+    assert [list(users["customer_id"][mask]) for mask in reached] == [
+        ["A", "B", "C", "D"], ["A", "C"], ["A"],
+    ]
+    # Without the activation window B converts; a repeated event needs a later occurrence
+    open_steps = parse_steps("signup,activate,upgrade")
+    assert [int(m.sum()) for m in reached_steps(users, events, open_steps)] == [4, 3, 2]
+    logins = parse_steps("signup,login,login:1")
+    assert [int(m.sum()) for m in reached_steps(users, events, logins)] == [4, 1, 1]
+    assert [int(m.sum()) for m in reached_steps(users, events, parse_steps("signup,cancel"))] == [4, 0]
+
+
+def test_breakdowns_share_one_evaluation():
+    users, events = make_data()
+    funnel = ordered_funnel(users, events, breakdowns=["country", "pricing_plan"])
+    assert set(funnel["breakdown"]) == {"all", "country"}
+    overall = funnel[funnel["breakdown"] == "all"]
+    assert overall["customers"].tolist() == [4, 2, 1]
+    assert overall["conversion_rate"].tolist() == [1.0, 0.5, 0.5]
+    assert overall["overall_conversion"].tolist() == [1.0, 0.5, 0.25]
+    by_country = funnel[funnel["breakdown"] == "country"].pivot(index="value", columns="step", values="customers")
+    assert by_country.loc["US"].to_dict() == {"acquisition": 2, "activation": 1, "retention": 1}
+    assert by_country.loc["IN"].to_dict() == {"acquisition": 2, "activation": 1, "retention": 0}
+    assert list(funnel["window_days"].iloc[:3].fillna(-1)) == [-1, DEFAULT_STEPS[1][2], -1]
+
+
+def test_invalid_step_spec():
+    with pytest.raises(ValueError):
+        parse_steps("signup,,upgrade")
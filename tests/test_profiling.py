@@ -0,0 +1,35 @@
+import pstats
+import pandas as pd
+from src.utils.dag import run_dag
+from src.utils.profiling import StageProfiler
+
+
+def test_profiled_stages_record_time_memory_and_rows(tmp_path):
+    profiler = StageProfiler(tmp_path / "stats", trace_memory=True)
+    stages = {
+        "load": (lambda: {"users": pd.DataFrame({"id": range(10)}), "n": 10}, []),
+        "double": (lambda d: pd.concat([d["users"], d["users"]]), ["load"]),
+        "write:out.csv": (lambda df: None, ["double"]),
+    }
+    results, _ = run_dag(profiler.wrap(stages), workers=2)
+    assert len(results["double"]) == 20
+
+    profiler.write(tmp_path / "profile.json", mode="test")
+    report = pd.read_json(tmp_path / "profile.json", typ="series")
+    assert report["mode"] == "test"
+    records = {r["stage"]: r for r in report["stages"]}
+    assert list(records) == list(stages)
+    assert records["load"]["rows_out"] == {"users": 10}
+    assert records["double"]["rows_in"] == {"load": {"users": 10}}
+    assert records["double"]["rows_out"] == 20
+    assert records["write:out.csv"]["rows_out"] is None
+    for record in records.values():
+        assert record["wall_seconds"] >= 0 and record["cpu_seconds"] >= 0
+        assert record["peak_rss_mb"] > 0 and record["tracemalloc_peak_mb"] is not None
+    assert "<lambda>" in str(pstats.Stats(str(tmp_path / "stats" / "write_out.csv.prof")).stats)
+
+
+def test_memory_tracing_is_opt_in():
+    profiler = StageProfiler()
+    profiler.call("noop", lambda: None)
+    assert profiler.records[0]["tracemalloc_delta_mb"] is None
@@ -0,0 +1,85 @@
+import asyncio
+import json
+import os
+import pandas as pd
+from src.serving.query_server import QueryService, serve
+
+
+def write_run(outputs, stages, metrics, marker_ns):
+    """One finished pipeline run: segmentation, churn scores, metrics.json, then the profile marker."""
+    ids = [f"C{i}" for i in range(len(stages))]
+    lifecycle = {"Engagement": "Active", "Dormant": "At-Risk", "Churned": "Churned"}
+    pd.DataFrame({
+        "customer_id": ids, "signup_date": "2025-01-01", "stage": stages,
+        "lifecycle_segment": [lifecycle[s] for s in stages], "amount": 0.0, "revenue_segment": "Free",
+    }).to_csv(outputs / "segmentation.csv", index=False)
+    pd.DataFrame({"customer_id": ids, "churn_score": 0.5}).to_csv(outputs / "churn_scores.csv", index=False)
+    (outputs / "metrics.json").write_text(json.dumps(metrics))
+    marker = outputs / "inspections" / "profile.json"
+    marker.parent.mkdir(exist_ok=True)
+    marker.write_text("{}")
+    os.utime(marker, ns=(marker_ns, marker_ns))
+
+
+def test_queries_are_answered_from_indexes(tmp_path):
+    write_run(tmp_path, ["Engagement", "Dormant", "Engagement", "Churned"], {"activation_rate": 0.5}, 10**18)
+    service = QueryService(tmp_path)
+    assert service.handle("/health")[0] == 503
+    assert service.reload_if_changed()
+
+    assert service.handle("/customers/C1") == (200, {
+        "customer_id": "C1", "signup_date": "2025-01-01", "stage": "Dormant", "lifecycle_segment": "At-Risk",
+        "amount": 0.0, "revenue_segment": "Free", "churn_score": 0.5,
+    })
+    assert service.handle("/customers/C9")[0] == 404
+    assert service.handle("/stages") == (200, {"Churned": 1, "Dormant": 1, "Engagement": 2})
+    assert service.handle("/stages/Engagement?offset=1&limit=5")[1] == {
+        "stage": "Engagement", "customers": 2, "offset": 1, "customer_ids": ["C2"],
+    }
+    assert service.handle("/segments")[1] == {
+        "lifecycle_segment": {"Active": 2, "At-Risk": 1, "Churned": 1}, "revenue_segment": {"Free": 4},
+    }
+    assert service.handle("/segments/Free")[1]["customer_ids"] == ["C0", "C1", "C2", "C3"]
+    assert service.handle("/metrics/activation_rate") == (200, {"activation_rate": 0.5})
+    assert service.handle("/metrics/nope")[0] == 404
+    assert service.handle("/stages/Engagement?limit=x")[0] == 400
+    assert service.handle("/unknown")[0] == 404
+
+
+def test_reloads_only_after_a_finished_run(tmp_path):
+    write_run(tmp_path, ["Engagement"], {"activation_rate": 0.5}, 10**18)
+    service = QueryService(tmp_path)
+    service.reload_if_changed()
+    before = service.snapshot
+    assert not service.reload_if_changed()
+    write_run(tmp_path, ["Dormant", "Dormant"], {"activation_rate": 0.25}, 2 * 10**18)
+    assert service.reload_if_changed()
+    assert service.snapshot is not before
+    assert service.handle("/stages")[1] == {"Dormant": 2}
+    assert service.handle("/metrics")[1] == {"activation_rate": 0.25}
+
+
+def test_http_round_trip_with_keep_alive(tmp_path):
+    write_run(tmp_path, ["Engagement", "Dormant"], {"activation_rate": 0.5}, 10**18)
+    service = QueryService(tmp_path)
+    service.reload_if_changed()
+
+    async def exchange():
+        ready = asyncio.Event()
+        server = asyncio.create_task(serve(service, "127.0.0.1", 0, reload_seconds=0, ready=ready))
+        await ready.wait()
+        reader, writer = await asyncio.open_connection(*service.address)
+        responses = []
+        for path in ["/customers/C0", "/stages/Dormant", "/nope"]:
+            writer.write(f"GET {path} HTTP/1.1\r\nHost: localhost\r\n\r\n".encode())
+            head = (await reader.readuntil(b"\r\n\r\n")).decode()
+            length = int(head.split("Content-Length: ")[1].split("\r\n")[0])
+            responses.append((head.split(" ")[1], json.loads(await reader.readexactly(length))))
+        writer.close()
+        server.cancel()
+        return responses
+
+    responses = asyncio.run(exchange())
+    assert responses[0] == ("200", service.snapshot.customer("C0"))
+    assert responses[1][1]["customer_ids"] == ["C1"]
+    assert responses[2][0] == "404"
@@ -1,19 +1,45 @@
 import pytest
 import pandas as pd
-from src.utils.config import USERS_FILE, EVENTS_FILE, SUBSCRIPTIONS_FILE, REVENUE_FILE
+from src.etl.loader import SOURCES, read_table
+from src.etl.schema import SCHEMAS, REQUIRED_COLUMNS, STRING_DTYPE, SchemaError, apply_schema
+from src.analytics.mrr import monthly_price
+from src.utils.config import SUPPORT_TICKETS_FILE
 
 def test_files_exist():
-    assert USERS_FILE.exists(), "users.csv missing"
-    assert EVENTS_FILE.exists(), "events.csv missing"
-    assert SUBSCRIPTIONS_FILE.exists(), "subscriptions.csv missing"
+    for name, path in SOURCES.items():
+        assert path.exists(), f"{path.name} missing"
+    assert SUPPORT_TICKETS_FILE.exists(), "support_tickets.csv missing"
 
 def test_schema_columns():
-    users = pd.read_csv(USERS_FILE)
-    expected_cols = ["customer_id", "signup_date"]
-    for col in expected_cols:
-        assert col in users.columns, f"users.csv missing {col}"
-    
-    events = pd.read_csv(EVENTS_FILE)
-    assert "event_name" in events.columns
-    assert "customer_id" in events.columns
-    assert "event_timestamp" in events.columns
+    for name in SOURCES:
+        df = read_table(name)
+        for col in REQUIRED_COLUMNS[name]:
+            assert col in df.columns, f"{name} missing {col}"
+        for col, dtype in SCHEMAS[name].items():
+            if col not in df.columns:
+                continue
+            expected = {"category": "category", "string": STRING_DTYPE}.get(dtype, dtype)
+            assert df[col].dtype == expected, f"{name}.{col} is {df[col].dtype}, expected {expected}"
+
+def test_invalid_input_is_rejected():
+    revenue = pd.DataFrame({"customer_id": ["C1", "C2"], "amount": [10, 20],
+                            "revenue_date": ["2025-01-01", "2025-02-01"]})
+    assert apply_schema("revenue", revenue)["amount"].dtype == "float64"
+    with pytest.raises(SchemaError, match="missing required columns"):
+        apply_schema("revenue", revenue.drop(columns="revenue_date"))
+    with pytest.raises(SchemaError, match="expected numbers"):
+        apply_schema("revenue", revenue.assign(amount=["10", "ten"]))
+    with pytest.raises(SchemaError, match="missing values"):
+        apply_schema("revenue", revenue.assign(amount=[None, 20]))
+    with pytest.raises(SchemaError, match="unparseable dates"):
+        apply_schema("revenue", revenue.assign(revenue_date=["2025-01-01", "not a date"]))
+
+def test_fractional_money_is_loaded(tmp_path, monkeypatch):
+    path = tmp_path / "subscriptions.csv"
+    path.write_text("subscription_id,customer_id,plan,start_date,end_date,status,price,billing_period\n"
+                    "S1,C1,pro,2025-01-05,,active,29.99,monthly\n"
+                    "S2,C2,basic,2025-02-01,,active,119.88,annual\n")
+    monkeypatch.setitem(SOURCES, "subscriptions", path)
+    subs = read_table("subscriptions")
+    assert subs["price"].tolist() == [29.99, 119.88]
+    assert monthly_price(subs).tolist() == pytest.approx([29.99, 9.99])
@@ -0,0 +1,49 @@
+import io
+import pandas as pd
+from src.etl.loader import load_data
+from src.etl.event_index import build_event_index
+from src.funnel.engine import compute_funnel_metrics
+from src.journey.classifier import classify_journey_stages
+from src.segmentation.engine import create_segments
+from src.analytics import churn as churn_module
+from src.analytics.churn import fit_churn_model, score_customers
+from src.analytics.kpis import calculate_kpis
+from src.analytics.support import ticket_features
+from src.utils.sharding import partition_by_customer, run_sharded
+
+
+def test_partitions_are_disjoint_and_complete():
+    data = load_data()
+    shards = partition_by_customer(data, 3)
+    for table in ["users", "events", "subscriptions", "revenue", "support_tickets"]:
+        if data[table] is None:  # no resolvable tickets in the sample data
+            assert all(table not in s for s in shards)
+            continue
+        assert sum(len(s[table]) for s in shards) == len(data[table])
+    owners = [set(s["users"]["customer_id"]) | set(s["events"]["customer_id"]) for s in shards]
+    assert not (owners[0] & owners[1]) and not (owners[1] & owners[2]) and not (owners[0] & owners[2])
+
+
+def test_sharded_results_match_single_process(tmp_path, monkeypatch):
+    data = load_data()
+    users, events, subs = data["users"], data["events"], data["subscriptions"]
+    # No model ships with the repo; shards (forked workers) score with this one
+    fit_churn_model(users, events, data["revenue"], data["support_tickets"]).save(tmp_path / "model.json")
+    monkeypatch.setattr(churn_module, "CHURN_MODEL_FILE", tmp_path / "model.json")
+    journey = classify_journey_stages(users, events, subs)
+    segments = create_segments(journey, data["revenue"], support=None if data["support_tickets"] is None
+                               else ticket_features(users, data["support_tickets"]))
+    churn = score_customers(users, build_event_index(events, len(users)), data["revenue"], data["support_tickets"])
+
+    funnel, kpis = run_sharded(data, 3, tmp_path / "journey", tmp_path / "segments", processes=2,
+                               churn_dir=tmp_path / "churn")
+    assert funnel == compute_funnel_metrics(users, events, subs)
+    assert kpis == calculate_kpis(users, events, segments, subs, churn_scores=churn)
+
+    for directory, frame in [("segments", segments), ("churn", churn)]:
+        parts = pd.concat([pd.read_csv(p) for p in sorted((tmp_path / directory).glob("part-*.csv"))])
+        expected = pd.read_csv(io.StringIO(frame.to_csv(index=False)))
+        pd.testing.assert_frame_equal(
+            parts.sort_values("customer_id").reset_index(drop=True),
+            expected.sort_values("customer_id").reset_index(drop=True),
+        )
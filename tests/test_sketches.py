@@ -0,0 +1,145 @@
+import json
+import numpy as np
+import pandas as pd
+import pytest
+from src.analytics import approx
+from src.analytics.kpis import calculate_kpis
+from src.etl import loader
+from src.etl.loader import load_data
+from src.funnel.engine import compute_funnel_metrics
+from src.journey.classifier import classify_journey_stages
+from src.segmentation.engine import create_segments
+from src.utils.config import EVENTS_FILE, REVENUE_FILE, USERS_FILE
+from src.utils.sketches import HyperLogLog, QuantileSketch, hash_values, sketch_from_dict
+from tests.helpers import split_csv
+
+
+def test_hyperloglog_error_bound_and_merge():
+    ids = np.char.add("C", np.arange(200_000).astype(str))
+    whole = HyperLogLog(12).add(ids)
+    # 4 standard errors: a false failure is a < 1e-4 event
+    assert abs(whole.estimate() / len(ids) - 1) < 4 * whole.relative_error
+    parts = [HyperLogLog(12).add(part) for part in np.array_split(ids, 3)]
+    merged = parts[0].merge(parts[1]).merge(parts[2]).merge(HyperLogLog(12).add(ids[:5000]))
+    assert np.array_equal(merged.registers, whole.registers)
+    assert np.array_equal(sketch_from_dict(json.loads(json.dumps(whole.to_dict()))).registers, whole.registers)
+    assert HyperLogLog(12).add(ids[:300]).count() == pytest.approx(300, rel=0.05)  # linear counting range
+    with pytest.raises(ValueError):
+        whole.merge(HyperLogLog(10))
+    assert np.array_equal(hash_values(pd.Series(ids[:10], dtype="category")), hash_values(ids[:10]))
+
+
+def test_quantile_sketch_relative_error_and_merge():
+    rng = np.random.default_rng(2)
+    values = np.concatenate([rng.lognormal(3, 2, 50_000), -rng.lognormal(1, 1, 2_000), np.zeros(500)])
+    rng.shuffle(values)
+    whole = QuantileSketch(0.01).add(values)
+    ordered = np.sort(values)
+    for q in np.linspace(0, 1, 101):
+        exact = ordered[int(np.floor(q * (len(values) - 1)))]
+        assert abs(whole.quantile(q) - exact) <= 0.01 * abs(exact) + 1e-12
+    assert whole.mean() == pytest.approx(values.mean(), rel=1e-9)
+
+    merged = QuantileSketch(0.01)
+    for part in np.array_split(values, 4):
+        merged.merge(QuantileSketch(0.01).add(part))
+    restored = sketch_from_dict(json.loads(json.dumps(merged.to_dict())))
+    assert [restored.quantile(q) for q in (0.01, 0.5, 0.99)] == [whole.quantile(q) for q in (0.01, 0.5, 0.99)]
+    assert (restored.count, restored.min, restored.max) == (len(values), values.min(), values.max())
+    assert QuantileSketch().quantile(0.5) is None
+
+
+def test_report_error_bounds_come_from_the_merged_sketches():
+    days = {"2025-01-01": {approx.ACTIVE: HyperLogLog(10).add(np.arange(500)),
+                           approx.REVENUE: QuantileSketch(0.02).add(np.array([10.0, 20.0]))}}
+    assert approx.report(days)["error_bounds"] == {"distinct_relative_std_error": 1.04 / 32,
+                                                   "quantile_relative_error": 0.02}
+    assert approx.report(days, start="2026-01-01")["error_bounds"] == {"distinct_relative_std_error": None,
+                                                                       "quantile_relative_error": None}
+
+
+@pytest.fixture
+def appendable_sources(tmp_path, monkeypatch):
+    events, revenue = tmp_path / "events.csv", tmp_path / "revenue.csv"
+    monkeypatch.setattr(approx, "EVENTS_FILE", events)
+    monkeypatch.setattr(approx, "REVENUE_FILE", revenue)
+    return tmp_path / "sketches", {events: split_csv(EVENTS_FILE, events, 2000),
+                                   revenue: split_csv(REVENUE_FILE, revenue, 1500)}
+
+
+def serialized(days):
+    return {day: {name: sketch.to_dict() for name, sketch in sketches.items()} for day, sketches in days.items()}
+
+
+def test_daily_updates_match_exact_results(appendable_sources, tmp_path):
+    sketch_dir, rest = appendable_sources
+    approx.update_sketches(sketch_dir, chunksize=700)
+    for path, lines in rest.items():
+        with open(path, "a") as f:
+            f.write("".join(lines))
+    approx.update_sketches(sketch_dir, chunksize=700)
+    approx.update_sketches(sketch_dir, chunksize=700)  # nothing appended: no double counting
+    days = approx.load_sketches(sketch_dir)["days"]
+
+    # Same sketches as one update over the full files, in other chunk sizes
+    for path, full in [(approx.EVENTS_FILE, EVENTS_FILE), (approx.REVENUE_FILE, REVENUE_FILE)]:
+        path.write_text(full.read_text())
+    rebuilt = approx.update_sketches(tmp_path / "rebuilt", chunksize=1000)["days"]
+    assert serialized(rebuilt) == serialized(days)
+
+    data = load_data()
+    users, events, subs = data["users"], data["events"], data["subscriptions"]
+    segments = create_segments(classify_journey_stages(users, events, subs), data["revenue"])
+    exact_funnel = compute_funnel_metrics(users, events, subs)
+    exact_kpis = calculate_kpis(users, events, segments, subs)
+    result = approx.report(days)
+    bound = 4 * result["error_bounds"]["distinct_relative_std_error"]
+    assert result["funnel"]["acquisition"] == pytest.approx(exact_funnel["acquisition"], rel=bound)
+    assert result["funnel"]["activation"] == pytest.approx(exact_funnel["activation"], rel=bound)
+    # An intersection by inclusion-exclusion carries the error of the union (~activated + paid customers)
+    assert abs(result["funnel"]["retention"] - exact_funnel["retention"]) <= bound * 2 * exact_funnel["activation"]
+    assert result["avg_time_to_activate_hours"] == pytest.approx(exact_kpis["avg_time_to_activate_hours"], rel=1e-12)
+    assert result["revenue_total"] == data["revenue"]["amount"].sum()
+    exact_median = np.sort(data["revenue"]["amount"].to_numpy())[(len(data["revenue"]) - 1) // 2]
+    assert result["revenue_p50"] == pytest.approx(exact_median, rel=result["error_bounds"]["quantile_relative_error"])
+
+    # A date range only merges its own days
+    day = "2025-03-01"
+    daily = approx.report(days, day, day, by_day=True)
+    active = events.loc[events["event_timestamp"].dt.strftime("%Y-%m-%d") == day, "customer_id"].nunique()
+    assert daily["days"] == 1 and daily["daily_active_customers"] == {day: daily["active_customers"]}
+    assert daily["active_customers"] == pytest.approx(active, rel=bound)
+
+
+def day_files(sketch_dir):
+    current = sketch_dir / (sketch_dir / approx.POINTER_FILE).read_text().strip()
+    return {path.name: path.stat().st_ino for path in current.glob("????-??-??.json")}
+
+
+def test_updates_only_rewrite_changed_days(appendable_sources, tmp_path, monkeypatch):
+    sketch_dir, rest = appendable_sources
+    approx.update_sketches(sketch_dir)
+    before = day_files(sketch_dir)
+    approx.update_sketches(sketch_dir)  # nothing appended: every day file is hard-linked
+    assert day_files(sketch_dir) == before
+
+    # Appended events only rewrite their own days
+    events = list(rest)[0]
+    with open(events, "a") as f:
+        f.write("".join(rest[events][:50]))
+    approx.update_sketches(sketch_dir)
+    appended = set(pd.read_csv(events, skiprows=range(1, 2001))["event_timestamp"].str[:10] + ".json")
+    after = day_files(sketch_dir)
+    rewritten = {day for day in after if after[day] != before.get(day)}
+    assert rewritten and rewritten <= appended and len(appended) < len(after)
+
+    # Deleted users drop out of the signups and force a rebuild of the event sketches
+    users = tmp_path / "users.csv"
+    lines = USERS_FILE.read_text().splitlines(keepends=True)
+    users.write_text("".join(lines[:-100]))
+    monkeypatch.setitem(loader.SOURCES, "users", users)
+    days = approx.update_sketches(sketch_dir)["days"]
+    assert approx.load_sketches(sketch_dir)["users"] == len(lines) - 101
+    rebuilt = approx.update_sketches(tmp_path / "rebuilt")["days"]
+    assert serialized(days) == serialized(rebuilt)
+    assert approx.report(days)["funnel"]["acquisition"] == pytest.approx(len(lines) - 101, rel=0.05)
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+from unittest import mock
+from src.etl.loader import load_data
+from src.journey.classifier import (
+    NOT_SIGNED_UP, STAGES, classify_journey_stages, stage_counts, stage_history,
+)
+from tests.helpers import make_stage_data
+
+
+def classify_as_of(users, events, subs, day):
+    """Reference: the snapshot classifier on the inputs as they were at the end of `day`."""
+    cutoff = day + pd.Timedelta(days=1)
+    events = events[events["event_timestamp"] < cutoff]
+    subs = subs[subs["start_date"] < cutoff]
+    subs = subs.assign(status=np.where(subs["end_date"].notna() & (subs["end_date"] < cutoff), "cancelled", "active"))
+    with mock.patch.object(pd.Timestamp, "now", return_value=day):
+        return classify_journey_stages(users, events, subs)["stage"].to_numpy()
+
+
+def test_history_matches_snapshot_on_every_day():
+    users, events, subs = make_stage_data()
+    dates = pd.date_range("2024-12-31", "2025-04-15")
+    history = stage_history(users, events, subs, dates)
+    for day in dates:
+        codes = history[day].to_numpy()
+        present = codes != NOT_SIGNED_UP
+        expected = classify_as_of(users, events, subs, day)
+        assert (np.array(STAGES, dtype=object)[codes[present]] == expected[present]).all(), day
+    # Signup dates gate presence; a missing signup date is always present
+    assert history.loc[2, pd.Timestamp("2025-02-19")] == NOT_SIGNED_UP
+    assert (history.loc[3] != NOT_SIGNED_UP).all()
+
+
+def test_last_day_matches_classifier_on_repo_data():
+    data = load_data()
+    today = pd.Timestamp.now().normalize()
+    history = stage_history(data["users"], data["events"], data["subscriptions"],
+                            pd.date_range(today - pd.Timedelta(days=6), today))
+    journey = classify_journey_stages(data["users"], data["events"], data["subscriptions"])
+    assert (np.array(STAGES, dtype=object)[history[today].to_numpy()] == journey["stage"].to_numpy()).all()
+
+
+
+def test_counts_cover_signed_up_customers():
+    users, events, subs = make_stage_data()
+    history = stage_history(users, events, subs, pd.date_range("2025-01-01", "2025-03-31"))
+    counts = stage_counts(history)
+    assert (counts[STAGES].sum(axis=1).to_numpy() == (history.to_numpy() >= 0).sum(axis=0)).all()
@@ -0,0 +1,26 @@
+import pandas as pd
+from src.etl.loader import load_data, stream_event_index
+from src.etl.event_index import build_event_index
+from src.utils.config import EVENTS_FILE
+
+
+def test_streamed_index_matches_in_memory_index():
+    full = build_event_index(load_data()["events"])
+    streamed = stream_event_index(EVENTS_FILE, chunksize=500)
+
+    assert streamed["n_events"] == full["n_events"]
+    assert streamed["event_name"] is None
+    customers = streamed["customers"].reindex(full["customers"].index)
+    pd.testing.assert_frame_equal(customers[["last_seen", "first_activation"]],
+                                  full["customers"][["last_seen", "first_activation"]])
+    pd.testing.assert_series_equal(customers["activation_ms"], full["customers"]["activation_ms"])
+    pd.testing.assert_frame_equal(streamed["event_counts"].reindex(index=full["event_counts"].index,
+                                                                   columns=full["event_counts"].columns),
+                                  full["event_counts"])
+    pd.testing.assert_series_equal(streamed["daily_counts"].sort_index(), full["daily_counts"].sort_index())
+
+
+def test_streaming_load_data_has_no_raw_events():
+    data = load_data(stream_events=True, chunksize=1000)
+    assert data["events"] is None
+    assert data["event_index"]["n_events"] > 0
@@ -0,0 +1,81 @@
+import numpy as np
+import pandas as pd
+import pytest
+from src.analytics.support import group_quantiles, ticket_features
+from src.etl.customers import attach_customer_keys, resolve_customer_ids
+from src.etl import loader
+from src.etl.loader import read_customer_id_map, read_support_tickets
+from src.etl.schema import SchemaError
+from src.utils.config import SUPPORT_TICKETS_FILE
+
+
+def make_data():
+    users = pd.DataFrame({"customer_id": ["C1", "C2", "C3"],
+                          "signup_date": pd.to_datetime(["2025-01-01"] * 3)})
+    tickets = pd.DataFrame({
+        "ticket_id": ["t1", "t2", "t3", "t4", "t5"],
+        "customer_id": pd.Series(["usr_a", "C1", "usr_b", "usr_a", "usr_zz"], dtype="category"),
+        "created_at": pd.to_datetime(["2025-01-02"] * 5),
+        "resolved_at": pd.to_datetime(["2025-01-02 10:00:00", "2025-01-03 00:00:00", None,
+                                       "2025-01-02 04:00:00", "2025-01-02 01:00:00"]),
+        "issue_category": pd.Series(["Billing", "Access", "Billing", "Billing", "Access"], dtype="category"),
+        "priority": pd.Series(["High", "Low", "High", "Urgent", "Low"], dtype="category"),
+    })
+    return users, tickets
+
+
+def test_group_quantiles_match_groupby():
+    rng = np.random.default_rng(3)
+    keys = rng.integers(-1, 50, 5000).astype(np.int32)
+    values = rng.exponential(24, 5000)
+    result = group_quantiles(keys, values, 60, [0.1, 0.5, 0.9])
+    known = keys >= 0
+    expected = pd.Series(values[known]).groupby(keys[known]).quantile([0.1, 0.5, 0.9]).unstack()
+    expected = expected.reindex(range(60)).to_numpy()
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+    assert np.isnan(result[55:]).all()
+
+
+def test_resolved_ids_get_customer_keys(tmp_path):
+    users, tickets = make_data()
+    (tmp_path / "map.csv").write_text("source_id,customer_id\nusr_a,C1\nusr_b,C3\n")
+    id_map = read_customer_id_map(tmp_path / "map.csv")
+    tickets["customer_id"] = resolve_customer_ids(tickets["customer_id"], id_map)
+    assert tickets["customer_id"].tolist() == ["C1", "C1", "C3", "C1", "usr_zz"]
+    keyed = attach_customer_keys({"users": users, "support_tickets": tickets})
+    assert keyed["support_tickets"]["customer_key"].tolist() == [0, 0, 2, 0, -1]
+
+    (tmp_path / "dup.csv").write_text("source_id,customer_id\nusr_a,C1\nusr_a,C2\n")
+    with pytest.raises(SchemaError):
+        read_customer_id_map(tmp_path / "dup.csv")
+    assert read_customer_id_map(tmp_path / "missing.csv") is None
+
+
+def test_unresolvable_tickets_are_left_out(monkeypatch):
+    users, _ = make_data()
+    # The sample helpdesk ids resolve to no customer without an alias file
+    assert read_support_tickets(users) is None
+    source_id = pd.read_csv(SUPPORT_TICKETS_FILE, nrows=1)["customer_id"].iloc[0]
+    monkeypatch.setattr(loader, "read_customer_id_map", lambda: pd.Series({source_id: "C2"}))
+    tickets = read_support_tickets(users)
+    assert (tickets["customer_id"] == "C2").sum() >= 1
+
+
+def test_ticket_features_per_customer():
+    users, tickets = make_data()
+    tickets["customer_id"] = resolve_customer_ids(tickets["customer_id"],
+                                                  pd.Series({"usr_a": "C1", "usr_b": "C3"}))
+    features = ticket_features(users, tickets)
+    assert features["tickets"].tolist() == [3, 0, 1]
+    assert features["open_tickets"].tolist() == [0, 0, 1]
+    # C1 resolved in 10h, 24h and 4h
+    assert features.loc[0, "resolution_p50_hours"] == 10.0
+    assert features.loc[0, "resolution_p90_hours"] == pytest.approx(21.2)
+    assert np.isnan(features.loc[2, "resolution_p50_hours"])
+    assert features.loc[0, "category_billing_share"] == pytest.approx(2 / 3)
+    # Priorities outside TICKET_PRIORITIES only count towards the total
+    assert features.loc[0, ["priority_high_share", "priority_low_share"]].tolist() == [pytest.approx(1 / 3)] * 2
+    assert np.isnan(features.loc[1, "priority_high_share"])
+
+    empty = ticket_features(users, None)
+    assert empty["tickets"].tolist() == [0, 0, 0] and list(empty.columns) == list(features.columns)
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+from src.etl.customers import attach_customer_keys
+from src.etl.event_index import daily_event_counts
+from src.etl.incremental import appended_range
+from src.etl.loader import load_data
+from src.exports import tableau
+from src.utils.config import REVENUE_FILE
+from tests.helpers import split_csv
+
+
+def test_customer_master_chunks_match_merge():
+    rng = np.random.default_rng(4)
+    users = pd.DataFrame({"customer_id": [f"C{i}" for i in range(50)], "status": "active",
+                          "signup_date": pd.Timestamp("2025-01-01") + pd.to_timedelta(rng.integers(0, 90, 50), "D")})
+    subs = pd.DataFrame({"subscription_id": [f"S{i}" for i in range(80)],
+                         "customer_id": [f"C{i}" for i in rng.integers(0, 60, 80)],  # some unknown customers
+                         "status": "cancelled", "price": rng.integers(10, 100, 80).astype(np.int32),
+                         "start_date": pd.Timestamp("2025-02-01") + pd.to_timedelta(rng.integers(0, 90, 80), "D")})
+    expected = users.merge(subs, how="left", on="customer_id", suffixes=("", "_sub"))
+    keyed = attach_customer_keys({"users": users, "subscriptions": subs})
+    chunks = list(tableau.customer_master_chunks(keyed["users"], keyed["subscriptions"], chunk_rows=7))
+    assert len(chunks) == 8
+    pd.testing.assert_frame_equal(pd.concat(chunks, ignore_index=True), expected)
+
+
+def daily(rows):
+    days, names, counts = zip(*rows)
+    return pd.Series(counts, dtype="int64",
+                     index=pd.MultiIndex.from_arrays([pd.to_datetime(days), names], names=["date", "event_name"]))
+
+
+def test_daily_events_only_rewrite_the_last_day(tmp_path):
+    path, full = tmp_path / "daily.csv", tmp_path / "full.csv"
+    entry = tableau.write_daily_events(daily([("2025-01-01", "login", 3), ("2025-01-02", "login", 1)]), path)
+
+    # The last day grew and a new day started: the file is cut back to 2025-01-02 and appended to
+    counts = daily([("2025-01-01", "login", 3), ("2025-01-02", "login", 4), ("2025-01-02", "signup", 1),
+                    ("2025-01-03", "login", 2)])
+    with open(path, "rb+") as f:
+        f.seek(entry["last_day_offset"])
+        f.write(b"2025-01-02,login,X")  # whatever follows the offset is replaced
+    entry["size"] = path.stat().st_size
+    entry = tableau.write_daily_events(counts, path, entry)
+    tableau.write_daily_events(counts, full)
+    assert path.read_text() == full.read_text() == (
+        "date,event_name,count\n2025-01-01,login,3\n2025-01-02,login,4\n2025-01-02,signup,1\n2025-01-03,login,2\n")
+    assert entry["last_day"] == "2025-01-03"
+
+    # A late event on an earlier day changes the digest: rewritten whole
+    late = daily([("2025-01-01", "login", 4), ("2025-01-02", "login", 4), ("2025-01-02", "signup", 1),
+                  ("2025-01-03", "login", 2)])
+    tableau.write_daily_events(late, path, entry)
+    assert path.read_text().splitlines()[1] == "2025-01-01,login,4"
+
+
+def test_revenue_extract_appends_new_invoices(tmp_path, monkeypatch):
+    source, path = tmp_path / "revenue.csv", tmp_path / "extract.csv"
+    monkeypatch.setattr(tableau, "REVENUE_FILE", source)
+    rest = split_csv(REVENUE_FILE, source, 1000)
+    entry = tableau.write_revenue_transactions(path, None, appended_range(source, None)[2])
+    assert entry["rows"] == 1000
+    with open(source, "a") as f:
+        f.write("".join(rest))
+    entry = tableau.write_revenue_transactions(path, entry, appended_range(source, None)[2])
+
+    # Same bytes as revenue.csv: amounts keep its formatting (199, not 199.0)
+    data = load_data()
+    assert entry["rows"] == len(data["revenue"])
+    assert path.read_bytes() == REVENUE_FILE.read_bytes()
+
+    # A rewritten source rebuilds the extract
+    source.write_text(REVENUE_FILE.read_text().replace("recurring", "one_time", 1))
+    entry = tableau.write_revenue_transactions(path, entry, appended_range(source, None)[2])
+    assert path.read_bytes() == source.read_bytes()
+    assert entry["rows"] == len(data["revenue"])
+
+
+def test_build_extracts_and_kpi_history(tmp_path):
+    data = load_data()
+    kpis = {"activation_rate": 0.5, "total_mrr": 10.0}
+    tableau.build_extracts(data, daily_event_counts(data["events"]), kpis, None, tmp_path)
+    inode = (tmp_path / tableau.REVENUE_TRANSACTIONS).stat().st_ino
+    manifest = tableau.build_extracts(data, daily_event_counts(data["events"]), kpis, None, tmp_path)
+    # Full runs append past the revenue.csv watermark too (an atomic rewrite would replace the file)
+    assert (tmp_path / tableau.REVENUE_TRANSACTIONS).stat().st_ino == inode
+    assert manifest["revenue_transactions"]["rows"] == len(data["revenue"])
+    assert (tmp_path / tableau.REVENUE_TRANSACTIONS).read_bytes() == REVENUE_FILE.read_bytes()
+    history = pd.read_csv(tmp_path / tableau.KPI_SNAPSHOTS)
+    assert list(history.columns) == ["run_date", "activation_rate", "total_mrr"] and len(history) == 2
+
+    # A changed KPI set keeps the history: old rows are empty in new columns and vice versa
+    before = (tmp_path / tableau.KPI_SNAPSHOTS).read_text().splitlines()
+    tableau.append_kpi_snapshot({"activation_rate": 0.25, "churn_risk_score": 0.7}, tmp_path / tableau.KPI_SNAPSHOTS,
+                                run_date="2026-01-01")
+    lines = (tmp_path / tableau.KPI_SNAPSHOTS).read_text().splitlines()
+    assert lines[0] == "run_date,activation_rate,total_mrr,churn_risk_score"
+    assert lines[1:3] == [line + "," for line in before[1:]]
+    assert lines[3] == "2026-01-01,0.25,,0.7"
+    master = pd.read_csv(tmp_path / tableau.CUSTOMER_MASTER)
+    assert len(master) == len(data["users"]) and "status_sub" in master.columns
+    assert not (tmp_path / tableau.COHORT_RETENTION).exists()
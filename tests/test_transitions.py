@@ -0,0 +1,45 @@
+import numpy as np
+import pandas as pd
+from src.journey.classifier import STAGES, stage_history
+from src.journey.transitions import (
+    ABSENT, compare_snapshots, flows, main, rolling_transitions, snapshot_transitions, transition_matrix,
+)
+from src.segmentation.engine import LIFECYCLE_SEGMENTS
+from tests.helpers import make_stage_data
+
+
+def test_matrix_counts_paired_codes():
+    matrix = transition_matrix(np.array([0, 0, 1, -1, 2]), np.array([0, 1, 1, 2, -1]), ["a", "b", "c"])
+    assert matrix.loc["a", "a"] == matrix.loc["a", "b"] == matrix.loc["b", "b"] == 1
+    assert matrix.loc[ABSENT, "c"] == matrix.loc["c", ABSENT] == 1
+    assert matrix.to_numpy().sum() == 5
+    assert flows(matrix)["customers"].sum() == 5
+
+
+def test_history_windows_match_snapshot_pairs():
+    users, events, subs = make_stage_data()
+    history = stage_history(users, events, subs, pd.date_range("2024-12-31", "2025-03-31"))
+    links = rolling_transitions(history, step=7)
+    assert links["to_date"].max() == pd.Timestamp("2025-03-31")
+    assert set(links["level"]) == {"stage", "lifecycle_segment"}
+    window = links[(links["to_date"] == pd.Timestamp("2025-02-17")) & (links["level"] == "stage")]
+    expected = flows(snapshot_transitions(history, "2025-02-10", "2025-02-17"))
+    pd.testing.assert_frame_equal(window[["from_state", "to_state", "customers"]].reset_index(drop=True), expected)
+    # Every window accounts for every customer at each level
+    assert (links.groupby(["to_date", "level"])["customers"].sum() == len(users)).all()
+    segments = snapshot_transitions(history, "2024-12-31", "2025-03-31", level="lifecycle_segment")
+    assert list(segments.columns) == [ABSENT] + LIFECYCLE_SEGMENTS
+
+
+def test_compare_saved_snapshots(tmp_path):
+    before = pd.DataFrame({"customer_id": ["A", "B", "C"], "stage": ["Acquisition", "Engagement", "Dormant"]})
+    after = pd.DataFrame({"customer_id": ["D", "B", "A"], "stage": ["Acquisition", "Dormant", "Retained"]})
+    matrix = compare_snapshots(before, after)
+    assert list(matrix.index) == [ABSENT] + STAGES
+    assert matrix.loc["Acquisition", "Retained"] == matrix.loc["Engagement", "Dormant"] == 1
+    assert matrix.loc["Dormant", ABSENT] == matrix.loc[ABSENT, "Acquisition"] == 1
+
+    before.to_csv(tmp_path / "before.csv", index=False)
+    after.to_parquet(tmp_path / "after.parquet")
+    main([str(tmp_path / "before.csv"), str(tmp_path / "after.parquet"), "--output", str(tmp_path / "flows.csv")])
+    assert pd.read_csv(tmp_path / "flows.csv")["customers"].sum() == 4
@@ -0,0 +1,66 @@
+import pandas as pd
+import pytest
+from src.analytics.churn import score_customers
+from src.analytics.kpis import calculate_kpis
+from src.analytics.mrr import compute_mrr_movements
+from src.analytics.whatif import LRUCache, Scenario, WhatIf, scenario_grid
+from src.etl.event_index import build_event_index
+from src.etl.loader import load_data
+from src.journey.classifier import StageThresholds, classify_journey_stages
+from src.segmentation.engine import create_segments
+
+
+@pytest.fixture(scope="module")
+def sample():
+    data = load_data()
+    idx = build_event_index(data["events"], len(data["users"]))
+    churn = score_customers(data["users"], idx, data["revenue"], data["support_tickets"])
+    mrr = compute_mrr_movements(data["subscriptions"])
+    return data, idx, churn, mrr, WhatIf.from_data(data, idx, churn, mrr)
+
+
+def recompute(data, idx, churn, mrr, scenario):
+    """The pipeline's stages, segments and KPIs under one scenario, without the sweep."""
+    journey = classify_journey_stages(data["users"], data["events"], data["subscriptions"], idx,
+                                      StageThresholds(scenario.activation_window_days, scenario.churn_window_days))
+    segments = create_segments(journey, data["revenue"], high_tier_revenue=scenario.high_tier_revenue)
+    kpis = calculate_kpis(data["users"], data["events"], segments, data["subscriptions"], idx, mrr, churn,
+                          retention_window_days=scenario.retention_window_days)
+    return segments, kpis
+
+
+@pytest.mark.parametrize("scenario", [Scenario(), Scenario(7, 60, 14, 100), Scenario(45, 7, 90, 2000)])
+def test_sweep_matches_full_recompute(sample, scenario):
+    data, idx, churn, mrr, whatif = sample
+    segments, kpis = recompute(data, idx, churn, mrr, scenario)
+    assert whatif.kpis(scenario) == kpis
+    customers = whatif.customers(scenario)
+    for column in ["customer_id", "stage", "lifecycle_segment", "revenue_segment"]:
+        assert customers[column].tolist() == segments[column].tolist()
+    row = whatif.sweep([scenario]).iloc[0]
+    counts = segments["stage"].value_counts()
+    assert all(row[f"stage_{stage}"] == counts.get(stage, 0) for stage in ["Engagement", "Dormant", "Churned"])
+
+
+def test_grid_is_batched_and_memoized(sample):
+    *_, whatif = sample
+    whatif.cache = LRUCache(100)
+    grid = scenario_grid(activation_window_days=[7, 14, 21], churn_window_days=[14, 30], high_tier_revenue=[250, 500])
+    assert len(grid) == 12 and all(s.retention_window_days == Scenario().retention_window_days for s in grid)
+    table = whatif.sweep(grid)
+    assert len(table) == 12 and whatif.cache.misses == 12 and whatif.cache.hits == 0
+    again = whatif.sweep(list(reversed(grid)))
+    assert whatif.cache.hits == 12
+    pd.testing.assert_frame_equal(again.iloc[::-1].reset_index(drop=True), table)
+    with pytest.raises(ValueError):
+        scenario_grid(nope=[1])
+
+
+def test_lru_cache_evicts_least_recently_used():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is None and cache.get("a") == 1 and cache.get("c") == 3
+    assert len(cache) == 2 and (cache.hits, cache.misses) == (3, 1)
@@ -0,0 +1,67 @@
+import gzip
+import numpy as np
+import pandas as pd
+import pyarrow.parquet as pq
+import pytest
+from src.utils.writers import month_partition, write_parquet, write_table
+
+
+def make_frame(n=10):
+    return pd.DataFrame({
+        "customer_id": pd.Categorical([f"C{i:03d}" for i in range(n)]),
+        "signup_date": pd.to_datetime(["2025-01-15", "2025-02-01", None, "2025-01-02", "2025-03-31"] * (n // 5)),
+        "segment": ["Active", "Churned"] * (n // 2),
+        "amount": np.arange(n, dtype=float),
+    })
+
+
+def test_csv_flavours_hold_the_same_text(tmp_path):
+    df = make_frame()
+    write_table(df, tmp_path / "out.csv")
+    write_table(df, tmp_path / "out.csv.gz", "csv.gz")
+    text = (tmp_path / "out.csv").read_text()
+    assert text == df.to_csv(index=False)
+    assert gzip.decompress((tmp_path / "out.csv.gz").read_bytes()).decode() == text
+    # No timestamp in the gzip header: rewriting gives identical bytes
+    first = (tmp_path / "out.csv.gz").read_bytes()
+    write_table(df, tmp_path / "out.csv.gz", "csv.gz")
+    assert (tmp_path / "out.csv.gz").read_bytes() == first
+
+
+def test_parquet_is_streamed_in_row_groups(tmp_path):
+    df = make_frame(20)
+    write_parquet(df, tmp_path / "out.parquet", row_group_rows=6)
+    assert pq.ParquetFile(tmp_path / "out.parquet").metadata.num_row_groups == 4
+    pd.testing.assert_frame_equal(pd.read_parquet(tmp_path / "out.parquet"), df)
+
+
+def test_partitioned_parquet_round_trips(tmp_path):
+    df = make_frame()
+    write_table(df, tmp_path / "by_segment.parquet", "parquet", partition_by=lambda d: d["segment"])
+    assert sorted(p.name for p in (tmp_path / "by_segment.parquet").iterdir()) == ["segment=Active", "segment=Churned"]
+    back = pd.read_parquet(tmp_path / "by_segment.parquet")
+    assert back["segment"].astype(str).tolist() == sorted(df["segment"])
+    assert sorted(back["customer_id"].astype(str)) == list(df["customer_id"])
+
+    write_table(df, tmp_path / "by_month.parquet", "parquet", partition_by=month_partition("signup_date", "signup_month"))
+    months = sorted(p.name for p in (tmp_path / "by_month.parquet").iterdir())
+    assert months == ["signup_month=2025-01", "signup_month=2025-02", "signup_month=2025-03",
+                      "signup_month=__HIVE_DEFAULT_PARTITION__"]
+    assert len(pd.read_parquet(tmp_path / "by_month.parquet/signup_month=2025-01")) == 4
+
+
+def test_failed_write_keeps_previous_file(tmp_path):
+    target = tmp_path / "out.csv"
+    write_table(make_frame(), target)
+    before = target.read_text()
+    with pytest.raises(ValueError):
+        write_table(make_frame(), target, "xlsx")
+    broken = make_frame().assign(amount=[object()] * 10)
+    with pytest.raises(Exception):
+        write_table(broken, tmp_path / "out.parquet", "parquet")
+    write_table(make_frame(), tmp_path / "part.parquet", "parquet", partition_by=lambda d: d["segment"])
+    with pytest.raises(Exception):
+        write_table(broken, tmp_path / "part.parquet", "parquet", partition_by=lambda d: d["segment"])
+    assert target.read_text() == before
+    assert len(pd.read_parquet(tmp_path / "part.parquet")) == 10
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["out.csv", "part.parquet"]